@@ -0,0 +1,82 @@
+import http from 'k6/http';
+import { check } from 'k6';
+import { Rate } from 'k6/metrics';
+
+// Simulates a fleet of nodes sending liveness heartbeats to the router.
+//
+// Every node calls POST /liveness/{ip} every HEARTBEAT_INTERVAL seconds, so
+// the target rate is NODES / HEARTBEAT_INTERVAL requests per second. With
+// BATCH_SIZE > 1 nodes are grouped and reported through POST /liveness/batch
+// instead, as a gateway or multi-GPU host would.
+//
+// MACHINES_FILE is a JSON array of {"token": "mk-mira-...", "network_ip": "..."}
+// for registered machines. Watch the router's CPU (e.g. process_cpu_seconds_total
+// on /metrics) while this runs to get the per-heartbeat cost.
+
+const ROUTER_URL = __ENV.ROUTER_URL || 'http://localhost:8000';
+const NODES = parseInt(__ENV.NODES || '2000');
+const HEARTBEAT_INTERVAL = parseInt(__ENV.HEARTBEAT_INTERVAL || '3');
+const BATCH_SIZE = parseInt(__ENV.BATCH_SIZE || '1');
+const DURATION = __ENV.DURATION || '5m';
+
+const machines: { token: string; network_ip: string }[] = JSON.parse(
+  open(__ENV.MACHINES_FILE || './machines.json')
+);
+
+const errorRate = new Rate('errors');
+
+const rate = Math.ceil(NODES / BATCH_SIZE / HEARTBEAT_INTERVAL);
+
+export const options = {
+  scenarios: {
+    heartbeats: {
+      executor: 'constant-arrival-rate',
+      rate,
+      timeUnit: '1s',
+      duration: DURATION,
+      preAllocatedVUs: Math.max(50, rate),
+      maxVUs: Math.max(200, rate * 4),
+    },
+  },
+  thresholds: {
+    'errors': ['rate<0.01'],
+    'http_req_duration': ['p(95)<100', 'p(99)<250'],
+  },
+};
+
+export default function () {
+  // Each iteration plays one node (or one batch of nodes), cycling the fleet
+  const slot = (__ITER * BATCH_SIZE) % NODES;
+  const first = machines[slot % machines.length];
+  const params = {
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Bearer ${first.token}`,
+    },
+    timeout: '10s',
+  };
+
+  let response;
+  if (BATCH_SIZE > 1) {
+    // All machines of a batch must share the first machine's token
+    const batch = [];
+    for (let i = 0; i < BATCH_SIZE; i++) {
+      const machine = machines[(slot + i) % machines.length];
+      if (machine.token === first.token) {
+        batch.push(machine.network_ip);
+      }
+    }
+    response = http.post(
+      `${ROUTER_URL}/liveness/batch`,
+      JSON.stringify({ network_ips: batch }),
+      params
+    );
+  } else {
+    response = http.post(`${ROUTER_URL}/liveness/${first.network_ip}`, null, params);
+  }
+
+  const success = check(response, {
+    'is status 200': (r) => r.status === 200,
+  });
+  errorRate.add(success ? 0 : 1);
+}
@@ -0,0 +1,52 @@
+"""keyset_pagination_indexes
+
+Revision ID: 4c1e9a7b2d3f
+Revises: 0ddbf4f95feb
+Create Date: 2026-10-17 10:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1e9a7b2d3f'
+down_revision: Union[str, None] = '0ddbf4f95feb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_threads_user_id_updated_at_id', 'threads', ['user_id', 'updated_at', 'id']),
+    ('ix_messages_thread_id_created_at_id', 'messages', ['thread_id', 'created_at', 'id']),
+    ('ix_apitoken_user_id_created_at_id', 'apitoken', ['user_id', 'created_at', 'id']),
+    ('ix_user_created_at_id', 'user', ['created_at', 'id']),
+    ('ix_flows_created_at_id', 'flows', ['created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction, but keeps the tables writable
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
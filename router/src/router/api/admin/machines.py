@@ -2,14 +2,14 @@ import uuid
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import select
 from src.router.db.session import DBSession
-from src.router.core.security import verify_admin
+from src.router.core.security import verify_admin, revoke_token
 from src.router.core.types import User
 from src.router.schemas.machine import RegisterMachineRequest, MachineAuthToken
 from src.router.models.machines import Machine
 from src.router.models.machine_tokens import MachineToken
 import secrets
 from datetime import datetime
-from src.router.utils.redis import redis_client
+from src.router.utils.machine_registry import publish_machine, remove_machine
 from src.router.utils.litellm import (
     add_machine_to_litellm,
     remove_machine_from_litellm,
@@ -61,7 +61,6 @@ async def register_machine(
     
     # Start transaction
     litellm_added = False
-    redis_added = False
     
     try:
         # Step 1: Add to database (but don't commit yet)
@@ -91,24 +90,14 @@ async def register_machine(
             # For other errors, log but continue (LiteLLM might not be configured)
             logger.warning(f"LiteLLM integration error (non-critical): {str(e)}")
         
-        # Step 3: Add to Redis
-        try:
-            await redis_client.set(f"network_ip:{new_machine.id}", new_machine.network_ip)
-            redis_added = True
-        except Exception as e:
-            logger.error(f"Failed to add machine to Redis: {str(e)}")
-            # Rollback LiteLLM if it was added
-            if litellm_added:
-                await rollback_litellm_deployments(new_machine.id)
-            await db.rollback()
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to add machine to Redis: {str(e)}"
-            )
-        
-        # Step 4: Commit database transaction
+        # Step 3: Commit database transaction
         await db.commit()
         await db.refresh(new_machine)
+
+        try:
+            await publish_machine(new_machine)
+        except Exception as e:
+            logger.error(f"Failed to publish machine to registry: {str(e)}")
         
         return {
             "id": new_machine.id,
@@ -134,13 +123,6 @@ async def register_machine(
         # Rollback database
         await db.rollback()
         
-        # Rollback Redis if it was added
-        if redis_added and new_machine.id:
-            try:
-                await redis_client.delete(f"network_ip:{new_machine.id}")
-            except Exception as redis_err:
-                logger.error(f"Failed to rollback Redis: {str(redis_err)}")
-        
         # Rollback LiteLLM if it was added
         if litellm_added and new_machine.id:
             await rollback_litellm_deployments(new_machine.id)
@@ -188,22 +170,9 @@ async def update_machine(
     old_disabled = machine.disabled
     old_traffic_weight = machine.traffic_weight
     old_supported_models = machine.supported_models
-    redis_updated = False
     litellm_updated = False
 
     try:
-        # Update Redis if network IP changed
-        if machine.network_ip != request.network_ip:
-            try:
-                await redis_client.set(f"network_ip:{machine.id}", request.network_ip)
-                redis_updated = True
-            except Exception as e:
-                logger.error(f"Failed to update Redis: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Failed to update Redis: {str(e)}"
-                )
-
         # Update LiteLLM if disabled status, traffic weight, or supported models changed
         # Use current values if not provided in request
         new_disabled = request.disabled if request.disabled is not None else machine.disabled
@@ -223,13 +192,6 @@ async def update_machine(
                 litellm_updated = True
                 logger.info(f"Machine {machine.id} updated in LiteLLM: {'disabled' if request.disabled else 'enabled'}, weight={request.traffic_weight}")
             except LiteLLMError as e:
-                # Rollback Redis if it was updated
-                if redis_updated:
-                    try:
-                        await redis_client.set(f"network_ip:{machine.id}", old_network_ip)
-                    except Exception as redis_err:
-                        logger.error(f"Failed to rollback Redis: {str(redis_err)}")
-                
                 logger.error(f"Failed to update LiteLLM: {str(e)}")
                 raise HTTPException(
                     status_code=500,
@@ -258,6 +220,11 @@ async def update_machine(
         await db.commit()
         await db.refresh(machine)
 
+        try:
+            await publish_machine(machine, old_network_ip=old_network_ip)
+        except Exception as e:
+            logger.error(f"Failed to publish machine to registry: {str(e)}")
+
         return {
             "id": machine.id,
             "network_ip": machine.network_ip,
@@ -277,13 +244,6 @@ async def update_machine(
     except Exception as e:
         logger.error(f"Unexpected error updating machine: {str(e)}")
         
-        # Rollback Redis if it was updated
-        if redis_updated:
-            try:
-                await redis_client.set(f"network_ip:{machine.id}", old_network_ip)
-            except Exception as redis_err:
-                logger.error(f"Failed to rollback Redis: {str(redis_err)}")
-        
         # Rollback LiteLLM if it was updated
         if litellm_updated:
             try:
@@ -381,6 +341,12 @@ async def delete_auth_token(
     db.add(token)
     await db.commit()
 
+    # Invalidate the cache on every worker
+    try:
+        await revoke_token(api_token)
+    except Exception as e:
+        logger.error(f"Error invalidating token cache: {e}")
+
     return None
 
 
@@ -465,15 +431,13 @@ async def delete_machine(
         
         logger.info(f"Soft-deleted {len(tokens)} tokens for machine {machine_id}")
 
-        # Step 3: Remove from Redis
+        # Step 3: Remove from the machine registry
         try:
-            await redis_client.delete(f"network_ip:{machine_id}")
-            await redis_client.delete(f"machine_id:{network_ip}")
-            await redis_client.delete(f"liveness:{machine_id}")
-            logger.info(f"Removed Redis entries for machine {machine_id}")
+            await remove_machine(machine_id, network_ip)
+            logger.info(f"Removed machine {machine_id} from the registry")
         except Exception as e:
-            logger.error(f"Failed to remove Redis entries: {str(e)}")
-            # Continue even if Redis cleanup fails
+            logger.error(f"Failed to remove machine from the registry: {str(e)}")
+            # Continue even if the registry cleanup fails
 
         # Step 4: Delete the machine from database
         await db.delete(machine)
@@ -17,6 +17,13 @@ from src.router.utils.opensearch import (
     OPENSEARCH_CREDITS_INDEX,
 )
 from src.router.utils.logger import logger
+from src.router.utils.pagination import (
+    approximate_count,
+    decode_cursor,
+    estimated_rows,
+    keyset_nulls_last,
+    next_cursor,
+)
 import asyncio
 
 router = APIRouter()
@@ -71,6 +78,8 @@ async def list_users(
     min_credits: Optional[float] = None,
     max_credits: Optional[float] = None,
     provider: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     user: User = Depends(verify_admin),
 ):
     def apply_filters(query):
@@ -91,29 +100,52 @@ async def list_users(
     offset = (page - 1) * per_page
 
     # Main query for users
-    query = apply_filters(select(UserModel))
+    filtered = apply_filters(select(UserModel))
+    descending = sort_order == SortOrder.DESC
+    query = filtered
+    next_page = None
 
     # Apply sorting
-    if sort_by:
+    if sort_by and sort_by != SortField.CREATED_AT:
         sort_column = getattr(UserModel, sort_by.value)
-        if sort_order == SortOrder.DESC:
+        if descending:
             sort_column = sort_column.desc()
-        query = query.order_by(sort_column)
+        query = query.order_by(sort_column).offset(offset).limit(per_page)
+        users = (await db.exec(query)).all()
     else:
-        query = query.order_by(UserModel.created_at.desc())
-
-    # Count query
-    count_query = apply_filters(select(func.count()).select_from(UserModel))
-    total_users = await db.exec(count_query)
-    total_users = total_users.one()
-
-    users = await db.exec(query.offset(offset).limit(per_page))
+        # Keyset pages on (created_at, id), users without a created_at last;
+        # page is kept for old clients
+        columns = [UserModel.created_at, UserModel.id]
+        after = decode_cursor(cursor, (datetime, uuid.UUID)) if cursor else None
+        if after is None and offset:
+            order = [c.desc() if descending else c.asc() for c in columns]
+            query = query.order_by(order[0].nulls_last(), order[1])
+            users = (await db.exec(query.offset(offset).limit(per_page))).all()
+        else:
+            users = await keyset_nulls_last(
+                db, query, columns, after, descending, per_page
+            )
+        next_page = next_cursor(users, per_page, ("created_at", "id"))
+
+    # Totals are approximate so that they cost the same on any table size
+    total_users = None
+    exact = True
+    if include_total:
+        unfiltered = (
+            not search and min_credits is None and max_credits is None and not provider
+        )
+        if unfiltered:
+            total_users, exact = await estimated_rows(db, '"user"'), False
+        else:
+            total_users, exact = await approximate_count(db, filtered)
 
     return {
-        "users": users.all(),
+        "users": users,
         "total": total_users,
+        "total_is_estimate": not exact,
         "page": page,
         "per_page": per_page,
+        "next_cursor": next_page,
     }
 
 
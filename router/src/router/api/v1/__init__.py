@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from .flows import router as flows_router
+from .flow_batches import router as flow_batches_router
 from .tokens import router as tokens_router
 from .credits import router as credits_router
 from .logs import router as logs_router
@@ -16,6 +17,7 @@ router = APIRouter()
 # Include all routers
 router.include_router(machines_router, tags=["machines"])
 router.include_router(flows_router, tags=["flows"])
+router.include_router(flow_batches_router, tags=["flows"])
 router.include_router(tokens_router, tags=["tokens"])
 router.include_router(credits_router, tags=["credits"])
 router.include_router(logs_router, tags=["logs"])
@@ -44,10 +44,17 @@ LIST_FLOWS_DOCS = {
     "summary": "List All Flows",
     "description": """Retrieves a list of all available flows.
 
+### Query Parameters
+- `limit`: Number of flows per page (optional, max: 500)
+- `cursor`: Value of the `X-Next-Cursor` header of the previous page (optional)
+
 ### Notes
-- Returns all flows accessible to the user
+- Without `limit` or `cursor`, returns all flows accessible to the user in
+  one response. Pass either one to page; pages hold 100 flows unless `limit`
+  is given
 - Empty array if no flows exist
-- Flows are ordered by creation date (newest first)""",
+- Flows are ordered by creation date (newest first)
+- `X-Next-Cursor` is only set when another page may follow""",
     "response_description": "Returns an array of flow objects",
     "responses": {
         200: {
@@ -57,3 +64,161 @@ LIST_FLOWS_DOCS = {
         401: UNAUTHORIZED_RESPONSE,
     },
 }
+
+FLOW_BATCH_EXAMPLE = {
+    "id": "5f0c3c7e9a1b4d2e8f6a7b8c9d0e1f2a",
+    "flow_id": 123,
+    "model": "gpt-4o-mini",
+    "status": "running",
+    "total": 50000,
+    "completed": 12000,
+    "failed": 3,
+    "cost": 4.21,
+    "billed": 4.02,
+    "error": None,
+}
+
+NOT_FOUND_RESPONSE = {
+    "description": "Flow batch not found",
+    "content": {"application/json": {"example": {"detail": "Flow batch not found"}}},
+}
+
+CREATE_FLOW_BATCH_DOCS = {
+    "summary": "Create a Flow Batch Job",
+    "description": """Runs a flow over every row of a JSONL dataset in the background.
+
+### Request Body
+One JSON object per line (`application/x-ndjson`):
+```json
+{"id": "row-1", "variables": {"language": "French"}, "messages": [{"role": "user", "content": "Hello"}]}
+```
+- `id`: Optional, echoed in the row's result
+- `variables`: Values for the flow's `{{variables}}`; all are required
+- `messages`: Conversation appended after the flow's system prompt
+
+### Query Parameters
+- `model`: Model to run every row with
+- `concurrency`: Rows in flight at once (optional, default: 32, max: 256)
+- `max_tokens`: Completion limit per row (optional)
+
+### Notes
+- The whole dataset is validated before the job is queued
+- Progress is checkpointed per row; a job survives router restarts and is
+  resumed by another worker
+- Cost is debited every few seconds while the job runs. When credits run
+  out the job is paused and can be resumed after a top-up
+- Rows do not count against the API key's request and token rate limits;
+  throughput is bounded by `concurrency` instead""",
+    "status_code": 202,
+    "response_description": "Returns the queued job",
+    "responses": {
+        202: {
+            "description": "Job queued",
+            "content": {
+                "application/json": {
+                    "example": {**FLOW_BATCH_EXAMPLE, "status": "queued", "completed": 0}
+                }
+            },
+        },
+        400: {
+            "description": "Invalid dataset or parameters",
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Row 3: Missing required variables: language"}
+                }
+            },
+        },
+        401: UNAUTHORIZED_RESPONSE,
+        402: {
+            "description": "Payment Required - Insufficient credits",
+            "content": {
+                "application/json": {"example": {"detail": "Insufficient credits"}}
+            },
+        },
+        404: {
+            "description": "Flow not found",
+            "content": {"application/json": {"example": {"detail": "Flow not found"}}},
+        },
+    },
+}
+
+GET_FLOW_BATCH_DOCS = {
+    "summary": "Get Flow Batch Job",
+    "description": """Returns the progress of a flow batch job.
+
+### Status
+- `queued`, `running`: rows are being processed
+- `paused`: stopped because credits ran out (see `error`)
+- `completed`, `cancelled`: finished; results are kept for 7 days""",
+    "response_description": "Returns the job",
+    "responses": {
+        200: {
+            "description": "Job found",
+            "content": {"application/json": {"example": FLOW_BATCH_EXAMPLE}},
+        },
+        401: UNAUTHORIZED_RESPONSE,
+        404: NOT_FOUND_RESPONSE,
+    },
+}
+
+FLOW_BATCH_RESULTS_DOCS = {
+    "summary": "Stream Flow Batch Results",
+    "description": """Streams the results of a flow batch job as NDJSON, in completion order.
+
+### Query Parameters
+- `offset`: Number of results to skip, e.g. the lines already read (optional, default: 0)
+- `follow`: Keep the stream open until the job finishes (optional, default: true)
+
+### Result Lines
+```json
+{"index": 0, "id": "row-1", "status": "ok", "content": "Bonjour", "usage": {...}, "cost": 0.0001}
+{"index": 1, "id": "row-2", "status": "error", "error": "..."}
+```
+A row may appear twice if its worker stopped before the row was checkpointed.""",
+    "response_description": "NDJSON stream of row results",
+    "responses": {
+        200: {"description": "Result stream", "content": {"application/x-ndjson": {}}},
+        401: UNAUTHORIZED_RESPONSE,
+        404: NOT_FOUND_RESPONSE,
+    },
+}
+
+CANCEL_FLOW_BATCH_DOCS = {
+    "summary": "Cancel Flow Batch Job",
+    "description": "Stops a flow batch job. Rows that already ran are kept and billed.",
+    "response_description": "Returns the job",
+    "responses": {
+        200: {
+            "description": "Job cancelled",
+            "content": {
+                "application/json": {
+                    "example": {**FLOW_BATCH_EXAMPLE, "status": "cancelled"}
+                }
+            },
+        },
+        401: UNAUTHORIZED_RESPONSE,
+        404: NOT_FOUND_RESPONSE,
+    },
+}
+
+RESUME_FLOW_BATCH_DOCS = {
+    "summary": "Resume Flow Batch Job",
+    "description": "Requeues a paused job; rows that already ran are skipped.",
+    "response_description": "Returns the job",
+    "responses": {
+        200: {
+            "description": "Job requeued",
+            "content": {
+                "application/json": {"example": {**FLOW_BATCH_EXAMPLE, "status": "queued"}}
+            },
+        },
+        400: {
+            "description": "Job is not paused",
+            "content": {
+                "application/json": {"example": {"detail": "Only paused jobs can be resumed"}}
+            },
+        },
+        401: UNAUTHORIZED_RESPONSE,
+        404: NOT_FOUND_RESPONSE,
+    },
+}
@@ -254,7 +254,8 @@ verify_doc = {
         }
     ],
     "models": string[],  // List of model identifiers to verify with
-    "min_yes": int      // Minimum number of 'yes' responses required
+    "min_yes": int,     // Minimum number of 'yes' responses required
+    "stream": boolean   // Optional: stream verdicts as server-sent events
 }
 ```
 
@@ -301,7 +302,14 @@ verify_doc = {
 - Distributes verification requests across available machines
 - Returns aggregated results from all models
 - Overall result is 'yes' if at least min_yes models return 'yes'
-- Each model's individual response is included in the results array""",
+- Each model's individual response is included in the results array
+- Returns as soon as the outcome is certain (min_yes reached, or no longer
+  reachable); models still running are cancelled, not billed, and listed with
+  result 'skipped'
+- With `"stream": true`, each verdict is sent as it arrives
+  (`data: {"type": "verdict", "index": int, "result": ..., "model": ...}`),
+  followed by `data: {"type": "result", "result": "yes" | "no"}` and
+  `data: [DONE]`""",
     "response_description": "Returns verification results from all models",
     "responses": {
         200: {
@@ -354,3 +362,50 @@ verify_doc = {
         },
     },
 }
+
+
+verify_batch_doc = {
+    "description": """Verifies many claims against the same set of models in one request.
+
+### Request Body
+```json
+{
+    "claims": [
+        {
+            "id": string,      // Optional: echoed back with the claim's result
+            "messages": [{"role": "user" | "assistant" | "system", "content": string}]
+        }
+    ],
+    "models": string[],  // Models every claim is verified with
+    "min_yes": int       // Minimum number of 'yes' responses per claim
+}
+```
+
+### Response Format
+Newline-delimited JSON (`application/x-ndjson`), one line per claim in the
+order claims finish:
+```json
+{"index": 0, "id": "claim-1", "result": "yes" | "no", "results": [...]}
+```
+`results` has the same shape as the `/v1/verify` results.
+
+### Notes
+- Credits for every claim are reserved up front; the actual cost is debited
+  once, when the batch ends
+- Each claim stops as soon as its outcome is certain, like `/v1/verify`
+- Model calls run with bounded concurrency (`VERIFY_BATCH_CONCURRENCY`)
+- At most `VERIFY_BATCH_MAX_CLAIMS` claims per request""",
+    "response_description": "Streams one verification result per claim",
+    "responses": {
+        200: {
+            "description": "Claim results as NDJSON",
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"index": 0, "id": "claim-1", "result": "yes", "results": []}\n'
+                }
+            },
+        },
+        400: {"description": "Invalid request parameters"},
+        402: {"description": "Insufficient credits"},
+    },
+}
@@ -0,0 +1,922 @@
+"""
+Flow batch jobs: run a flow over every row of an uploaded JSONL dataset.
+
+A job lives in Redis:
+
+- ``flow_batch:{job_id}``: hash with the job's parameters, status, counters
+  and the flow's compiled prompt template (snapshotted at upload)
+- ``flow_batch:{job_id}:rows``: list of validated input rows
+- ``flow_batch:{job_id}:done``: bitmap of rows that have a result
+- ``flow_batch:{job_id}:results``: list of NDJSON result lines, in
+  completion order
+- ``flow_batch:jobs``: set of jobs that still have rows to run
+
+Every worker runs a ``FlowBatchRunner`` that adopts jobs from the set by
+taking a lease (``flow_batch:{job_id}:lease``) and renews it while it works on
+them. A job whose worker stops (deploy, crash) is picked up by whichever
+worker next finds its lease expired, and continues after the rows in the
+``done`` bitmap. Rows run at least once: a row that finished upstream but
+was not checkpointed yet runs again. They are recorded exactly once: the
+checkpoint only appends a result, and bumps the counters and the bill, when
+it is the one that sets the row's bit.
+
+Upstream calls go through the same hedged routing as chat completions, at
+most ``concurrency`` rows per job and FLOW_BATCH_WORKER_CONCURRENCY per
+worker. Rows are not counted against the API key's RPM/TPM limits or the
+interactive admission queue; those two bounds are what keeps a batch from
+crowding out live traffic. Costs accrue in the job hash and are debited every
+FLOW_BATCH_DEBIT_INTERVAL_SEC together with renewing a credit hold that
+covers a window of ``concurrency`` rows, each priced like the dataset's
+largest row. Rows that finish faster than that trigger the debit early: no
+row is started while the cost accrued since the last debit exceeds the hold.
+The job is paused when no credits are left.
+
+Every recorded row bumps the machine and model stats and is logged like a
+chat completion (``model_usage`` document and inference log); every debit
+writes a ``credit_history`` document.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from src.router.api.v1.docs.flows import (
+    CANCEL_FLOW_BATCH_DOCS,
+    CREATE_FLOW_BATCH_DOCS,
+    FLOW_BATCH_RESULTS_DOCS,
+    GET_FLOW_BATCH_DOCS,
+    RESUME_FLOW_BATCH_DOCS,
+)
+from src.router.api.v1.network import (
+    FIXED_WALLET_ADDRESS,
+    create_upstream_completion,
+)
+from src.router.core.config import (
+    FLOW_BATCH_DEBIT_INTERVAL_SEC,
+    FLOW_BATCH_DEFAULT_CONCURRENCY,
+    FLOW_BATCH_LEASE_SEC,
+    FLOW_BATCH_MAX_CONCURRENCY,
+    FLOW_BATCH_MAX_ROWS,
+    FLOW_BATCH_POLL_INTERVAL_SEC,
+    FLOW_BATCH_RETENTION_SEC,
+    FLOW_BATCH_ROW_ATTEMPTS,
+    FLOW_BATCH_WORKER_CONCURRENCY,
+    INFERENCE_LOGS_WEBHOOK_URL,
+)
+from src.router.core.security import verify_user
+from src.router.core.types import User
+from src.router.db.session import DBSession, get_session_context
+from src.router.schemas.flows import FlowBatchRow
+from src.router.utils.billing import (
+    CREDIT_HOLDS_KEY,
+    MACHINE_STATS_KEY,
+    MODEL_STATS_KEY,
+    USER_CREDIT_KEY,
+)
+from src.router.utils.circuit_breaker import circuit_breakers
+from src.router.utils.flow_cache import PromptTemplate, flow_cache
+from src.router.utils.hedging import hedger
+from src.router.utils.inference_logs import inference_log_sender
+from src.router.utils.logger import logger
+from src.router.utils.metrics import FLOW_BATCH_JOBS_RUNNING, FLOW_BATCH_ROWS
+from src.router.utils.nr import track
+from src.router.utils.opensearch import (
+    OPENSEARCH_CREDITS_INDEX,
+    OPENSEARCH_LLM_USAGE_LOG_INDEX,
+    bulk_indexer,
+)
+from src.router.utils.redis import redis_client
+from src.router.utils.settings import get_supported_models
+from src.router.utils.user import (
+    approximate_usage,
+    estimate_request_cost,
+    get_user_credits,
+    reserve_credits,
+)
+
+router = APIRouter()
+
+JOBS_KEY = "flow_batch:jobs"
+META_KEY = "flow_batch:{job_id}"
+ROWS_KEY = "flow_batch:{job_id}:rows"
+DONE_KEY = "flow_batch:{job_id}:done"
+RESULTS_KEY = "flow_batch:{job_id}:results"
+LEASE_KEY = "flow_batch:{job_id}:lease"
+
+ROWS_PER_WRITE = 1000
+ROWS_PER_READ = 500
+RESULTS_PER_READ = 1000
+RESULTS_POLL_SEC = 1.0
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# KEYS[1]  job hash
+# ARGV[1]  new status
+# ARGV[2:] statuses the job may currently be in
+_TRANSITION_SCRIPT = """
+local status = redis.call('HGET', KEYS[1], 'status')
+for i = 2, #ARGV do
+    if status == ARGV[i] then
+        redis.call('HSET', KEYS[1], 'status', ARGV[1])
+        return 1
+    end
+end
+return 0
+"""
+
+# Debits the job's unbilled cost and releases its credit hold atomically, so
+# a restart can neither lose nor repeat a debit.
+#
+# KEYS[1]  user credit key
+# KEYS[2]  user credit holds zset
+# KEYS[3]  job hash
+# ARGV[1]  hold member to release ("" for none)
+#
+# Returns the amount debited and the balance after the debit.
+_SETTLE_SCRIPT = """
+local amount = tonumber(redis.call('HGET', KEYS[3], 'unbilled') or '0')
+local balance = redis.call('GET', KEYS[1]) or '0'
+if amount > 0 then
+    balance = redis.call('INCRBYFLOAT', KEYS[1], -amount)
+    redis.call('HINCRBYFLOAT', KEYS[3], 'unbilled', -amount)
+    redis.call('HINCRBYFLOAT', KEYS[3], 'billed', amount)
+end
+if ARGV[1] ~= '' then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+end
+return {tostring(amount), balance}
+"""
+
+# KEYS[1]  lease key
+# ARGV[1]  owner
+# ARGV[2]  ttl in seconds ("0" releases the lease)
+_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+if ARGV[2] == '0' then
+    return redis.call('DEL', KEYS[1])
+end
+return redis.call('EXPIRE', KEYS[1], ARGV[2])
+"""
+
+# Records a row's result unless it already has one (a row that ran twice,
+# e.g. on two workers after a lost lease, or a retried checkpoint).
+#
+# KEYS[1]  results list
+# KEYS[2]  done bitmap
+# KEYS[3]  job hash
+# KEYS[4]  machine stats hash (optional, together with KEYS[5])
+# KEYS[5]  model stats hash (optional)
+# ARGV[1]  row index
+# ARGV[2]  result line
+# ARGV[3]  counter to bump ("completed" or "failed")
+# ARGV[4]  cost
+# ARGV[5]  total tokens
+_CHECKPOINT_SCRIPT = """
+if redis.call('SETBIT', KEYS[2], ARGV[1], 1) == 1 then
+    return 0
+end
+redis.call('RPUSH', KEYS[1], ARGV[2])
+redis.call('HINCRBY', KEYS[3], ARGV[3], 1)
+local cost = tonumber(ARGV[4])
+if cost > 0 then
+    redis.call('HINCRBYFLOAT', KEYS[3], 'cost', cost)
+    redis.call('HINCRBYFLOAT', KEYS[3], 'unbilled', cost)
+end
+if KEYS[4] then
+    redis.call('HINCRBY', KEYS[4], 'tokens', ARGV[5])
+    redis.call('HINCRBY', KEYS[4], 'requests', 1)
+    redis.call('HINCRBYFLOAT', KEYS[4], 'cost', cost)
+    redis.call('HINCRBY', KEYS[5], 'tokens', ARGV[5])
+    redis.call('HINCRBY', KEYS[5], 'requests', 1)
+end
+return 1
+"""
+
+_transition = redis_client.register_script(_TRANSITION_SCRIPT)
+_checkpoint = redis_client.register_script(_CHECKPOINT_SCRIPT)
+_settle = redis_client.register_script(_SETTLE_SCRIPT)
+_lease = redis_client.register_script(_LEASE_SCRIPT)
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _row_done(done: bytes, idx: int) -> bool:
+    """Whether bit ``idx`` is set in a bitmap written with SETBIT."""
+    byte = idx >> 3
+    return byte < len(done) and bool(done[byte] & (0x80 >> (idx & 7)))
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+async def transition(job_id: str, status: str, *allowed: str) -> bool:
+    keys = [META_KEY.format(job_id=job_id)]
+    return bool(await _transition(keys=keys, args=[status, *allowed]))
+
+
+async def settle(
+    job_id: str,
+    user_id: str,
+    hold_member: Optional[str],
+    model: Optional[str] = None,
+    flow_id: Optional[str] = None,
+) -> float:
+    """Debit the job's accrued cost and release ``hold_member``.
+
+    A debit is recorded in the user's credit history.
+    """
+    keys = [
+        USER_CREDIT_KEY.format(user_id=user_id),
+        CREDIT_HOLDS_KEY.format(user_id=user_id),
+        META_KEY.format(job_id=job_id),
+    ]
+    amount, balance = await _settle(keys=keys, args=[hold_member or ""])
+    amount, balance = float(amount), float(balance)
+    if amount <= 0:
+        return amount
+
+    try:
+        bulk_indexer.index(
+            OPENSEARCH_CREDITS_INDEX,
+            {
+                "timestamp": _now(),
+                "user_id": user_id,
+                "doc_type": "credit_history",
+                "amount": -amount,
+                "previous_balance": balance + amount,
+                "new_balance": str(balance),
+                "model": model,
+                "flow_id": flow_id,
+                "flow_batch_id": job_id,
+                "description": f"Flow batch {job_id}",
+            },
+        )
+    except Exception as e:
+        logger.error(f"Failed to log flow batch {job_id} debit: {str(e)}")
+    return amount
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, str]]:
+    raw = await redis_client.hgetall(META_KEY.format(job_id=job_id))
+    return {_decode(k): _decode(v) for k, v in raw.items()} or None
+
+
+async def retire_job(job_id: str) -> None:
+    """Stop scheduling a job and let its data expire."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.srem(JOBS_KEY, job_id)
+        for key in (META_KEY, ROWS_KEY, DONE_KEY, RESULTS_KEY):
+            pipe.expire(key.format(job_id=job_id), FLOW_BATCH_RETENTION_SEC)
+        await pipe.execute()
+
+
+def job_view(meta: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "id": meta["id"],
+        "flow_id": int(meta["flow_id"]),
+        "model": meta["model"],
+        "status": meta["status"],
+        "total": int(meta["total"]),
+        "completed": int(meta.get("completed", 0)),
+        "failed": int(meta.get("failed", 0)),
+        "cost": float(meta.get("cost", 0)),
+        "billed": float(meta.get("billed", 0)),
+        "error": meta.get("error") or None,
+        "created_at": meta.get("created_at"),
+        "finished_at": meta.get("finished_at") or None,
+    }
+
+
+class FlowBatchJob:
+    """One job, run by the worker that holds its lease."""
+
+    def __init__(self, runner: "FlowBatchRunner", meta: Dict[str, str]):
+        self.runner = runner
+        self.id = meta["id"]
+        self.user_id = meta["user_id"]
+        self.api_key_id = int(meta["api_key_id"]) if meta.get("api_key_id") else None
+        self.flow_id = meta.get("flow_id")
+        self.model = meta["model"]
+        self.concurrency = int(meta["concurrency"])
+        self.max_tokens = int(meta["max_tokens"]) if meta.get("max_tokens") else None
+        self.total = int(meta["total"])
+        self.largest_row = int(meta["largest_row"]) if meta.get("largest_row") else None
+        self.template = PromptTemplate.from_dict(json.loads(meta["template"]))
+        self.model_config = None
+        self.hold: Optional[str] = None
+        self.hold_amount = 0.0
+        # Cost of rows recorded since the last debit
+        self.accrued = 0.0
+        self.row_cost = 0.0
+        self._billing = asyncio.Lock()
+        self.stop_reason: Optional[str] = None
+        # Set when a row could not be checkpointed and has to run again
+        self.incomplete = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def run(self) -> None:
+        self.model_config = (await get_supported_models()).get(self.model)
+        if self.model_config is None:
+            await self._pause(f"Unsupported model: {self.model}")
+            return
+        self.row_cost = await self._estimate_row_cost()
+        if not await self._renew_hold():
+            await self._pause("insufficient_credits")
+            return
+
+        keeper = asyncio.create_task(self._keep())
+        try:
+            await self._schedule()
+            if self._tasks:
+                await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        finally:
+            keeper.cancel()
+            for task in list(self._tasks):
+                task.cancel()
+            try:
+                await self._debit(self.hold)
+            except Exception as e:
+                logger.error(f"Failed to settle flow batch {self.id}: {str(e)}")
+            self.hold = None
+
+        if self.stop_reason is None and self.incomplete:
+            # Still in JOBS_KEY: the next poll picks up the missing rows
+            await transition(self.id, "queued", "running")
+            return
+        if self.stop_reason is None:
+            await transition(self.id, "completed", "running")
+            await redis_client.hset(
+                META_KEY.format(job_id=self.id), "finished_at", _now()
+            )
+            await retire_job(self.id)
+        elif self.stop_reason == "cancelled":
+            await retire_job(self.id)
+        elif self.stop_reason == "insufficient_credits":
+            await self._pause("insufficient_credits")
+        # "lease_lost": another worker owns the job now
+
+        meta = await get_job(self.id) or {}
+        track(
+            "flow_batch_stopped",
+            {
+                "job_id": self.id,
+                "user_id": self.user_id,
+                "reason": self.stop_reason or "completed",
+                "completed": int(meta.get("completed", 0)),
+                "failed": int(meta.get("failed", 0)),
+                "cost": float(meta.get("cost", 0)),
+            },
+        )
+
+    async def _schedule(self) -> None:
+        limit = asyncio.Semaphore(self.concurrency)
+        done = await redis_client.get(DONE_KEY.format(job_id=self.id)) or b""
+        rows_key = ROWS_KEY.format(job_id=self.id)
+        for start in range(0, self.total, ROWS_PER_READ):
+            rows = await redis_client.lrange(rows_key, start, start + ROWS_PER_READ - 1)
+            for offset, raw in enumerate(rows):
+                idx = start + offset
+                if _row_done(done, idx):
+                    continue
+                await limit.acquire()
+                # Debit early when rows finish faster than the hold assumed
+                used_up = self.accrued > 0 and self.accrued >= self.hold_amount
+                if used_up and not await self._rebill():
+                    self._stop("insufficient_credits")
+                if self.stop_reason is not None:
+                    limit.release()
+                    return
+                task = asyncio.create_task(self._run_row(idx, raw, limit))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _run_row(self, idx: int, raw, limit: asyncio.Semaphore) -> None:
+        try:
+            async with self.runner.slots:
+                line, cost, usage_doc = await self.complete(idx, json.loads(raw))
+            if await self._record(idx, line, cost, usage_doc):
+                self.accrued += cost
+        except Exception as e:
+            # Not checkpointed: the row runs again when the job is resumed
+            self.incomplete = True
+            logger.error(f"Flow batch {self.id} row {idx} failed: {str(e)}")
+        finally:
+            limit.release()
+
+    async def complete(
+        self, idx: int, row: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], float, Optional[Dict[str, Any]]]:
+        """Run one row; returns its result line, cost and ``model_usage``
+        document (None for a failed row)."""
+        messages = [
+            {"role": "system", "content": self.template.render(row["variables"])},
+            *row["messages"],
+        ]
+        params: Dict[str, Any] = {
+            "model": self.model,
+            "messages": messages,
+            "stream": False,
+        }
+        if self.max_tokens:
+            params["max_tokens"] = self.max_tokens
+
+        started = time.time()
+        for attempt in range(FLOW_BATCH_ROW_ATTEMPTS):
+            try:
+                response, machine_id = await hedger.run(
+                    self.model,
+                    lambda tried: create_upstream_completion(params, tried),
+                )
+                break
+            except Exception as e:
+                if attempt + 1 == FLOW_BATCH_ROW_ATTEMPTS:
+                    FLOW_BATCH_ROWS.labels(status="error").inc()
+                    line = {"index": idx, "id": row.get("id"), "status": "error"}
+                    return {**line, "error": str(e)}, 0.0, None
+                await asyncio.sleep(2**attempt)
+
+        circuit_breakers.record(self.model, machine_id, ok=True)
+        content = (response.choices[0].message.content if response.choices else "") or ""
+        if response.usage:
+            usage = {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens,
+            }
+        else:
+            usage = approximate_usage((m["content"] for m in messages), content)
+        cost = (
+            usage["prompt_tokens"] * self.model_config.prompt_token
+            + usage["completion_tokens"] * self.model_config.completion_token
+        )
+        FLOW_BATCH_ROWS.labels(status="ok").inc()
+        usage_doc = {
+            "timestamp": _now(),
+            "user_id": self.user_id,
+            "api_key_id": self.api_key_id,
+            "model": self.model,
+            "original_model": self.model,
+            **usage,
+            "ttft": None,
+            "total_response_time": time.time() - started,
+            "machine_id": str(machine_id),
+            "flow_id": self.flow_id,
+            "flow_batch_id": self.id,
+            "cost": cost,
+            "request": params,
+            "response": content,
+            "doc_type": "model_usage",
+        }
+        return {
+            "index": idx,
+            "id": row.get("id"),
+            "status": "ok",
+            "content": content,
+            "usage": usage,
+            "cost": cost,
+        }, cost, usage_doc
+
+    async def _record(
+        self,
+        idx: int,
+        line: Dict[str, Any],
+        cost: float,
+        usage_doc: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """Checkpoint a row; returns False if it had already been recorded."""
+        keys = [
+            RESULTS_KEY.format(job_id=self.id),
+            DONE_KEY.format(job_id=self.id),
+            META_KEY.format(job_id=self.id),
+        ]
+        if usage_doc is not None:
+            # The counters billing.charge_credits keeps for a completion
+            keys.append(MACHINE_STATS_KEY.format(machine_id=usage_doc["machine_id"]))
+            keys.append(MODEL_STATS_KEY.format(model=self.model))
+        recorded = await _checkpoint(
+            keys=keys,
+            args=[
+                idx,
+                json.dumps(line),
+                "completed" if line["status"] == "ok" else "failed",
+                repr(float(cost)),
+                usage_doc["total_tokens"] if usage_doc is not None else 0,
+            ],
+        )
+        if not recorded:
+            logger.warning(f"Flow batch {self.id} row {idx} was already recorded")
+            return False
+
+        if usage_doc is not None:
+            self._log_usage(usage_doc)
+        return True
+
+    def _log_usage(self, usage_doc: Dict[str, Any]) -> None:
+        try:
+            bulk_indexer.index(OPENSEARCH_LLM_USAGE_LOG_INDEX, usage_doc)
+            if INFERENCE_LOGS_WEBHOOK_URL:
+                inference_log_sender.submit(
+                    {
+                        "walletAddress": FIXED_WALLET_ADDRESS,
+                        "logId": str(uuid.uuid4()),
+                        "@timestamp": usage_doc["timestamp"],
+                    }
+                )
+        except Exception as e:
+            logger.error(f"Failed to log flow batch {self.id} usage: {str(e)}")
+
+    async def _debit(self, hold: Optional[str]) -> float:
+        return await settle(self.id, self.user_id, hold, self.model, self.flow_id)
+
+    async def _keep(self) -> None:
+        """Renew the lease, debit accrued cost and watch for cancellation."""
+        interval = min(FLOW_BATCH_DEBIT_INTERVAL_SEC, FLOW_BATCH_LEASE_SEC / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.runner.renew_lease(self.id):
+                    self._stop("lease_lost")
+                    return
+                status = await redis_client.hget(META_KEY.format(job_id=self.id), "status")
+                if _decode(status) == "cancelled":
+                    self._stop("cancelled")
+                    return
+                if not await self._rebill():
+                    self._stop("insufficient_credits")
+                    return
+            except Exception as e:
+                logger.error(f"Flow batch {self.id} upkeep failed: {str(e)}")
+
+    def _stop(self, reason: str) -> None:
+        self.stop_reason = reason
+        if reason != "insufficient_credits":
+            # Rows in flight are covered by the hold and may finish otherwise
+            for task in list(self._tasks):
+                task.cancel()
+
+    async def _rebill(self) -> bool:
+        """Debit the accrued cost and reserve credits for the next window."""
+        async with self._billing:
+            hold, self.hold = self.hold, None
+            self.accrued = 0.0
+            await self._debit(hold)
+            return await self._renew_hold()
+
+    async def _estimate_row_cost(self) -> float:
+        """Upper-bound cost of one row, priced from the dataset's largest row."""
+        texts = list(self.template.segments)
+        if self.largest_row is not None:
+            raw = await redis_client.lindex(
+                ROWS_KEY.format(job_id=self.id), self.largest_row
+            )
+            if raw:
+                row = json.loads(raw)
+                texts = [
+                    self.template.render(row["variables"]),
+                    *(m["content"] for m in row["messages"]),
+                ]
+        return estimate_request_cost(self.model_config, texts, self.max_tokens)
+
+    async def _renew_hold(self) -> bool:
+        """Reserve credits for a full window of rows in flight."""
+        estimate = self.concurrency * self.row_cost
+        async with get_session_context() as db:
+            hold = await reserve_credits(self.user_id, estimate, db)
+        if hold is None:
+            return False
+        self.hold = hold.member
+        self.hold_amount = hold.amount
+        return True
+
+    async def _pause(self, error: str) -> None:
+        await transition(self.id, "paused", "queued", "running")
+        await redis_client.hset(META_KEY.format(job_id=self.id), "error", error)
+        await retire_job(self.id)
+
+
+class FlowBatchRunner:
+    """Adopts and runs flow batch jobs on this worker."""
+
+    def __init__(self, poll_interval: float = FLOW_BATCH_POLL_INTERVAL_SEC):
+        self.poll_interval = poll_interval
+        self.owner = uuid.uuid4().hex
+        self.slots = asyncio.Semaphore(FLOW_BATCH_WORKER_CONCURRENCY)
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def wake(self) -> None:
+        """Look for new jobs now instead of at the next poll."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def renew_lease(self, job_id: str) -> bool:
+        keys = [LEASE_KEY.format(job_id=job_id)]
+        return bool(await _lease(keys=keys, args=[self.owner, FLOW_BATCH_LEASE_SEC]))
+
+    async def _release_lease(self, job_id: str) -> None:
+        try:
+            await _lease(keys=[LEASE_KEY.format(job_id=job_id)], args=[self.owner, 0])
+        except Exception as e:
+            logger.error(f"Failed to release flow batch lease {job_id}: {str(e)}")
+
+    async def _adopt(self) -> None:
+        for raw in await redis_client.smembers(JOBS_KEY):
+            job_id = _decode(raw)
+            if job_id in self._jobs:
+                continue
+            leased = await redis_client.set(
+                LEASE_KEY.format(job_id=job_id),
+                self.owner,
+                nx=True,
+                ex=FLOW_BATCH_LEASE_SEC,
+            )
+            if leased:
+                task = asyncio.create_task(
+                    self._execute(job_id), name=f"flow-batch-{job_id}"
+                )
+                self._jobs[job_id] = task
+                task.add_done_callback(lambda _, j=job_id: self._jobs.pop(j, None))
+
+    async def _execute(self, job_id: str) -> None:
+        FLOW_BATCH_JOBS_RUNNING.inc()
+        try:
+            meta = await get_job(job_id)
+            if meta is None or not await transition(
+                job_id, "running", *ACTIVE_STATUSES
+            ):
+                # Cancelled or paused since it was listed
+                await redis_client.srem(JOBS_KEY, job_id)
+                return
+            track(
+                "flow_batch_started",
+                {"job_id": job_id, "user_id": meta["user_id"], "total": int(meta["total"])},
+            )
+            await FlowBatchJob(self, meta).run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Flow batch {job_id} failed: {str(e)}")
+        finally:
+            FLOW_BATCH_JOBS_RUNNING.dec()
+            await self._release_lease(job_id)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._adopt()
+            except Exception as e:
+                logger.error(f"Failed to adopt flow batch jobs: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="flow-batch-runner")
+
+    async def stop(self) -> None:
+        """Stop adopting jobs and hand the running ones back for another
+        worker to resume."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        jobs = list(self._jobs.values())
+        for task in jobs:
+            task.cancel()
+        await asyncio.gather(self._task, *jobs, return_exceptions=True)
+        self._task = None
+
+
+flow_batch_runner = FlowBatchRunner()
+
+
+async def _read_lines(request: Request) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+def parse_row(line: bytes, number: int, template: PromptTemplate) -> str:
+    """Validate one dataset line; returns the row as stored for the job."""
+    try:
+        row = FlowBatchRow.model_validate_json(line)
+    except ValidationError as e:
+        error = e.errors()[0]
+        location = ".".join(str(part) for part in error["loc"])
+        detail = f"{location}: {error['msg']}" if location else error["msg"]
+        raise HTTPException(status_code=400, detail=f"Row {number}: {detail}")
+
+    if any(msg.role == "system" for msg in row.messages):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Row {number}: System message is not allowed in request",
+        )
+    missing = sorted({slot for slot in template.slots if slot not in row.variables})
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Row {number}: Missing required variables: {', '.join(missing)}",
+        )
+    return json.dumps(
+        {
+            "id": row.id,
+            "variables": {slot: row.variables[slot] for slot in template.slots},
+            "messages": [msg.model_dump() for msg in row.messages],
+        }
+    )
+
+
+async def _owned_job(job_id: str, user: User) -> Dict[str, str]:
+    meta = await get_job(job_id)
+    if meta is None or meta["user_id"] != str(user.id):
+        raise HTTPException(status_code=404, detail="Flow batch not found")
+    return meta
+
+
+@router.post("/v1/flow/{flow_id}/batches", **CREATE_FLOW_BATCH_DOCS)
+async def create_flow_batch(
+    flow_id: int,
+    request: Request,
+    db: DBSession,
+    model: str = Query(..., description="Model to run every row with"),
+    concurrency: int = Query(
+        FLOW_BATCH_DEFAULT_CONCURRENCY, ge=1, le=FLOW_BATCH_MAX_CONCURRENCY
+    ),
+    max_tokens: Optional[int] = Query(None, ge=1),
+    user: User = Depends(verify_user),
+):
+    if model not in await get_supported_models():
+        raise HTTPException(status_code=400, detail=f"Unsupported model: {model}")
+
+    flow = await flow_cache.get(flow_id, db)
+    if flow is None:
+        raise HTTPException(status_code=404, detail="Flow not found")
+
+    if float(await get_user_credits(user.id, db)) <= 0:
+        raise HTTPException(status_code=402, detail="Insufficient credits")
+
+    job_id = uuid.uuid4().hex
+    rows_key = ROWS_KEY.format(job_id=job_id)
+    total = 0
+    pending = []
+    # Sizes the job's credit hold (see FlowBatchJob._estimate_row_cost)
+    largest_row, largest_size = 0, 0
+    try:
+        async for line in _read_lines(request):
+            if not line.strip():
+                continue
+            total += 1
+            if total > FLOW_BATCH_MAX_ROWS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"At most {FLOW_BATCH_MAX_ROWS} rows per batch",
+                )
+            row = parse_row(line, total, flow.template)
+            if len(row) > largest_size:
+                largest_row, largest_size = total - 1, len(row)
+            pending.append(row)
+            if len(pending) == ROWS_PER_WRITE:
+                await redis_client.rpush(rows_key, *pending)
+                pending = []
+        if pending:
+            await redis_client.rpush(rows_key, *pending)
+        if total == 0:
+            raise HTTPException(status_code=400, detail="The dataset is empty")
+    except BaseException:
+        await redis_client.delete(rows_key)
+        raise
+
+    meta = {
+        "id": job_id,
+        "user_id": str(user.id),
+        "api_key_id": "" if user.api_key_id is None else user.api_key_id,
+        "flow_id": flow.id,
+        "model": model,
+        "concurrency": concurrency,
+        "max_tokens": max_tokens or "",
+        "total": total,
+        "largest_row": largest_row,
+        "status": "queued",
+        "completed": 0,
+        "failed": 0,
+        "cost": 0,
+        "billed": 0,
+        "unbilled": 0,
+        "error": "",
+        "template": json.dumps(flow.template.to_dict()),
+        "created_at": _now(),
+        "finished_at": "",
+    }
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(META_KEY.format(job_id=job_id), mapping=meta)
+        pipe.sadd(JOBS_KEY, job_id)
+        await pipe.execute()
+    flow_batch_runner.wake()
+
+    track(
+        "flow_batch_created",
+        {
+            "job_id": job_id,
+            "flow_id": flow.id,
+            "user_id": str(user.id),
+            "model": model,
+            "rows": total,
+            "concurrency": concurrency,
+        },
+    )
+    return job_view({key: str(value) for key, value in meta.items()})
+
+
+@router.get("/v1/flow/batches/{job_id}", **GET_FLOW_BATCH_DOCS)
+async def get_flow_batch(job_id: str, user: User = Depends(verify_user)):
+    return job_view(await _owned_job(job_id, user))
+
+
+@router.get("/v1/flow/batches/{job_id}/results", **FLOW_BATCH_RESULTS_DOCS)
+async def stream_flow_batch_results(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    follow: bool = True,
+    user: User = Depends(verify_user),
+):
+    await _owned_job(job_id, user)
+    results_key = RESULTS_KEY.format(job_id=job_id)
+    meta_key = META_KEY.format(job_id=job_id)
+
+    async def lines():
+        position = offset
+        finished = not follow
+        while True:
+            items = await redis_client.lrange(
+                results_key, position, position + RESULTS_PER_READ - 1
+            )
+            for item in items:
+                yield _decode(item) + "\n"
+            position += len(items)
+            if len(items) == RESULTS_PER_READ:
+                continue
+            if finished:
+                return
+            status = _decode(await redis_client.hget(meta_key, "status"))
+            if status not in ACTIVE_STATUSES:
+                # One more read for results written before the status changed
+                finished = True
+                continue
+            await asyncio.sleep(RESULTS_POLL_SEC)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/v1/flow/batches/{job_id}/cancel", **CANCEL_FLOW_BATCH_DOCS)
+async def cancel_flow_batch(job_id: str, user: User = Depends(verify_user)):
+    await _owned_job(job_id, user)
+    if await transition(job_id, "cancelled", "queued", "running", "paused"):
+        await redis_client.hset(META_KEY.format(job_id=job_id), "finished_at", _now())
+        # A running job settles itself; one without a worker is settled here
+        lease_key = LEASE_KEY.format(job_id=job_id)
+        if await redis_client.set(lease_key, "cancel", nx=True, ex=FLOW_BATCH_LEASE_SEC):
+            meta = await get_job(job_id)
+            await settle(
+                job_id, meta["user_id"], None, meta["model"], meta.get("flow_id")
+            )
+            await redis_client.delete(lease_key)
+            await retire_job(job_id)
+        track("flow_batch_cancelled", {"job_id": job_id, "user_id": str(user.id)})
+    return job_view(await get_job(job_id))
+
+
+@router.post("/v1/flow/batches/{job_id}/resume", **RESUME_FLOW_BATCH_DOCS)
+async def resume_flow_batch(job_id: str, user: User = Depends(verify_user)):
+    await _owned_job(job_id, user)
+    if not await transition(job_id, "queued", "paused"):
+        raise HTTPException(status_code=400, detail="Only paused jobs can be resumed")
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(META_KEY.format(job_id=job_id), "error", "")
+        for key in (META_KEY, ROWS_KEY, DONE_KEY, RESULTS_KEY):
+            pipe.persist(key.format(job_id=job_id))
+        pipe.sadd(JOBS_KEY, job_id)
+        await pipe.execute()
+    flow_batch_runner.wake()
+    track("flow_batch_resumed", {"job_id": job_id, "user_id": str(user.id)})
+    return job_view(await get_job(job_id))
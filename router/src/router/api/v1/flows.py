@@ -1,6 +1,6 @@
 import re
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlmodel import select, func
 from src.router.api.v1.network import chatCompletionGenerate
 from src.router.core.security import verify_user
@@ -20,15 +20,22 @@ from src.router.api.v1.docs.flows import (
 )
 from datetime import datetime, timedelta
 from src.router.utils.redis import redis_client
-import json
 from src.router.utils.logger import logger
-from async_lru import alru_cache
+from src.router.utils.flow_cache import flow_cache
+from src.router.utils.pagination import (
+    decode_cursor,
+    keyset,
+    next_cursor,
+    set_page_headers,
+)
 import traceback
-import httpx
+from src.router.utils.http import http_clients
 import asyncio
 
 router = APIRouter()
 
+FLOWS_PAGE_SIZE = 100
+
 
 async def send_exception_to_healer(exception: Exception, stack_trace: str, flow_id: Optional[str] = None):
     """
@@ -44,12 +51,12 @@ async def send_exception_to_healer(exception: Exception, stack_trace: str, flow_
         }
         
         
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            await client.post(
-                "https://heal.alts.dev/webhook/exception",
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
+        client = http_clients.get("webhooks")
+        await client.post(
+            "https://heal.alts.dev/webhook/exception",
+            json=payload,
+            headers={"Content-Type": "application/json"}
+        )
     except Exception as e:
         # Log the error but don't let it affect the main flow
         logger.warning(f"Failed to send exception to healer: {str(e)}")
@@ -87,13 +94,27 @@ async def create_flow(
     db.add(new_flow)
     await db.commit()
     await db.refresh(new_flow)
+    await flow_cache.store(new_flow)
     return new_flow
 
 
 @router.get("/flows", **LIST_FLOWS_DOCS)
-async def list_all_flows(db: DBSession):
-    flows = await db.exec(select(Flows))
-    return flows.all()
+async def list_all_flows(
+    db: DBSession,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+):
+    after = decode_cursor(cursor, (datetime, int)) if cursor else None
+    query = keyset(select(Flows), [Flows.created_at, Flows.id], after, descending=True)
+    if limit is None and cursor is None:
+        # Unpaged, as before pagination was added
+        return (await db.exec(query)).all()
+
+    limit = limit or FLOWS_PAGE_SIZE
+    flows = (await db.exec(query.limit(limit))).all()
+    set_page_headers(response, next_cursor(flows, limit, ("created_at", "id")))
+    return flows
 
 
 @router.get(
@@ -317,9 +338,8 @@ async def update_flow(
     await db.commit()
     await db.refresh(existing_flow)
 
-    # delete from redis and lru cache
-    await redis_client.delete(f"flow:{flow_id}")
-    get_cached_flow.cache_clear()
+    # Recompile the prompt and drop the old version on every worker
+    await flow_cache.store(existing_flow)
 
     return existing_flow
 
@@ -412,29 +432,10 @@ async def delete_flow(flow_id: str, db: DBSession, user: User = Depends(verify_u
 
     await db.delete(existing_flow)
     await db.commit()
-    await redis_client.delete(f"flow:{flow_id}")
-    get_cached_flow.cache_clear()
+    await flow_cache.forget(existing_flow.id)
     return {"message": "Flow deleted successfully"}
 
 
-@alru_cache(maxsize=100, ttl=300)  # 5 minutes
-async def get_cached_flow(flow_id: int) -> Optional[Flows]:
-    """Get flow from cache with TTL, using async_lru package"""
-    logger.info(f"Cache miss for flow_id: {flow_id}")
-
-    # Try to get from Redis first
-    flow_key = f"flow:{flow_id}"
-    cached_flow = await redis_client.get(flow_key)
-
-    if cached_flow:
-        logger.info(f"Redis cache hit for flow_id: {flow_id}")
-        flow_dict = json.loads(cached_flow)
-        return Flows(**flow_dict)
-
-    logger.info(f"Complete cache miss for flow_id: {flow_id}")
-    return None
-
-
 @router.post(
     "/v1/flow/{flow_id}/chat/completions",
     summary="Generate Chat Completion with Flow",
@@ -675,23 +676,8 @@ async def generate_with_flow_id(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid flow ID format")
 
-    # Try LRU cache first, then Redis, then database
-
-    flow = await get_cached_flow(flow_id_int)
-    logger.info(f"Flow: {flow}")
-    logger.info(f"Flow lru cache: {get_cached_flow.cache_info()}")
-    if not flow:
-        flow = await db.exec(select(Flows).where(Flows.id == flow_id_int))
-        flow = flow.one_or_none()
-        if flow:
-            flow_dict = {
-                "id": flow.id,
-                "name": flow.name,
-                "system_prompt": flow.system_prompt,
-                "variables": flow.variables,
-            }
-            await redis_client.set(f"flow:{flow_id_int}", json.dumps(flow_dict))
-            get_cached_flow.cache_clear()  # Clear LRU cache to update with new value
+    # Worker cache first, then Redis, then database
+    flow = await flow_cache.get(flow_id_int, db)
 
     if not flow:
         track(
@@ -701,7 +687,7 @@ async def generate_with_flow_id(
         raise HTTPException(status_code=404, detail="Flow not found")
 
     system_prompt = flow.system_prompt
-    required_vars = flow.variables
+    required_vars = flow.template.slots
 
     if required_vars:
         if req.variables is None:
@@ -733,10 +719,7 @@ async def generate_with_flow_id(
                 detail=f"Missing required variables: {', '.join(missing_vars)}",
             )
 
-        for var in required_vars:
-            system_prompt = system_prompt.replace(
-                f"{{{{{var}}}}}", str(req.variables[var])
-            )
+        system_prompt = flow.template.render(req.variables)
 
     req.messages.insert(0, Message(role="system", content=system_prompt))
 
@@ -7,7 +7,8 @@ from src.router.utils.opensearch import (
     opensearch_client,
     OPENSEARCH_LLM_USAGE_LOG_INDEX,
 )
-from src.router.utils.redis import redis_client, get_online_machines
+from src.router.utils.redis import redis_client
+from src.router.utils.machine_registry import get_online_machines
 from src.router.utils.nr import track
 from src.router.utils.logger import logger
 
@@ -6,7 +6,9 @@ from src.router.core.security import verify_user, verify_machine
 from src.router.core.types import User
 import time
 from src.router.models.machines import Machine
-from src.router.utils.redis import redis_client, get_online_machines
+from src.router.core.config import MACHINE_LIVENESS_TTL_SEC
+from src.router.schemas.machine import LivenessBatchRequest
+from src.router.utils.machine_registry import machine_registry, record_heartbeats
 from src.router.utils.nr import track
 
 router = APIRouter()
@@ -35,11 +37,11 @@ Checks if a specific machine is currently online and responding.
     deprecated=True,
 )
 async def check_liveness(network_ip: str):
-    # Check if machine is in Redis liveness records
-    async for key in redis_client.scan_iter(match="liveness:*"):
-        nip = await redis_client.hget(key, "network_ip")
-        if nip == network_ip:
-            return {"network_ip": network_ip, "status": "online"}
+    # Look up the machine in the registry snapshot
+    await machine_registry.ensure_fresh()
+    machine_id = machine_registry.machine_id_for_ip(network_ip)
+    if machine_id is not None and machine_registry.is_online(machine_id):
+        return {"network_ip": network_ip, "status": "online"}
 
     return {"network_ip": network_ip, "status": "offline"}
 
@@ -62,14 +64,67 @@ async def check_liveness(network_ip: str):
     response_description="Returns the machine's current status",
 )
 async def check_liveness_by_id(machine_id: str):
-    # Direct check in Redis using machine_id
-    exists = await redis_client.exists(f"liveness:{machine_id}")
-    if exists:
+    await machine_registry.ensure_fresh()
+    if machine_id.isdigit() and machine_registry.is_online(int(machine_id)):
         return {"machine_id": machine_id, "status": "online"}
 
     return {"machine_id": machine_id, "status": "offline"}
 
 
+@router.post(
+    "/liveness/batch",
+    summary="Update Liveness of Several Machines",
+    description="""Records a heartbeat for several machines in one request, e.g.
+from a gateway or a multi-GPU host. The token must be authorized for every
+listed machine; IPs it does not cover are returned in `rejected`.
+
+### Request Body
+```json
+{
+    "network_ips": [string]
+}
+```
+
+### Response Format
+```json
+{
+    "machines": [{"machine_id": string, "network_ip": string}],
+    "rejected": [string],
+    "status": "online",
+    "timestamp": number,
+    "ttl": number
+}
+```""",
+    response_description="Returns the machines marked online",
+)
+async def set_liveness_batch(
+    req: LivenessBatchRequest,
+    machine_auth: dict = Depends(verify_machine),
+):
+    track("set_liveness_batch_request", {"machines_count": len(req.network_ips)})
+
+    authorized = {m["network_ip"]: m["id"] for m in machine_auth["machines"]}
+    accepted = [ip for ip in dict.fromkeys(req.network_ips) if ip in authorized]
+    rejected = [ip for ip in req.network_ips if ip not in authorized]
+    if not accepted:
+        raise HTTPException(
+            status_code=403, detail="Token not authorized for these machines"
+        )
+
+    now = time.time()
+    await record_heartbeats([authorized[ip] for ip in accepted], now)
+
+    return {
+        "machines": [
+            {"machine_id": str(authorized[ip]), "network_ip": ip} for ip in accepted
+        ],
+        "rejected": rejected,
+        "status": "online",
+        "timestamp": now,
+        "ttl": MACHINE_LIVENESS_TTL_SEC,
+    }
+
+
 @router.post(
     "/liveness/{network_ip}",
     summary="Update Machine Liveness",
@@ -87,16 +142,15 @@ async def check_liveness_by_id(machine_id: str):
 ```
 
 ### Technical Details
-- Sets TTL for liveness check
-- Stores current network information in Redis
-- Updates timestamp of last seen
-- TTL is calculated based on initial registration time
+- Records the heartbeat time in the machine registry (a single Redis write)
+- The machine counts as online for `ttl` seconds after the last heartbeat
+- The machine is resolved from the (cached) token, without a database lookup
 
 ### Error Responses
-- `404 Not Found`:
+- `403 Forbidden`:
     ```json
     {
-        "detail": "Machine not found"
+        "detail": "Token not authorized for this machine"
     }
     ```""",
     response_description="Returns the updated machine status",
@@ -112,10 +166,12 @@ async def check_liveness_by_id(machine_id: str):
                 }
             },
         },
-        404: {
-            "description": "Machine not found",
+        403: {
+            "description": "Token not authorized for this machine",
             "content": {
-                "application/json": {"example": {"detail": "Machine not found"}}
+                "application/json": {
+                    "example": {"detail": "Token not authorized for this machine"}
+                }
             },
         },
     },
@@ -123,47 +179,23 @@ async def check_liveness_by_id(machine_id: str):
 async def set_liveness(
     network_ip: str,
     response: Response,
-    db: DBSession,
     machine_auth: dict = Depends(verify_machine),
 ):
     track("set_liveness_request", {"network_ip": network_ip})
 
     # Verify the token is authorized for this machine
-    authorized_ips = [m["network_ip"] for m in machine_auth["machines"]]
-    if network_ip not in authorized_ips:
+    machine_id = next(
+        (m["id"] for m in machine_auth["machines"] if m["network_ip"] == network_ip),
+        None,
+    )
+    if machine_id is None:
         raise HTTPException(
             status_code=403, detail="Token not authorized for this machine"
         )
 
-    # First look up the machine to get its ID
-    machine = await db.exec(select(Machine).where(Machine.network_ip == network_ip))
-    machine = machine.first()
-
-    if not machine:
-        track(
-            "set_liveness_error",
-            {"network_ip": network_ip, "error": "machine_not_found"},
-        )
-        raise HTTPException(status_code=404, detail="Machine not found")
-
     now = time.time()
-    machine_id = str(machine.id)
-    liveness_key = f"liveness:{machine_id}"
-    ttl = 12  # seconds
-
-    # Set the liveness data with a fixed TTL
-    await redis_client.hset(
-        liveness_key,
-        mapping={
-            "network_ip": network_ip,
-            "timestamp": now,
-        },
-    )
-
-    # Map machine_id to network_ip
-    await redis_client.set(f"machine_id:{network_ip}", machine_id)
-
-    await redis_client.expire(liveness_key, ttl)
+    ttl = MACHINE_LIVENESS_TTL_SEC
+    await record_heartbeats([machine_id], now)
 
     # Add debug headers
     response.headers["X-Liveness-Timestamp"] = str(now)
@@ -172,7 +204,7 @@ async def set_liveness(
     logging.debug(f"Updated liveness for machine {machine_id} (IP: {network_ip})")
 
     return {
-        "machine_id": machine_id,
+        "machine_id": str(machine_id),
         "network_ip": network_ip,
         "status": "online",
         "timestamp": now,
@@ -220,7 +252,7 @@ async def list_all_machines(
     machines = await db.exec(query)
     machines = machines.all()
 
-    online_machines = await get_online_machines()
+    await machine_registry.ensure_fresh()
 
     return [
         {
@@ -230,7 +262,9 @@ async def list_all_machines(
             "description": machine.description,
             "created_at": machine.created_at.isoformat(),
             "disabled": machine.disabled,
-            "status": ("online" if str(machine.id) in online_machines else "offline"),
+            "status": (
+                "online" if machine_registry.is_online(machine.id) else "offline"
+            ),
             "traffic_weight": machine.traffic_weight,
             "supported_models": machine.supported_models,
         }
@@ -1,20 +1,32 @@
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any, List
 from fastapi import APIRouter, Depends, Response, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from src.router.utils.user import get_user_credits
+from src.router.utils.user import (
+    CreditHold,
+    approximate_usage,
+    estimate_request_cost,
+    release_credits,
+    reserve_credits,
+)
 from src.router.core.config import (
     LITELLM_API_KEY,
     LITELLM_API_URL,
     INFERENCE_LOGS_WEBHOOK_URL,
+    SSE_PASSTHROUGH,
+    ENABLE_COALESCING,
+    ROUTING_MODE,
+    CIRCUIT_STALL_TIMEOUT_SEC,
+    VERIFY_BATCH_CONCURRENCY,
+    VERIFY_BATCH_MAX_CLAIMS,
 )
 from src.router.core.settings_types import SETTINGS_MODELS
 from src.router.core.types import User
 from src.router.db.session import DBSession
-import httpx
 from src.router.core.security import verify_user
-from src.router.schemas.ai import AiRequest, VerifyRequest
+from src.router.schemas.ai import AiRequest, VerifyBatchRequest, VerifyRequest
 import time
 import json
 import uuid
@@ -23,19 +35,29 @@ from src.router.utils.settings import get_supported_models
 import asyncio
 from src.router.utils.redis import redis_client  # new import for redis
 from src.router.utils.logger import logger
-from src.router.utils.cache import cache_service
+from src.router.utils.cache import cache_service, canonical_request_hash
+from src.router.utils.coalescing import completion_coalescer
+from src.router.utils.billing import charge_credits
+from src.router.utils.inference_logs import inference_log_sender
+from src.router.utils.routing import node_router
+from src.router.utils.circuit_breaker import circuit_breakers, guard_stalls
+from src.router.utils.hedging import hedger
+from src.router.utils.admission import PermitStreamingResponse, admission
+from src.router.utils.rate_limit import rate_limiter
 from src.router.api.v1.docs.network import (
     chatCompletionGenerateDoc,
     list_models_doc,
+    verify_batch_doc,
     verify_doc,
 )
 from src.router.utils.opensearch import (
     OPENSEARCH_LLM_USAGE_LOG_INDEX,
-    opensearch_client,
     OPENSEARCH_CREDITS_INDEX,
+    bulk_indexer,
 )
 from src.router.utils.nr import track
-from openai import AsyncOpenAI
+from src.router.utils.sse import SSEScanner
+from openai import APIStatusError, AsyncOpenAI
 
 
 router = APIRouter()
@@ -47,147 +69,170 @@ openai_client = AsyncOpenAI(api_key=LITELLM_API_KEY, base_url=f"{LITELLM_API_URL
 FIXED_WALLET_ADDRESS = "0xE83507Bd91e1b470792fFFc1377c8f3959d7e674"
 
 
-async def send_inference_log(log_data: dict) -> None:
-    """Send a single log to the inference-logs webhook immediately."""
-    if not INFERENCE_LOGS_WEBHOOK_URL:
+def parse_machine_id(model_id: str) -> int:
+    """Parse the machine ID from a LiteLLM deployment ID (e.g. "gpt-4o-machine-9" -> 9)."""
+    if model_id and "-machine-" in model_id:
+        try:
+            machine_id = int(model_id.split("-machine-")[1])
+            logger.info(f"Extracted machine ID: {machine_id}")
+            return machine_id
+        except (ValueError, IndexError):
+            logger.warning(f"Could not parse machine ID from: {model_id}")
+    else:
+        logger.warning(f"Model ID does not contain machine info: {model_id}")
+    return 0
+
+
+def machine_id_from_headers(headers) -> int:
+    """Extract the machine ID from LiteLLM response headers."""
+    model_id = headers.get("x-litellm-model-id", "")
+    logger.info(f"LiteLLM Model ID from headers: {model_id}")
+    return parse_machine_id(model_id)
+
+
+def with_headers(response: Response, headers: Dict[str, str]) -> Response:
+    response.headers.update(headers)
+    return response
+
+
+@asynccontextmanager
+async def open_upstream_stream(completion_params: Dict[str, Any]):
+    """Open a streaming completion against LiteLLM.
+
+    Yields ``(headers, chunks)`` where ``chunks`` is an async iterator of SSE
+    bytes ready to be sent to the client. In passthrough mode these are
+    LiteLLM's raw bytes; otherwise every chunk is parsed by the OpenAI client
+    and re-serialized (the previous behaviour, kept behind SSE_PASSTHROUGH).
+    With ROUTING_MODE=direct the bytes come straight from a node instead.
+    """
+    if ROUTING_MODE == "direct":
+        async with node_router.stream(completion_params) as (headers, chunks):
+            yield headers, chunks
         return
 
-    try:
-        payload = {"logs": [log_data]}
-        webhook_url = INFERENCE_LOGS_WEBHOOK_URL.rstrip("/") + "/webhooks"
-
-        async with httpx.AsyncClient(timeout=10) as client:
-            # gzip compress the JSON payload
-            data_bytes = json.dumps(payload).encode("utf-8")
-            import gzip
-
-            compressed = gzip.compress(data_bytes)
-            resp = await client.post(
-                webhook_url,
-                content=compressed,
-                headers={
-                    "Content-Type": "application/json",
-                    "Content-Encoding": "gzip",
-                    "Accept-Encoding": "gzip, deflate",
-                },
-            )
-            if resp.status_code >= 300:
-                logger.warning(
-                    f"Inference log webhook status {resp.status_code}: {resp.text[:200]}"
-                )
-            else:
-                logger.debug(f"Sent log to inference-logs webhook: {log_data['logId']}")
-    except Exception as e:
-        logger.error(f"Failed to send inference log: {str(e)}")
+    stream_params = {
+        **completion_params,
+        "stream_options": {"include_usage": True},
+        "timeout": 600,
+    }
 
+    if SSE_PASSTHROUGH:
+        async with openai_client.chat.completions.with_streaming_response.create(
+            **stream_params
+        ) as response:
+            yield response.headers, response.iter_bytes()
+        return
 
-@router.post(
-    "/v1/verify",
-    summary="Verify Model Response",
-    description=verify_doc["description"],
-    response_description=verify_doc["response_description"],
-    responses=verify_doc["responses"],
-)
-async def verify(req: VerifyRequest, db: DBSession, user: User = Depends(verify_user)):
-    track(
-        "verify_request",
-        {
-            "models_count": len(req.models),
-            "min_yes": req.min_yes,
-            "messages_count": len(req.messages),
-        },
-    )
+    stream = await openai_client.chat.completions.create(**stream_params)
 
-    if len(req.models) < 1:
-        track("verify_error", {"error": "no_models"})
-        raise HTTPException(status_code=400, detail="At least one model is required")
+    async def reserialize():
+        async for chunk in stream:
+            yield f"data: {json.dumps(chunk.model_dump())}\n\n".encode()
+        # The OpenAI client swallows LiteLLM's terminator; clients and the
+        # SSEScanner both rely on it to tell a finished stream from a cut one
+        yield b"data: [DONE]\n\n"
 
-    if req.min_yes < 1:
-        track("verify_error", {"error": "invalid_min_yes", "min_yes": req.min_yes})
-        raise HTTPException(status_code=400, detail="Minimum yes must be at least 1")
+    try:
+        yield stream.response.headers, reserialize()
+    finally:
+        await stream.close()
 
-    if req.min_yes > len(req.models):
-        track(
-            "verify_error",
-            {
-                "error": "min_yes_too_high",
-                "min_yes": req.min_yes,
-                "models_count": len(req.models),
-            },
-        )
-        raise HTTPException(
-            status_code=400,
-            detail="Minimum yes must be less than or equal to the number of models",
-        )
 
-    # Check user credits before processing
-    user_credits = await get_user_credits(user.id, db)
-    if user_credits <= 0:
-        track(
-            "verify_error",
-            {
-                "user_id": str(user.id),
-                "error": "insufficient_credits",
-                "credits": user_credits,
-            },
+async def create_upstream_completion(
+    completion_params: Dict[str, Any], tried: Optional[List[int]] = None
+):
+    """Run a non-streaming completion; returns ``(response, machine_id)``.
+
+    ``tried`` lists machines already used by this request, which direct
+    routing avoids (see ``NodeRouter.complete``). Failed calls are recorded
+    with the circuit breakers here, as ``NodeRouter`` does for direct routing.
+    """
+    if ROUTING_MODE == "direct":
+        return await node_router.complete(completion_params, tried)
+
+    try:
+        response = await openai_client.chat.completions.create(
+            **completion_params, timeout=600
         )
-        raise HTTPException(status_code=402, detail="Insufficient credits")
+    except APIStatusError as e:
+        # LiteLLM names the deployment that failed; client errors say
+        # nothing about its health
+        if e.status_code >= 500 or e.status_code == 429:
+            machine_id = machine_id_from_headers(e.response.headers)
+            circuit_breakers.record(completion_params["model"], machine_id, ok=False)
+        raise
+
+    # Extract machine ID from LiteLLM response
+    machine_id = 0
+
+    # Check for headers in _hidden_params (for non-streaming responses)
+    if hasattr(response, "_hidden_params") and response._hidden_params:
+        hidden_params = response._hidden_params
+        logger.info(f"LiteLLM _hidden_params: {hidden_params}")
+
+        if isinstance(hidden_params, dict):
+            # Look for model_id in hidden params
+            model_id = hidden_params.get("model_id", "")
+            if not model_id and "additional_headers" in hidden_params:
+                # Check additional headers
+                headers = hidden_params.get("additional_headers", {})
+                model_id = headers.get("x-litellm-model-id", "")
+
+            if model_id:
+                logger.info(f"LiteLLM Model ID from hidden params: {model_id}")
+                machine_id = parse_machine_id(model_id)
+
+    return response, machine_id
+
+
+VERIFICATION_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "provide_verification_result",
+        "description": "Provide a yes or no verification result with a detailed reason",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "result": {
+                    "type": "string",
+                    "enum": ["yes", "no"],
+                    "description": "The verification result - either 'yes' or 'no'",
+                },
+                "reason": {
+                    "type": "string",
+                    "description": "Detailed explanation for the verification result",
+                },
+            },
+            "required": ["result", "reason"],
+        },
+    },
+}
 
-    supported_models = await get_supported_models()
+VERIFICATION_SYSTEM_PROMPT = "You are a verification assistant. Analyze the conversation and provide a yes/no result with a detailed reason using the provided tool."
 
-    # Validate and transform all models
-    transformed_models = []
-    for model in req.models:
-        if model not in supported_models:
-            track("verify_error", {"error": "unsupported_model", "model": model})
-            raise HTTPException(status_code=400, detail=f"Unsupported model: {model}")
-        model_config = supported_models[model]
-        transformed_models.append({"original": model, "id": model_config.id})
 
-    async def process_model(model, idx):
-        try:
-            # Get or create session ID
-            # session_id = await get_or_create_session_id(str(user.id))
-
-            # Define the verification tool for yes/no with reason
-            verification_tool = {
-                "type": "function",
-                "function": {
-                    "name": "provide_verification_result",
-                    "description": "Provide a yes or no verification result with a detailed reason",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "result": {
-                                "type": "string",
-                                "enum": ["yes", "no"],
-                                "description": "The verification result - either 'yes' or 'no'",
-                            },
-                            "reason": {
-                                "type": "string",
-                                "description": "Detailed explanation for the verification result",
-                            },
-                        },
-                        "required": ["result", "reason"],
-                    },
-                },
-            }
+async def verify_with_model(
+    model: str, messages: List[Dict[str, Any]], user: User, idx: int
+) -> Dict[str, Any]:
+    """Ask one model for a yes/no verdict on ``messages``. Errors count as "no"."""
+    try:
+        # Get or create session ID
+        # session_id = await get_or_create_session_id(str(user.id))
 
-            # Create verification prompt
-            verification_messages = [
-                {
-                    "role": "system",
-                    "content": "You are a verification assistant. Analyze the conversation and provide a yes/no result with a detailed reason using the provided tool.",
-                }
-            ]
-            verification_messages.extend(
-                [{"role": msg.role, "content": msg.content} for msg in req.messages]
-            )
+        # Create verification prompt
+        verification_messages = [
+            {"role": "system", "content": VERIFICATION_SYSTEM_PROMPT},
+            *messages,
+        ]
 
-            response = await openai_client.chat.completions.create(
-                model=model["original"],
+        # Hedged against slow deployments when HEDGING_ENABLED is set;
+        # LiteLLM picks the deployment for each attempt
+        response = await hedger.run(
+            f"verify:{model}",
+            lambda _: openai_client.chat.completions.create(
+                model=model,
                 messages=verification_messages,  # type: ignore
-                tools=[verification_tool],  # type: ignore
+                tools=[VERIFICATION_TOOL],  # type: ignore
                 tool_choice={
                     "type": "function",
                     "function": {"name": "provide_verification_result"},
@@ -201,61 +246,108 @@ async def verify(req: VerifyRequest, db: DBSession, user: User = Depends(verify_
                         # "session_id": session_id
                     }
                 },
-            )
+            ),
+        )
 
-            # Extract verification result from tool call
-            result = "no"
-            reason = "No valid response received"
+        # Extract verification result from tool call
+        result = "no"
+        reason = "No valid response received"
 
-            if response.choices and response.choices[0].message.tool_calls:
-                tool_call = response.choices[0].message.tool_calls[0]
-                if tool_call.function.name == "provide_verification_result":
-                    try:
-                        args = json.loads(tool_call.function.arguments)
-                        result = args.get("result", "no")
-                        reason = args.get("reason", "No reason provided")
-                    except (json.JSONDecodeError, KeyError):
-                        result = "no"
-                        reason = "Failed to parse verification result"
-
-            # Get usage information from the response
-            usage = response.usage.model_dump() if response.usage else {}
+        if response.choices and response.choices[0].message.tool_calls:
+            tool_call = response.choices[0].message.tool_calls[0]
+            if tool_call.function.name == "provide_verification_result":
+                try:
+                    args = json.loads(tool_call.function.arguments)
+                    result = args.get("result", "no")
+                    reason = args.get("reason", "No reason provided")
+                except (json.JSONDecodeError, KeyError):
+                    result = "no"
+                    reason = "Failed to parse verification result"
+
+        # Get usage information from the response
+        usage = response.usage.model_dump() if response.usage else {}
+
+        return {
+            "result": result,
+            "response": {"choices": [{"message": {"content": reason}}]},
+            "model": model,
+            "usage": usage,
+        }
+    except Exception as e:
+        logger.error(f"Error verifying model {model}: {str(e)}")
+        return {
+            "result": "no",
+            "reason": f"Error during verification: {str(e)}",
+            "response": {"error": str(e)},
+            "model": model,
+            "usage": {},
+        }
 
-            return {
-                "result": result,
-                "response": {"choices": [{"message": {"content": reason}}]},
-                "model": transformed_models[idx]["original"],
-                "usage": usage,
-            }
-        except Exception as e:
-            logger.error(f"Error verifying model {model['id']}: {str(e)}")
-            return {
-                "result": "no",
-                "reason": f"Error during verification: {str(e)}",
-                "response": {"error": str(e)},
-                "model": transformed_models[idx]["original"],
-                "usage": {},
-            }
 
-    # Make parallel requests
-    results = await asyncio.gather(
-        *[process_model(model, idx) for idx, model in enumerate(transformed_models)]
-    )
+async def verify_quorum(
+    models: List[str],
+    messages: List[Dict[str, Any]],
+    user: User,
+    min_yes: int,
+    limit: Optional[asyncio.Semaphore] = None,
+):
+    """Yield ``(index, result)`` for each model's verdict as it arrives.
+
+    Stops as soon as ``min_yes`` is reached or can no longer be reached; the
+    models still running are cancelled (and so never billed) and yielded as
+    "skipped". ``limit`` bounds the model calls running at once.
+    """
+
+    async def call(idx: int, model: str):
+        if limit is None:
+            return await verify_with_model(model, messages, user, idx)
+        async with limit:
+            return await verify_with_model(model, messages, user, idx)
+
+    tasks = {
+        asyncio.ensure_future(call(idx, model)): idx
+        for idx, model in enumerate(models)
+    }
+    pending = set(tasks)
+    yes_count = no_count = 0
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in sorted(done, key=tasks.__getitem__):
+                result = task.result()
+                if result["result"] == "yes":
+                    yes_count += 1
+                else:
+                    no_count += 1
+                yield tasks[task], result
+            if yes_count >= min_yes or no_count > len(models) - min_yes:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+
+    for task in sorted(pending, key=tasks.__getitem__):
+        idx = tasks[task]
+        yield idx, {
+            "result": "skipped",
+            "reason": "Outcome was decided before this model answered",
+            "response": {},
+            "model": models[idx],
+            "usage": {},
+        }
 
-    # Calculate total cost and deduct credits
-    total_cost = 0.0
-    sm = await get_setting_value(
-        "SUPPORTED_MODELS",
-        SETTINGS_MODELS["SUPPORTED_MODELS"],
-    )
 
+def verification_cost(results, supported_models) -> float:
+    total_cost = 0.0
     for result in results:
         if "usage" in result and result["usage"]:
             usage = result["usage"]
             model_name = result["model"]
 
             # Get model config for pricing
-            model_config = sm.root.get(model_name)
+            model_config = supported_models.get(model_name)
             if model_config:
                 prompt_tokens = usage.get("prompt_tokens", 0)
                 completion_tokens = usage.get("completion_tokens", 0)
@@ -266,32 +358,241 @@ async def verify(req: VerifyRequest, db: DBSession, user: User = Depends(verify_
                 )
                 model_cost = prompt_tokens_cost + completion_tokens_cost
                 total_cost += model_cost
+    return total_cost
 
-    # Deduct credits using Redis
-    if total_cost > 0:
-        redis_key = f"user_credit:{user.id}"
-        await redis_client.incrbyfloat(redis_key, float(-total_cost))
 
-        logger.info(
-            f"Verification cost: ${total_cost:.6f} deducted from user {user.id}"
+def check_verify_params(models: List[str], min_yes: int, supported_models) -> None:
+    if len(models) < 1:
+        track("verify_error", {"error": "no_models"})
+        raise HTTPException(status_code=400, detail="At least one model is required")
+
+    if min_yes < 1:
+        track("verify_error", {"error": "invalid_min_yes", "min_yes": min_yes})
+        raise HTTPException(status_code=400, detail="Minimum yes must be at least 1")
+
+    if min_yes > len(models):
+        track(
+            "verify_error",
+            {
+                "error": "min_yes_too_high",
+                "min_yes": min_yes,
+                "models_count": len(models),
+            },
+        )
+        raise HTTPException(
+            status_code=400,
+            detail="Minimum yes must be less than or equal to the number of models",
         )
 
+    # Validate all models
+    for model in models:
+        if model not in supported_models:
+            track("verify_error", {"error": "unsupported_model", "model": model})
+            raise HTTPException(status_code=400, detail=f"Unsupported model: {model}")
+
+
+@router.post(
+    "/v1/verify",
+    summary="Verify Model Response",
+    description=verify_doc["description"],
+    response_description=verify_doc["response_description"],
+    responses=verify_doc["responses"],
+)
+async def verify(req: VerifyRequest, db: DBSession, user: User = Depends(verify_user)):
+    track(
+        "verify_request",
+        {
+            "models_count": len(req.models),
+            "min_yes": req.min_yes,
+            "messages_count": len(req.messages),
+            "stream": req.stream,
+        },
+    )
+
+    supported_models = await get_supported_models()
+    check_verify_params(req.models, req.min_yes, supported_models)
+
+    # Reserve the worst-case cost of all model calls before processing
+    hold = await reserve_credits(
+        user.id,
+        sum(
+            estimate_request_cost(
+                supported_models[model], (msg.content for msg in req.messages)
+            )
+            for model in req.models
+        ),
+        db,
+    )
+    if hold is None:
         track(
-            "verify_cost",
+            "verify_error",
             {
                 "user_id": str(user.id),
-                "total_cost": total_cost,
-                "models_count": len(results),
+                "error": "insufficient_credits",
             },
         )
+        raise HTTPException(status_code=402, detail="Insufficient credits")
 
-    yes_count = sum(1 for result in results if result["result"] == "yes")
-    if yes_count >= req.min_yes:
-        track("verify_response", {"result": "yes", "yes_count": yes_count})
-        return {"result": "yes", "results": results}
-    else:
-        track("verify_response", {"result": "no", "yes_count": yes_count})
-        return {"result": "no", "results": results}
+    messages = [{"role": msg.role, "content": msg.content} for msg in req.messages]
+
+    async def settle(results):
+        # Deduct credits for the models that answered and release the hold
+        total_cost = verification_cost(results, supported_models)
+        await charge_credits(user.id, total_cost, hold_member=hold.member)
+        if total_cost > 0:
+            logger.info(
+                f"Verification cost: ${total_cost:.6f} deducted from user {user.id}"
+            )
+
+            track(
+                "verify_cost",
+                {
+                    "user_id": str(user.id),
+                    "total_cost": total_cost,
+                    "models_count": len(results),
+                },
+            )
+
+    def outcome(results):
+        yes_count = sum(1 for result in results if result["result"] == "yes")
+        verdict = "yes" if yes_count >= req.min_yes else "no"
+        track("verify_response", {"result": verdict, "yes_count": yes_count})
+        return verdict
+
+    if req.stream:
+
+        async def events():
+            results = []
+            try:
+                async for idx, result in verify_quorum(
+                    req.models, messages, user, req.min_yes
+                ):
+                    results.append(result)
+                    event = {"type": "verdict", "index": idx, **result}
+                    yield f"data: {json.dumps(event)}\n\n".encode()
+                event = {"type": "result", "result": outcome(results)}
+                yield f"data: {json.dumps(event)}\n\n".encode()
+                yield b"data: [DONE]\n\n"
+            finally:
+                await settle(results)
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+            },
+        )
+
+    results: List[Dict[str, Any]] = [{} for _ in req.models]
+    async for idx, result in verify_quorum(req.models, messages, user, req.min_yes):
+        results[idx] = result
+    await settle(results)
+
+    return {"result": outcome(results), "results": results}
+
+
+@router.post(
+    "/v1/verify/batch",
+    summary="Verify Claims in Batch",
+    description=verify_batch_doc["description"],
+    response_description=verify_batch_doc["response_description"],
+    responses=verify_batch_doc["responses"],
+)
+async def verify_batch(
+    req: VerifyBatchRequest, db: DBSession, user: User = Depends(verify_user)
+):
+    track(
+        "verify_batch_request",
+        {
+            "claims_count": len(req.claims),
+            "models_count": len(req.models),
+            "min_yes": req.min_yes,
+        },
+    )
+
+    if len(req.claims) > VERIFY_BATCH_MAX_CLAIMS:
+        track("verify_error", {"error": "too_many_claims"})
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {VERIFY_BATCH_MAX_CLAIMS} claims per batch",
+        )
+
+    # One settings snapshot for validation and pricing of the whole batch
+    supported_models = await get_supported_models()
+    check_verify_params(req.models, req.min_yes, supported_models)
+
+    # One reservation covering every claim x model call
+    hold = await reserve_credits(
+        user.id,
+        sum(
+            estimate_request_cost(
+                supported_models[model], (msg.content for msg in claim.messages)
+            )
+            for claim in req.claims
+            for model in req.models
+        ),
+        db,
+    )
+    if hold is None:
+        track(
+            "verify_error",
+            {
+                "user_id": str(user.id),
+                "error": "insufficient_credits",
+            },
+        )
+        raise HTTPException(status_code=402, detail="Insufficient credits")
+
+    limit = asyncio.Semaphore(VERIFY_BATCH_CONCURRENCY)
+    total_cost = 0.0
+
+    async def verify_claim(idx: int):
+        nonlocal total_cost
+        claim = req.claims[idx]
+        messages = [
+            {"role": msg.role, "content": msg.content} for msg in claim.messages
+        ]
+        results: List[Dict[str, Any]] = [{} for _ in req.models]
+        async for model_idx, result in verify_quorum(
+            req.models, messages, user, req.min_yes, limit
+        ):
+            results[model_idx] = result
+            # Accrued per answer so an abandoned batch still pays what ran
+            total_cost += verification_cost([result], supported_models)
+        yes_count = sum(1 for result in results if result["result"] == "yes")
+        return {
+            "index": idx,
+            "id": claim.id,
+            "result": "yes" if yes_count >= req.min_yes else "no",
+            "results": results,
+        }
+
+    async def lines():
+        tasks = [asyncio.ensure_future(verify_claim(i)) for i in range(len(req.claims))]
+        yes_claims = 0
+        try:
+            for next_claim in asyncio.as_completed(tasks):
+                line = await next_claim
+                yes_claims += line["result"] == "yes"
+                yield json.dumps(line) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+            # A single debit for the whole batch, which also releases the hold
+            await charge_credits(user.id, total_cost, hold_member=hold.member)
+            track(
+                "verify_batch_response",
+                {
+                    "user_id": str(user.id),
+                    "claims_count": len(req.claims),
+                    "yes_count": yes_claims,
+                    "total_cost": total_cost,
+                },
+            )
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 class ModelListResItem(BaseModel):
@@ -341,6 +642,7 @@ async def save_log(
     timeStart: float,
     machine_id: int,
     flow_id: Optional[str] = None,
+    hold: Optional[CreditHold] = None,
 ):
     track(
         "save_log",
@@ -388,25 +690,16 @@ async def save_log(
 
     cost = prompt_tokens_cost + completion_tokens_cost
 
-    # NEW: Use redis to manage user's credits instead of updating the db
-    redis_key = f"user_credit:{user.id}"
-
-    # new_credit = user_credits - cost
-    await redis_client.incrbyfloat(redis_key, float(-cost))
-
-    new_credit_bytes = await redis_client.get(redis_key)
-    new_credit = float(new_credit_bytes.decode("utf-8")) if new_credit_bytes else 0.0
-
-    # Update machine stats in Valkey (simple counters)
-    await redis_client.hincrby(f"stats:machine:{machine_id}", "tokens", total_tokens)
-    await redis_client.hincrby(f"stats:machine:{machine_id}", "requests", 1)
-    await redis_client.hincrbyfloat(f"stats:machine:{machine_id}", "cost", cost)
-
-    # Update model stats
-    await redis_client.hincrby(
-        f"stats:model:{original_req_model}", "tokens", total_tokens
+    # Debit the user's credits and update machine/model stats in one round trip
+    new_credit = await charge_credits(
+        user.id,
+        cost,
+        model=original_req_model,
+        machine_id=machine_id,
+        total_tokens=total_tokens,
+        hold_member=hold.member if hold else None,
     )
-    await redis_client.hincrby(f"stats:model:{original_req_model}", "requests", 1)
+    await rate_limiter.debit_tokens(user, total_tokens)
 
     # Prepare documents for OpenSearch
     llm_usage_doc = {
@@ -486,52 +779,36 @@ async def save_log(
     }
 
     try:
-        # Send documents to OpenSearch and data stream API asynchronously
-        await asyncio.gather(
-            asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: opensearch_client.index(
-                    index=OPENSEARCH_LLM_USAGE_LOG_INDEX,
-                    body=llm_usage_doc,
-                ),
-            ),
-            asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: opensearch_client.index(
-                    index=OPENSEARCH_CREDITS_INDEX,
-                    body=credit_history_doc,
-                ),
-            ),
-            # send_to_data_stream(),  # Commented out - function not defined
-        )
+        # Queue documents for the background OpenSearch bulk indexer
+        bulk_indexer.index(OPENSEARCH_LLM_USAGE_LOG_INDEX, llm_usage_doc)
+        bulk_indexer.index(OPENSEARCH_CREDITS_INDEX, credit_history_doc)
 
-        # Send log directly to inference-logs service
+        # Queue log for the batched inference-logs webhook
         if INFERENCE_LOGS_WEBHOOK_URL:
-            log_data = {
-                "walletAddress": FIXED_WALLET_ADDRESS,
-                "logId": log_id,
-                "@timestamp": datetime.now(timezone.utc).isoformat(),
-            }
-            # Fire and forget - send asynchronously
-            asyncio.create_task(send_inference_log(log_data))
+            inference_log_sender.submit(
+                {
+                    "walletAddress": FIXED_WALLET_ADDRESS,
+                    "logId": log_id,
+                    "@timestamp": datetime.now(timezone.utc).isoformat(),
+                }
+            )
     except Exception as e:
         track("save_log_error", {"user_id": str(user.id), "error": str(e)})
         logger.error(f"Log saving error: {str(e)}")
 
 
-@router.post(
-    "/v1/chat/completions",
-    summary="Generate Chat Completion",
-    description=chatCompletionGenerateDoc["description"],
-    response_description="Returns the model's completion response",
-    responses=chatCompletionGenerateDoc["responses"],
-)
-async def chatCompletionGenerate(
+async def generate_completion(
     req: AiRequest,
-    db: DBSession,
-    user: User = Depends(verify_user),
+    db,
+    user: User,
     flow_id: Optional[str] = None,
+    on_content: Optional[Callable[[str], None]] = None,
 ) -> Response:
+    """Run a chat completion for ``user``.
+
+    ``on_content`` receives every content delta of a streamed completion as
+    it is forwarded, for in-process consumers such as threads.
+    """
     track(
         "generate_request",
         {
@@ -547,32 +824,43 @@ async def chatCompletionGenerate(
     timeStart = time.time()
 
     try:
-        # Fix type conversion for user_id
-        user_credits = await get_user_credits(user.id, db)
-        if user_credits <= 0:
+        supported_models = await get_supported_models()
+        if req.model not in supported_models:
             track(
                 "generate_error",
                 {
                     "user_id": str(user.id),
-                    "error": "insufficient_credits",
-                    "credits": user_credits,
+                    "error": "unsupported_model",
+                    "model": req.model,
                 },
             )
-            raise HTTPException(status_code=402, detail="Insufficient credits")
+            raise HTTPException(status_code=400, detail="Unsupported model")
 
-        supported_models = await get_supported_models()
-        if req.model not in supported_models:
+        # RPM/TPM limits per API key and user; raises 429 when exhausted
+        rate_limit = await rate_limiter.check(user)
+        rate_limit_headers = rate_limit.headers() if rate_limit else {}
+
+        model_config = supported_models[req.model]
+
+        # Reserve the worst-case cost up front; settled in save_log
+        hold = await reserve_credits(
+            user.id,
+            estimate_request_cost(
+                model_config, (msg.content for msg in req.messages), req.max_tokens
+            ),
+            db,
+        )
+        if hold is None:
             track(
                 "generate_error",
                 {
                     "user_id": str(user.id),
-                    "error": "unsupported_model",
-                    "model": req.model,
+                    "error": "insufficient_credits",
                 },
             )
-            raise HTTPException(status_code=400, detail="Unsupported model")
+            raise HTTPException(status_code=402, detail="Insufficient credits")
+        user_credits = hold.balance
 
-        model_config = supported_models[req.model]
         original_req_model = req.model
         logger.info(f"Original model requested: {req.model}")
         req.model = model_config.id
@@ -619,10 +907,9 @@ async def chatCompletionGenerate(
 
         # check cache for both streaming and non-streaming requests
         cache_query = None
-        if len(req.messages) > 0:
-            # Use the last user message as the cache key
-            last_message = req.messages[-1].content
-            cache_query = last_message
+        if len(req.messages) > 0 and cache_service.enabled_for(user):
+            # Key on the model, full conversation and sampling parameters
+            cache_query = canonical_request_hash(original_req_model, req)
 
             # Check cache
             cache_data = await cache_service.check(cache_query)
@@ -635,90 +922,104 @@ async def chatCompletionGenerate(
                         "cached": True,
                     },
                 )
+                await release_credits(user.id, hold)
 
                 # Return cached response based on request type
                 if req.stream:
-                    return cache_service.build_streaming_response(
+                    if on_content is not None:
+                        on_content(cache_data["response"])
+                    response = cache_service.build_streaming_response(
                         cache_data["response"], original_req_model
                     )
                 else:
-                    return cache_service.build_completion_response(
+                    response = cache_service.build_completion_response(
                         cache_data["response"], original_req_model
                     )
+                return with_headers(response, rate_limit_headers)
+
+        # Identical concurrent requests from opted-in keys share one upstream call
+        coalesce_key = None
+        if ENABLE_COALESCING and user.api_key_meta.get("coalesce"):
+            coalesce_key = (
+                f"{canonical_request_hash(original_req_model, req)}:{bool(req.stream)}"
+            )
+
+        # Waits briefly for a slot under the model's adaptive concurrency
+        # limit, then sheds with 429
+        try:
+            permit = await admission.acquire(original_req_model)
+        except HTTPException:
+            await release_credits(user.id, hold)
+            raise
 
         if req.stream:
 
+            def open_stream():
+                if coalesce_key:
+                    return completion_coalescer.stream(
+                        coalesce_key, lambda: open_upstream_stream(completion_params)
+                    )
+                return open_upstream_stream(completion_params)
+
             async def generate():
-                usage = {}
-                result_text = ""
+                scanner = SSEScanner(on_content=on_content)
                 ttfs: Optional[float] = None
                 machine_id = 0
+                completed = failed = False
 
                 try:
-                    stream = await openai_client.chat.completions.create(
-                        **completion_params,
-                        stream_options={
-                            "include_usage": True,
-                        },
-                        timeout=600,
-                    )
-
-                    # Extract machine ID from LiteLLM response headers
-                    if hasattr(stream, "response") and hasattr(
-                        stream.response, "headers"
-                    ):
-                        headers = dict(stream.response.headers)
-                        model_id = headers.get("x-litellm-model-id", "")
-                        logger.info(f"LiteLLM Model ID from headers: {model_id}")
-
-                        # Parse machine ID from deployment ID (e.g., "gpt-4o-machine-9" -> 9)
-                        if model_id and "-machine-" in model_id:
-                            try:
-                                machine_id = int(model_id.split("-machine-")[1])
-                                logger.info(f"Extracted machine ID: {machine_id}")
-                            except (ValueError, IndexError):
-                                logger.warning(
-                                    f"Could not parse machine ID from: {model_id}"
+                    async with open_stream() as (headers, chunks):
+                        machine_id = machine_id_from_headers(headers)
+
+                        stall_timeout = CIRCUIT_STALL_TIMEOUT_SEC
+                        async for chunk in guard_stalls(chunks, stall_timeout):
+                            if ttfs is None:
+                                ttfs = time.time() - timeStart
+                                permit.first_token()
+                                track(
+                                    "generate_first_token",
+                                    {
+                                        "user_id": str(user.id),
+                                        "model": original_req_model,
+                                        "ttfs": ttfs,
+                                        "stream": req.stream,
+                                    },
                                 )
-                        else:
-                            logger.warning(
-                                f"Model ID does not contain machine info: {model_id}"
-                            )
-
-                    async for chunk in stream:
-                        if ttfs is None:
-                            ttfs = time.time() - timeStart
-                            track(
-                                "generate_first_token",
-                                {
-                                    "user_id": str(user.id),
-                                    "model": original_req_model,
-                                    "ttfs": ttfs,
-                                    "stream": req.stream,
-                                },
-                            )
-
-                        # Convert OpenAI chunk to SSE format
-                        chunk_dict = chunk.model_dump()
-
-                        if chunk.choices and chunk.choices[0].delta.content:
-                            result_text += chunk.choices[0].delta.content
 
-                        # Check for usage information (usually in the last chunk)
-                        if hasattr(chunk, "usage") and chunk.usage:
-                            usage = chunk.usage.model_dump()
+                            scanner.feed(chunk)
+                            yield chunk
 
-                        yield f"data: {json.dumps(chunk_dict)}\n\n"
+                    scanner.close()
+                    completed = True
 
                 except Exception as e:
+                    failed = True
                     track(
                         "generate_stream_error",
                         {"user_id": str(user.id), "error": str(e)},
                     )
                     logger.error(f"Generation error: {str(e)}")
-                    yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                    yield f"data: {json.dumps({'error': str(e)})}\n\n".encode()
                 finally:
+                    permit.release(ok=not failed)
+                    # Client disconnects say nothing about the machine
+                    if completed or failed:
+                        circuit_breakers.record(
+                            original_req_model,
+                            machine_id,
+                            ok=completed and scanner.done and not scanner.error,
+                            ttft=ttfs,
+                        )
                     try:
+                        result_text = scanner.text
+                        usage = scanner.usage
+                        direct = ROUTING_MODE == "direct"
+                        if not usage and direct and ttfs is not None:
+                            # Nodes called directly may not report usage
+                            usage = approximate_usage(
+                                (m["content"] for m in messages), result_text
+                            )
+
                         # Save logs with proper error handling
                         await save_log(
                             user=user,
@@ -731,13 +1032,18 @@ async def chatCompletionGenerate(
                             timeStart=timeStart,
                             machine_id=machine_id,
                             flow_id=flow_id,
+                            hold=hold,
                         )
 
-                        # Fire and forget: Save to cache for streaming responses
-                        if cache_query and result_text:
-                            asyncio.create_task(
-                                cache_service.save(cache_query, result_text)
-                            )
+                        # Only cache streams that completed cleanly
+                        if (
+                            cache_query
+                            and result_text
+                            and scanner.done
+                            and not scanner.error
+                            and not scanner.truncated
+                        ):
+                            cache_service.save(cache_query, result_text)
 
                     except Exception as log_error:
                         track(
@@ -746,58 +1052,54 @@ async def chatCompletionGenerate(
                         )
                         logger.error(f"Log saving error: {str(log_error)}")
 
-            return StreamingResponse(
+            return PermitStreamingResponse(
                 generate(),
+                permit,
                 media_type="text/event-stream",
                 headers={
                     "Cache-Control": "no-cache",
                     "Connection": "keep-alive",
+                    **rate_limit_headers,
                 },
             )
 
         # Handle non-streaming response
         try:
-            response = await openai_client.chat.completions.create(
-                **completion_params, timeout=600
-            )
+            def upstream():
+                # Hedged against slow machines when HEDGING_ENABLED is set
+                return hedger.run(
+                    original_req_model,
+                    lambda tried: create_upstream_completion(completion_params, tried),
+                )
 
-            # Extract machine ID from LiteLLM response
-            machine_id = 0
-
-            # Check for headers in _hidden_params (for non-streaming responses)
-            if hasattr(response, "_hidden_params") and response._hidden_params:
-                hidden_params = response._hidden_params
-                logger.info(f"LiteLLM _hidden_params: {hidden_params}")
-
-                if isinstance(hidden_params, dict):
-                    # Look for model_id in hidden params
-                    model_id = hidden_params.get("model_id", "")
-                    if not model_id and "additional_headers" in hidden_params:
-                        # Check additional headers
-                        headers = hidden_params.get("additional_headers", {})
-                        model_id = headers.get("x-litellm-model-id", "")
-
-                    if model_id:
-                        logger.info(f"LiteLLM Model ID from hidden params: {model_id}")
-                        # Parse machine ID from deployment ID (e.g., "gpt-4o-machine-9" -> 9)
-                        if "-machine-" in model_id:
-                            try:
-                                machine_id = int(model_id.split("-machine-")[1])
-                                logger.info(f"Extracted machine ID: {machine_id}")
-                            except (ValueError, IndexError):
-                                logger.warning(
-                                    f"Could not parse machine ID from: {model_id}"
-                                )
-                        else:
-                            logger.warning(
-                                f"Model ID does not contain machine info: {model_id}"
-                            )
+            try:
+                if coalesce_key:
+                    response, machine_id = await completion_coalescer.complete(
+                        coalesce_key, upstream
+                    )
+                else:
+                    response, machine_id = await upstream()
+            except Exception:
+                permit.release(ok=False)
+                raise
+            finally:
+                # Full response latency depends on the output length, so only
+                # errors shrink the limit for non-streaming calls; a cancelled
+                # request says nothing about the upstream either
+                permit.release()
+
+            circuit_breakers.record(original_req_model, machine_id, ok=True)
 
             result_text = (
                 response.choices[0].message.content if response.choices else ""
             )
             ttfs = time.time() - timeStart
             usage = response.usage.model_dump() if response.usage else {}
+            if not usage and ROUTING_MODE == "direct":
+                # Nodes called directly may not report usage
+                usage = approximate_usage(
+                    (m["content"] for m in messages), result_text or ""
+                )
 
             track(
                 "generate_completion",
@@ -811,9 +1113,9 @@ async def chatCompletionGenerate(
                 },
             )
 
-            # Fire and forget: Save to cache
+            # Save to cache (the shared tier is written in the background)
             if cache_query and result_text:
-                asyncio.create_task(cache_service.save(cache_query, result_text))
+                cache_service.save(cache_query, result_text)
 
             await save_log(
                 user=user,
@@ -826,6 +1128,7 @@ async def chatCompletionGenerate(
                 timeStart=timeStart,
                 machine_id=machine_id,
                 flow_id=flow_id,
+                hold=hold,
             )
 
             # Convert response to match expected format
@@ -834,9 +1137,11 @@ async def chatCompletionGenerate(
                 content=json.dumps(response_dict),
                 status_code=200,
                 media_type="application/json",
+                headers=rate_limit_headers,
             )
 
         except Exception as e:
+            await release_credits(user.id, hold)
             track("generate_error", {"user_id": str(user.id), "error": str(e)})
             logger.error(f"Non-streaming generation error: {str(e)}")
             raise HTTPException(
@@ -844,6 +1149,8 @@ async def chatCompletionGenerate(
                 detail=f"Error processing request: {str(e)}",
             )
 
+    except HTTPException:
+        raise
     except Exception as e:
         track("generate_error", {"user_id": str(user.id), "error": str(e)})
         logger.error(f"Request processing error: {str(e)}")
@@ -853,6 +1160,22 @@ async def chatCompletionGenerate(
         )
 
 
+@router.post(
+    "/v1/chat/completions",
+    summary="Generate Chat Completion",
+    description=chatCompletionGenerateDoc["description"],
+    response_description="Returns the model's completion response",
+    responses=chatCompletionGenerateDoc["responses"],
+)
+async def chatCompletionGenerate(
+    req: AiRequest,
+    db: DBSession,
+    user: User = Depends(verify_user),
+    flow_id: Optional[str] = None,
+) -> Response:
+    return await generate_completion(req, db, user, flow_id)
+
+
 async def get_or_create_session_id(user_id: str) -> str:
     """Get existing session ID from Redis or create a new one with 30-minute expiration"""
     redis_key = f"user_session:{user_id}"
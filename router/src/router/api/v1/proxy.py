@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import FileResponse
 import os
-import httpx
+from src.router.utils.http import http_clients
 from hashlib import md5
 from src.router.utils.nr import track
 
@@ -101,32 +101,32 @@ async def proxy_image(url: str):
 
     # Download the image and save it to the cache
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            if response.status_code != 200:
-                track("proxy_image_error", {
-                    "url_hash": filename,
-                    "status_code": response.status_code,
-                    "error": "failed_to_fetch"
-                })
-                raise HTTPException(
-                    status_code=response.status_code, detail="Failed to fetch image"
-                )
+        client = http_clients.get("images")
+        response = await client.get(url)
+        if response.status_code != 200:
+            track("proxy_image_error", {
+                "url_hash": filename,
+                "status_code": response.status_code,
+                "error": "failed_to_fetch"
+            })
+            raise HTTPException(
+                status_code=response.status_code, detail="Failed to fetch image"
+            )
 
-            # Determine the file extension from the response headers
-            content_type = response.headers.get("content-type")
-            if content_type:
-                extension = content_type.split("/")[-1]
-                filepath += f".{extension}"
+        # Determine the file extension from the response headers
+        content_type = response.headers.get("content-type")
+        if content_type:
+            extension = content_type.split("/")[-1]
+            filepath += f".{extension}"
 
-            with open(filepath, "wb") as f:
-                f.write(response.content)
+        with open(filepath, "wb") as f:
+            f.write(response.content)
                 
-            track("proxy_image_cache_store", {
-                "url_hash": filename,
-                "content_type": content_type,
-                "size_bytes": len(response.content)
-            })
+        track("proxy_image_cache_store", {
+            "url_hash": filename,
+            "content_type": content_type,
+            "size_bytes": len(response.content)
+        })
 
         return FileResponse(filepath)
     except Exception as e:
@@ -1,5 +1,10 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import json
+import time
+from typing import AsyncGenerator, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import update
 from sqlmodel import select
 from uuid import UUID
 from uuid import uuid4
@@ -8,10 +13,25 @@ from datetime import datetime
 from src.router.schemas.ai import AiRequest
 from src.router.models.thread import Thread, Message
 from src.router.models.user import User
-from src.router.db.session import DBSession
+from src.router.db.session import DBSession, get_session_context
+from src.router.core.config import (
+    THREAD_CHECKPOINT_CHARS,
+    THREAD_CHECKPOINT_INTERVAL_SEC,
+)
 from src.router.core.security import verify_token
 from pydantic import BaseModel, Field
 from src.router.utils.nr import track
+from src.router.utils.settings import get_supported_models
+from src.router.utils.thread_context import append_to_context, load_context
+from src.router.utils.logger import logger
+from src.router.utils.pagination import (
+    approximate_count,
+    decode_cursor,
+    keyset,
+    next_cursor,
+    set_page_headers,
+)
+from src.router.api.v1.network import generate_completion
 
 
 router = APIRouter()
@@ -112,26 +132,36 @@ async def create_thread(
 
 @router.get("/v1/threads", response_model=List[ThreadResponse])
 async def list_threads(
+    response: Response,
     db: DBSession,
     current_user: User = Depends(verify_token),
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=10, le=100),
+    cursor: Optional[str] = Query(
+        default=None, description="X-Next-Cursor header of the previous page"
+    ),
+    include_total: bool = Query(default=False),
 ):
     track("list_threads_request", {
         "user_id": str(current_user.id),
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "has_cursor": cursor is not None,
     })
     
-    query = (
-        select(Thread)
-        .where(Thread.user_id == str(current_user.id))
-        .offset(skip)
-        .limit(limit)
-        .order_by(Thread.updated_at.desc())
-    )
-    threads = await db.exec(query)
+    base = select(Thread).where(Thread.user_id == str(current_user.id))
+    # Keyset pages on (user_id, updated_at, id); skip is kept for old clients
+    after = decode_cursor(cursor, (datetime, UUID)) if cursor else None
+    query = keyset(base, [Thread.updated_at, Thread.id], after, descending=True)
+    if after is None and skip:
+        query = query.offset(skip)
+    threads = await db.exec(query.limit(limit))
     threads = threads.all()
+    set_page_headers(
+        response,
+        next_cursor(threads, limit, ("updated_at", "id")),
+        await approximate_count(db, base) if include_total else None,
+    )
 
     # Convert thread_metadata to dict before returning
     for thread in threads:
@@ -213,6 +243,24 @@ async def archive_thread(
     return {"status": "success"}
 
 
+async def checkpoint_message(message_id: UUID, delta: str) -> str:
+    """Append ``delta`` to a stored message and return its full content.
+
+    Uses its own session: the request's session may already be closed while
+    a response is still streaming.
+    """
+    async with get_session_context() as session:
+        result = await session.execute(
+            update(Message)
+            .where(Message.id == message_id)
+            .values(content=Message.content + delta)
+            .returning(Message.content)
+        )
+        content = result.scalar_one()
+        await session.commit()
+    return content
+
+
 @router.post("/v1/messages")
 async def create_message(
     message: MessageCreate,
@@ -242,9 +290,6 @@ async def create_message(
             updated_at=datetime.utcnow(),
             id=uuid4(),
         )
-        db.add(thread)
-        await db.commit()
-        await db.refresh(thread)
     else:
         # Get existing thread
         thread = await db.get(Thread, message.thread_id)
@@ -282,39 +327,46 @@ async def create_message(
     thread.updated_at = datetime.utcnow()
     db.add(db_message)
     db.add(thread)
+
+    # Placeholder for the AI answer, filled in as it is generated
+    ai_message = None
+    if message.model:
+        ai_message = Message(
+            thread_id=thread.id,
+            role="assistant",
+            content="",
+            parent_message_id=db_message.id,
+            message_metadata={},
+            tool_calls=[],
+            created_at=datetime.utcnow(),
+            id=uuid4(),
+        )
+        db.add(ai_message)
+
+    # Thread, user message and placeholder are written in one transaction
     await db.commit()
-    await db.refresh(db_message)
+    await append_to_context(thread.id, db_message.role, db_message.content)
 
     # If model is specified, generate AI response
-    if message.model:
+    if ai_message is not None:
         track("ai_message_request", {
             "user_id": str(current_user.id),
             "thread_id": str(thread.id),
             "model": message.model,
             "stream": message.stream
         })
-        
-        from src.router.api.v1.network import generate
-        from fastapi.responses import StreamingResponse
-        import json
-        from typing import AsyncGenerator
-
-        # Get all previous messages from the thread if it exists
-        thread_messages = []
-        if db_message.thread_id:
-            query = (
-                select(Message)
-                .where(Message.thread_id == db_message.thread_id)
-                .order_by(Message.created_at)
-            )
-            thread_messages = await db.exec(query)
-            thread_messages = [
-                {"role": msg.role, "content": msg.content}
-                for msg in thread_messages.all()
-            ]
 
-        # Add the current message
-        thread_messages.append({"role": "user", "content": message.content})
+        # Recent history from the thread's context cache, cut to what fits
+        # the model's context window
+        supported_models = await get_supported_models()
+        thread_messages = await load_context(
+            thread.id, db, supported_models.get(message.model)
+        )
+
+        # The cache normally has the current message already
+        current = {"role": db_message.role, "content": message.content}
+        if not thread_messages or thread_messages[-1] != current:
+            thread_messages.append(current)
 
         ai_request = AiRequest(
             model=message.model,
@@ -322,59 +374,64 @@ async def create_message(
             stream=message.stream,
         )
 
-        # Create placeholder AI message
-        ai_message = Message(
-            thread_id=thread.id,
-            role="assistant",
-            content="",  # Will be updated after streaming
-            parent_message_id=db_message.id,
-            message_metadata={},
-            tool_calls=[],
-            created_at=datetime.utcnow(),
-            id=uuid4(),
-        )
-        db.add(ai_message)
-        await db.commit()
-
         if message.stream:
 
             async def content_stream() -> AsyncGenerator[bytes, None]:
-                accumulated_content = []
+                # Deltas not yet checkpointed; the full answer lives in the DB
+                pending: List[str] = []
+                pending_chars = 0
+                last_checkpoint = time.monotonic()
+                content = ""
+
+                def on_content(delta: str) -> None:
+                    nonlocal pending_chars
+                    pending.append(delta)
+                    pending_chars += len(delta)
+
+                async def checkpoint() -> None:
+                    nonlocal pending_chars, last_checkpoint, content
+                    last_checkpoint = time.monotonic()
+                    if pending:
+                        delta = "".join(pending)
+                        pending.clear()
+                        pending_chars = 0
+                        content = await checkpoint_message(ai_message.id, delta)
+
+                async def finish() -> None:
+                    try:
+                        await checkpoint()
+                        await append_to_context(thread.id, "assistant", content)
+                    except Exception as e:
+                        logger.error(f"Failed to save thread answer: {str(e)}")
+
                 try:
-                    response = await generate(req=ai_request, db=db, user=current_user)
+                    # Forward the generation as is and follow its deltas
+                    # in-process
+                    response = await generate_completion(
+                        req=ai_request,
+                        db=db,
+                        user=current_user,
+                        on_content=on_content,
+                    )
 
                     async for chunk in response.body_iterator:
-                        if chunk:
-                            chunk_str = (
-                                chunk.decode() if isinstance(chunk, bytes) else chunk
-                            )
-                            if chunk_str.startswith("data: "):
-                                try:
-                                    data = json.loads(chunk_str[6:])
-                                    if (
-                                        "choices" in data
-                                        and len(data["choices"]) > 0
-                                        and "delta" in data["choices"][0]
-                                        and "content" in data["choices"][0]["delta"]
-                                    ):
-                                        content = data["choices"][0]["delta"]["content"]
-                                        if content:
-                                            accumulated_content.append(content)
-                                            yield f"data: {json.dumps({'choices': [{'delta': {'content': content}}]})}\n".encode()
-                                except json.JSONDecodeError:
-                                    continue
-
-                    # After streaming is done, update the AI message
-                    ai_message.content = "".join(accumulated_content)
-                    db.add(ai_message)
-                    await db.commit()
+                        yield chunk
+                        if (
+                            pending_chars >= THREAD_CHECKPOINT_CHARS
+                            or time.monotonic() - last_checkpoint
+                            >= THREAD_CHECKPOINT_INTERVAL_SEC
+                        ):
+                            await checkpoint()
 
                     # Send final message with thread_id
-                    yield f"data: {json.dumps({'thread_id': str(thread.id)})}\n".encode()
+                    yield f"data: {json.dumps({'thread_id': str(thread.id)})}\n\n".encode()
 
                 except Exception as e:
-                    print(f"Error in streaming: {e}")
-                    yield f"data: {json.dumps({'error': str(e)})}\n".encode()
+                    logger.error(f"Error in streaming: {str(e)}")
+                    yield f"data: {json.dumps({'error': str(e)})}\n\n".encode()
+                finally:
+                    # Shielded so a client disconnect cannot drop the answer
+                    await asyncio.shield(finish())
 
             return StreamingResponse(
                 content_stream(),
@@ -390,8 +447,10 @@ async def create_message(
             )
         else:
             # For non-streaming responses
-            response = await generate(req=ai_request, db=db, user=current_user)
-            ai_response = await response.json()
+            response = await generate_completion(
+                req=ai_request, db=db, user=current_user
+            )
+            ai_response = json.loads(response.body)
 
             # Update AI message with response
             if "choices" in ai_response and len(ai_response["choices"]) > 0:
@@ -399,6 +458,7 @@ async def create_message(
                 db.add(ai_message)
                 await db.commit()
                 await db.refresh(ai_message)
+                await append_to_context(thread.id, "assistant", ai_message.content)
 
             return MessageResponse(
                 id=ai_message.id,
@@ -426,10 +486,15 @@ async def create_message(
 @router.get("/v1/threads/{thread_id}/messages", response_model=List[MessageResponse])
 async def list_messages(
     thread_id: UUID,
+    response: Response,
     db: DBSession,
     current_user: User = Depends(verify_token),
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=50, le=100),
+    cursor: Optional[str] = Query(
+        default=None, description="X-Next-Cursor header of the previous page"
+    ),
+    include_total: bool = Query(default=False),
 ):
     """Get messages in a thread"""
     thread = await db.get(Thread, thread_id)
@@ -451,15 +516,20 @@ async def list_messages(
             status_code=403, detail="Not authorized to access this thread"
         )
 
-    query = (
-        select(Message)
-        .where(Message.thread_id == thread_id)
-        .offset(skip)
-        .limit(limit)
-        .order_by(Message.created_at)
+    base = select(Message).where(Message.thread_id == thread_id)
+    # Keyset pages on (thread_id, created_at, id), oldest first
+    after = decode_cursor(cursor, (datetime, UUID)) if cursor else None
+    query = keyset(base, [Message.created_at, Message.id], after, descending=False)
+    if after is None and skip:
+        query = query.offset(skip)
+    messages = await db.exec(query.limit(limit))
+    messages = messages.all()
+    set_page_headers(
+        response,
+        next_cursor(messages, limit, ("created_at", "id")),
+        await approximate_count(db, base) if include_total else None,
     )
-    messages = await db.exec(query)
-    return messages.all()
+    return messages
 
 
 @router.get(
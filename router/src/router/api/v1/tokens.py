@@ -1,15 +1,21 @@
 import logging
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import func, select
 from src.router.core.types import User
 from src.router.models.tokens import ApiToken
 from src.router.schemas.tokens import ApiTokenRequest
 from src.router.db.session import DBSession
-from src.router.core.security import verify_user
+from src.router.core.security import verify_user, revoke_token
 from datetime import datetime
 import os
-from src.router.utils.redis import redis_client
 from src.router.utils.nr import track
+from src.router.utils.pagination import (
+    approximate_count,
+    decode_cursor,
+    keyset,
+    next_cursor,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -150,8 +156,10 @@ async def create_api_token(
 - Token must be passed in the Authorization header
 
 ### Query Parameters
-- `page`: Page number (optional, default: 1)
-- `page_size`: Number of items per page (optional, default: 100)
+- `page`: Page number (optional, default: 1); ignored when `cursor` is set
+- `page_size`: Number of items per page (optional, default: 10)
+- `cursor`: `next_cursor` of the previous page (optional)
+- `include_total`: Whether to count the tokens (optional, default: true)
 
 ### Response Format
 ```json
@@ -165,10 +173,12 @@ async def create_api_token(
             "created_at": string    // ISO 8601 datetime
         }
     ],
-    "total": int,          // Total number of tokens
-    "page": int,           // Current page number
-    "page_size": int,      // Items per page
-    "total_pages": int     // Total number of pages
+    "total": int | null,          // Total number of tokens
+    "total_is_estimate": bool,    // True when the total was capped
+    "page": int,                  // Current page number
+    "page_size": int,             // Items per page
+    "total_pages": int | null,    // Total number of pages
+    "next_cursor": string | null  // Cursor for the next page, null on the last
 }
 ```
 
@@ -184,6 +194,8 @@ async def list_api_tokens(
     db: DBSession,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    include_total: bool = Query(True, description="Count the tokens"),
     user: User = Depends(verify_user),
 ):
     track("list_api_tokens_request", {
@@ -198,19 +210,21 @@ async def list_api_tokens(
         .where(ApiToken.user_id == user.id)
         .where(ApiToken.deleted_at == None)  # noqa: E711
     )
-    count_query = (
-        select(func.count())
-        .select_from(ApiToken)
-        .where(ApiToken.user_id == user.id)
-        .where(ApiToken.deleted_at == None)  # noqa: E711
-    )
 
-    total_res = await db.exec(count_query)
-    total = total_res.one()
-    total_pages = total + page_size - 1
+    total = total_pages = None
+    exact = True
+    if include_total:
+        total, exact = await approximate_count(db, query)
+        total_pages = (total + page_size - 1) // page_size
 
-    # Apply pagination
-    tokens_res = await db.exec(query.offset((page - 1) * page_size).limit(page_size))
+    # Keyset pages on (user_id, created_at, id), newest first
+    after = decode_cursor(cursor, (datetime, int)) if cursor else None
+    page_query = keyset(
+        query, [ApiToken.created_at, ApiToken.id], after, descending=True
+    )
+    if after is None:
+        page_query = page_query.offset((page - 1) * page_size)
+    tokens_res = await db.exec(page_query.limit(page_size))
     tokens = tokens_res.all()
 
     return {
@@ -225,9 +239,11 @@ async def list_api_tokens(
             for token in tokens
         ],
         "total": total,
+        "total_is_estimate": not exact,
         "page": page,
         "page_size": page_size,
         "total_pages": total_pages,
+        "next_cursor": next_cursor(tokens, page_size, ("created_at", "id")),
     }
 
 
@@ -317,9 +333,9 @@ async def delete_api_token(
     await db.commit()
     await db.refresh(api_token)
 
-    # Invalidate the cache
+    # Invalidate the cache on every worker
     try:
-        await redis_client.delete(f"token:{token}")
+        await revoke_token(token)
     except Exception as e:
         logger.error(f"Error invalidating token cache: {e}")
 
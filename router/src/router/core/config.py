@@ -18,6 +18,9 @@ LITELLM_MASTER_KEY = os.getenv("LITELLM_MASTER_KEY", "")
 OPENSEARCH_BASE_URL = os.getenv("OPENSEARCH_BASE_URL", "")
 OPENSEARCH_USER = os.getenv("OPENSEARCH_USER", "")
 OPENSEARCH_PASSWORD = os.getenv("OPENSEARCH_PASSWORD", "")
+OPENSEARCH_BULK_SIZE = int(os.getenv("OPENSEARCH_BULK_SIZE", "500"))
+OPENSEARCH_BULK_INTERVAL_SEC = float(os.getenv("OPENSEARCH_BULK_INTERVAL_SEC", "2"))
+OPENSEARCH_BULK_QUEUE_MAX = int(os.getenv("OPENSEARCH_BULK_QUEUE_MAX", "20000"))
 
 # Data Stream API Configuration
 DATA_STREAM_API_URL = os.getenv("DATA_STREAM_API_URL", "")
@@ -30,8 +33,147 @@ INFERENCE_LOGS_BATCH_INTERVAL_SEC = float(
     os.getenv("INFERENCE_LOGS_BATCH_INTERVAL_SEC", "60")
 )
 INFERENCE_LOGS_QUEUE_MAX = int(os.getenv("INFERENCE_LOGS_QUEUE_MAX", "10000"))
+# "gzip" or "zstd" (zstd requires the optional zstandard package)
+INFERENCE_LOGS_COMPRESSION = os.getenv("INFERENCE_LOGS_COMPRESSION", "gzip").lower()
 
 # Cache Configuration
+# Response cache for API keys with "response_cache": true in their meta_data
 ENABLE_CACHE = os.getenv("ENABLE_CACHE", "false").lower() == "true"
-CACHE_API_URL = os.getenv("CACHE_API_URL", "http://localhost:3000")
-CACHE_API_KEY = os.getenv("CACHE_API_KEY", "your-secret-api-key")
+RESPONSE_CACHE_TTL_SEC = float(os.getenv("RESPONSE_CACHE_TTL_SEC", "3600"))
+# Per-worker LRU budget, and the largest single response that is cached
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(
+    os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(256 * 1024))
+)
+# Approximate characters per SSE chunk when replaying a cached response
+RESPONSE_CACHE_REPLAY_CHUNK_CHARS = int(os.getenv("RESPONSE_CACHE_REPLAY_CHUNK_CHARS", "16"))
+
+# Auth
+# "local" verifies JWT signature/expiry/audience in-process and checks Supabase
+# for revocation in the background; "supabase" validates every JWT remotely
+JWT_VERIFY_MODE = os.getenv("JWT_VERIFY_MODE", "local").lower()
+JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "authenticated")
+# Per-worker cache of verified tokens in front of Redis
+AUTH_CACHE_TTL_SEC = float(os.getenv("AUTH_CACHE_TTL_SEC", "30"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+# How long a rejected token is answered with 401 without re-checking
+AUTH_NEGATIVE_CACHE_TTL_SEC = float(os.getenv("AUTH_NEGATIVE_CACHE_TTL_SEC", "10"))
+
+# Credits
+# Credit holds outlive the longest upstream call (600s) so they are settled,
+# not expired, in the normal case
+CREDIT_HOLD_TTL_SEC = int(os.getenv("CREDIT_HOLD_TTL_SEC", "660"))
+# Completion tokens assumed when a request does not set max_tokens
+CREDIT_HOLD_DEFAULT_MAX_TOKENS = int(os.getenv("CREDIT_HOLD_DEFAULT_MAX_TOKENS", "1024"))
+
+# Settings
+# Upper bound on how long a worker serves settings from its in-process
+# snapshot without a pub/sub invalidation
+SETTINGS_SNAPSHOT_MAX_AGE_SEC = float(os.getenv("SETTINGS_SNAPSHOT_MAX_AGE_SEC", "300"))
+
+# Flows
+# Per-worker flow cache; entries are dropped on pub/sub invalidation, the TTL
+# only bounds staleness should one be missed
+FLOW_CACHE_TTL_SEC = float(os.getenv("FLOW_CACHE_TTL_SEC", "300"))
+FLOW_CACHE_MAX_ENTRIES = int(os.getenv("FLOW_CACHE_MAX_ENTRIES", "1000"))
+FLOW_CACHE_REDIS_TTL_SEC = int(os.getenv("FLOW_CACHE_REDIS_TTL_SEC", "86400"))
+# Flow batch jobs (run a flow over an uploaded JSONL dataset)
+FLOW_BATCH_MAX_ROWS = int(os.getenv("FLOW_BATCH_MAX_ROWS", "100000"))
+FLOW_BATCH_DEFAULT_CONCURRENCY = int(os.getenv("FLOW_BATCH_DEFAULT_CONCURRENCY", "32"))
+FLOW_BATCH_MAX_CONCURRENCY = int(os.getenv("FLOW_BATCH_MAX_CONCURRENCY", "256"))
+# Upstream calls in flight for all batch jobs run by one worker
+FLOW_BATCH_WORKER_CONCURRENCY = int(os.getenv("FLOW_BATCH_WORKER_CONCURRENCY", "512"))
+FLOW_BATCH_ROW_ATTEMPTS = int(os.getenv("FLOW_BATCH_ROW_ATTEMPTS", "3"))
+# Accrued cost is debited, and the job's credit hold renewed, this often
+FLOW_BATCH_DEBIT_INTERVAL_SEC = float(os.getenv("FLOW_BATCH_DEBIT_INTERVAL_SEC", "10"))
+# A job whose worker stopped renewing its lease is adopted by another worker
+FLOW_BATCH_LEASE_SEC = int(os.getenv("FLOW_BATCH_LEASE_SEC", "30"))
+FLOW_BATCH_POLL_INTERVAL_SEC = float(os.getenv("FLOW_BATCH_POLL_INTERVAL_SEC", "5"))
+# Rows and results of finished jobs are kept this long
+FLOW_BATCH_RETENTION_SEC = int(os.getenv("FLOW_BATCH_RETENTION_SEC", str(7 * 86400)))
+
+# Outbound HTTP clients
+# Negotiate HTTP/2 on pools that opt in (requires the optional h2 package)
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+# Coalesce identical in-flight completions from API keys with "coalesce": true
+# in their meta_data into one upstream call
+ENABLE_COALESCING = os.getenv("ENABLE_COALESCING", "false").lower() == "true"
+
+# Machine registry
+# Seconds without a heartbeat after which a machine counts as offline
+MACHINE_LIVENESS_TTL_SEC = int(os.getenv("MACHINE_LIVENESS_TTL_SEC", "12"))
+# How often each worker pulls heartbeat and machine changes from Redis
+MACHINE_REGISTRY_POLL_INTERVAL_SEC = float(
+    os.getenv("MACHINE_REGISTRY_POLL_INTERVAL_SEC", "1")
+)
+
+# Outlier ejection (circuit breakers per machine and deployment)
+CIRCUIT_WINDOW_SEC = float(os.getenv("CIRCUIT_WINDOW_SEC", "30"))
+CIRCUIT_MIN_REQUESTS = int(os.getenv("CIRCUIT_MIN_REQUESTS", "10"))
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_CONSECUTIVE_FAILURES = int(os.getenv("CIRCUIT_CONSECUTIVE_FAILURES", "5"))
+# A first token slower than this counts as a failure
+CIRCUIT_SLOW_TTFT_SEC = float(os.getenv("CIRCUIT_SLOW_TTFT_SEC", "30"))
+# Streams that send nothing for this long are cut and count as failures
+CIRCUIT_STALL_TIMEOUT_SEC = float(os.getenv("CIRCUIT_STALL_TIMEOUT_SEC", "120"))
+CIRCUIT_BASE_EJECTION_SEC = float(os.getenv("CIRCUIT_BASE_EJECTION_SEC", "10"))
+CIRCUIT_MAX_EJECTION_SEC = float(os.getenv("CIRCUIT_MAX_EJECTION_SEC", "300"))
+
+# Hedging of non-streaming completions and verify calls
+HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "false").lower() == "true"
+# Hedge once a call outlives this percentile of the model's recent latencies
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+# Extra upstream load hedges may add (0.05 = at most 5%)
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.05"))
+# Samples needed before a model is hedged at all
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+# Adaptive concurrency limits per model in front of upstream calls
+ADMISSION_CONTROL_ENABLED = (
+    os.getenv("ADMISSION_CONTROL_ENABLED", "false").lower() == "true"
+)
+ADMISSION_INITIAL_LIMIT = int(os.getenv("ADMISSION_INITIAL_LIMIT", "32"))
+ADMISSION_MIN_LIMIT = int(os.getenv("ADMISSION_MIN_LIMIT", "4"))
+ADMISSION_MAX_LIMIT = int(os.getenv("ADMISSION_MAX_LIMIT", "512"))
+# Requests waiting for a slot per model, and how long they wait before 429
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_QUEUE_TIMEOUT_SEC = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SEC", "2"))
+# A first token slower than this multiple of the usual latency shrinks the limit
+ADMISSION_LATENCY_TOLERANCE = float(os.getenv("ADMISSION_LATENCY_TOLERANCE", "2.0"))
+
+# Routing
+# "litellm" sends completions through the LiteLLM proxy, "direct" picks a
+# node-service machine in the router and calls it without the extra hop
+ROUTING_MODE = os.getenv("ROUTING_MODE", "litellm")
+# weighted | least_outstanding | p2c | ewma
+ROUTING_STRATEGY = os.getenv("ROUTING_STRATEGY", "p2c")
+NODE_SERVICE_PORT = int(os.getenv("NODE_SERVICE_PORT", "34523"))
+# Machines tried when a node refuses the connection
+ROUTING_MAX_ATTEMPTS = int(os.getenv("ROUTING_MAX_ATTEMPTS", "3"))
+
+# Thread context
+# Recent messages per thread mirrored in Redis, and how long an idle thread's
+# list is kept
+THREAD_CONTEXT_MAX_MESSAGES = int(os.getenv("THREAD_CONTEXT_MAX_MESSAGES", "200"))
+THREAD_CONTEXT_TTL_SEC = int(os.getenv("THREAD_CONTEXT_TTL_SEC", "86400"))
+# Context window assumed for models without "context_window" in their settings
+THREAD_CONTEXT_WINDOW_TOKENS = int(os.getenv("THREAD_CONTEXT_WINDOW_TOKENS", "8192"))
+# Tokens of the window left free for the reply
+THREAD_CONTEXT_REPLY_TOKENS = int(os.getenv("THREAD_CONTEXT_REPLY_TOKENS", "1024"))
+# Streamed answers are saved every this many seconds or characters
+THREAD_CHECKPOINT_INTERVAL_SEC = float(
+    os.getenv("THREAD_CHECKPOINT_INTERVAL_SEC", "2")
+)
+THREAD_CHECKPOINT_CHARS = int(os.getenv("THREAD_CHECKPOINT_CHARS", "4000"))
+
+# Batch verification
+# Verify model calls in flight at once per /v1/verify/batch request
+VERIFY_BATCH_CONCURRENCY = int(os.getenv("VERIFY_BATCH_CONCURRENCY", "32"))
+VERIFY_BATCH_MAX_CLAIMS = int(os.getenv("VERIFY_BATCH_MAX_CLAIMS", "1000"))
+
+# Streaming Configuration
+# Forward LiteLLM's raw SSE bytes instead of re-serializing every chunk
+SSE_PASSTHROUGH = os.getenv("SSE_PASSTHROUGH", "true").lower() == "true"
+# Upper bound on response text kept per stream for logging
+STREAM_LOG_MAX_CHARS = int(os.getenv("STREAM_LOG_MAX_CHARS", "200000"))
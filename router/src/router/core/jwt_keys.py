@@ -0,0 +1,94 @@
+"""
+Local verification of Supabase access tokens.
+
+HS256 tokens are checked against ``JWT_SECRET``; asymmetric tokens (RS256 /
+ES256) against the project's JWKS, fetched once and refreshed hourly or when a
+token carries an unknown ``kid``. Signature, expiry and audience are checked
+in-process, so no Supabase round trip is needed to authenticate a JWT.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import jwt
+
+from src.router.core.config import JWT_SECRET, JWT_AUDIENCE, SUPABASE_URL
+from src.router.utils.http import http_clients
+from src.router.utils.logger import logger
+
+JWKS_REFRESH_INTERVAL = 3600  # 1 hour
+JWKS_MIN_REFRESH_INTERVAL = 60  # throttle refreshes triggered by unknown kids
+
+_ASYMMETRIC_ALGORITHMS = {"RS256", "ES256"}
+
+
+class JWTKeySet:
+    def __init__(self):
+        self._jwks: Dict[str, jwt.PyJWK] = {}
+        self._fetched_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    @property
+    def jwks_url(self) -> str:
+        return f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+
+    async def _refresh(self, force: bool = False) -> None:
+        async with self._lock:
+            age = time.monotonic() - self._fetched_at
+            if age < JWKS_MIN_REFRESH_INTERVAL or (
+                not force and age < JWKS_REFRESH_INTERVAL
+            ):
+                return
+            self._fetched_at = time.monotonic()
+            try:
+                response = await http_clients.get("auth").get(self.jwks_url)
+                response.raise_for_status()
+                keys = {}
+                for key in response.json().get("keys", []):
+                    try:
+                        keys[key.get("kid")] = jwt.PyJWK(key)
+                    except jwt.PyJWTError as e:
+                        logger.warning(f"Skipping unusable JWKS key: {str(e)}")
+                self._jwks = keys
+            except Exception as e:
+                logger.error(f"Failed to fetch JWKS: {str(e)}")
+
+    async def get_key(self, header: Dict[str, Any]) -> Any:
+        alg = header.get("alg")
+        if alg == "HS256":
+            if not JWT_SECRET:
+                raise jwt.InvalidTokenError("HS256 token but no JWT secret configured")
+            return JWT_SECRET
+
+        if alg not in _ASYMMETRIC_ALGORITHMS:
+            raise jwt.InvalidAlgorithmError(f"Unsupported JWT algorithm: {alg}")
+
+        kid = header.get("kid")
+        await self._refresh()
+        if kid not in self._jwks:
+            await self._refresh(force=True)
+        key = self._jwks.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown JWT key id: {kid}")
+        return key.key
+
+    async def decode(self, token: str) -> Dict[str, Any]:
+        """Verify signature, expiry and audience; return the claims."""
+        header = jwt.get_unverified_header(token)
+        key = await self.get_key(header)
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[header["alg"]],
+            audience=JWT_AUDIENCE,
+            options={"require": ["exp", "sub"]},
+        )
+
+
+def seconds_until_expiry(claims: Dict[str, Any]) -> Optional[float]:
+    exp = claims.get("exp")
+    return None if exp is None else exp - time.time()
+
+
+jwt_keys = JWTKeySet()
@@ -4,17 +4,31 @@ from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from supabase._async.client import AsyncClient, create_client
 from supabase import AsyncClientOptions
-from typing import Annotated
+from typing import Annotated, Optional
 from src.router.core.types import User
 from src.router.models.user import User as UserModel
 from src.router.models.tokens import ApiToken
 from src.router.db.session import DBSession
-from src.router.core.config import SUPABASE_URL, SUPABASE_KEY
+from src.router.core.config import (
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    AUTH_CACHE_TTL_SEC,
+    AUTH_CACHE_MAX_ENTRIES,
+    AUTH_NEGATIVE_CACHE_TTL_SEC,
+    JWT_VERIFY_MODE,
+)
+from src.router.core.jwt_keys import jwt_keys, seconds_until_expiry
+import asyncio
 import jwt
+import hashlib
+from datetime import datetime, timezone
 from src.router.models.machine_tokens import MachineToken
 from src.router.models.machines import Machine
 import logging
 from src.router.utils.redis import redis_client
+from src.router.utils.local_cache import SingleFlight, TTLCache
+from src.router.utils.metrics import AUTH_CACHE_REQUESTS
+from src.router.utils.pubsub import pubsub
 import json
 
 logger = logging.getLogger(__name__)
@@ -27,6 +41,8 @@ security = HTTPBearer()
 CACHE_TTL = 3600  # 1 hour
 JWT_CACHE_TTL = 300  # 5 minutes for JWT tokens
 
+AUTH_REVOKE_CHANNEL = "auth:revoke"
+
 _supabase_client = None
 
 
@@ -58,12 +74,80 @@ async def get_supabase_client() -> AsyncClient:
 SupabaseClient = Annotated[AsyncClient, Depends(get_supabase_client)]
 
 
+class _InvalidToken:
+    """Negative cache entry for a token that failed authentication."""
+
+    __slots__ = ("detail",)
+
+    def __init__(self, detail: str):
+        self.detail = detail
+
+
+# Per-worker L1 in front of Redis, keyed by token hash: parsed User objects
+# (or machine dicts), plus short-lived negative entries for rejected tokens.
+_auth_cache = TTLCache(maxsize=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SEC)
+_auth_flight = SingleFlight()
+_auth_generation = 0
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _evict_token(key: str | None) -> None:
+    global _auth_generation
+    _auth_generation += 1
+    if key is None:
+        _auth_cache.clear()
+    else:
+        _auth_cache.pop(key)
+
+
+pubsub.subscribe(AUTH_REVOKE_CHANNEL, _evict_token)
+
+
+async def revoke_token(token: str) -> None:
+    """Drop a token from every cache layer on all workers."""
+    _evict_token(_token_key(token))
+    await redis_client.delete(f"token:{token}")
+    await pubsub.publish(AUTH_REVOKE_CHANNEL, _token_key(token))
+
+
 async def verify_token(
     supabase: SupabaseClient,
     db: DBSession,
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ):
     token = credentials.credentials
+    key = _token_key(token)
+
+    cached = _auth_cache.get(key)
+    if cached is not None:
+        if isinstance(cached, _InvalidToken):
+            AUTH_CACHE_REQUESTS.labels(result="negative_hit").inc()
+            raise HTTPException(status_code=401, detail=cached.detail)
+        AUTH_CACHE_REQUESTS.labels(result="hit").inc()
+        return cached
+
+    # Only one lookup per token goes to Redis / Supabase / the database;
+    # concurrent requests with the same token wait for it.
+    generation = _auth_generation
+    try:
+        result = await _auth_flight.do(
+            key, lambda: _resolve_token(token, db, supabase)
+        )
+    except HTTPException as e:
+        if e.status_code == 401 and generation == _auth_generation:
+            _auth_cache.set(key, _InvalidToken(e.detail), AUTH_NEGATIVE_CACHE_TTL_SEC)
+        raise
+
+    # Skip if the token was revoked while it was being resolved
+    if generation == _auth_generation:
+        _auth_cache.set(key, result, _auth_cache_ttl(token))
+    return result
+
+
+async def _resolve_token(token: str, db: AsyncSession, supabase: SupabaseClient):
     cache_key = f"token:{token}"
 
     # Try Redis first
@@ -71,10 +155,13 @@ async def verify_token(
     if cached_data:
         try:
             data = json.loads(cached_data)
+            AUTH_CACHE_REQUESTS.labels(result="redis_hit").inc()
             return User(**data) if not data.get("type") == "machine" else data
         except Exception as e:
             logger.warning(f"Cache parse error for token {token[:10]}...: {str(e)}")
 
+    AUTH_CACHE_REQUESTS.labels(result="miss").inc()
+
     if token.startswith("sk-mira-"):
         result = await handle_api_token(token, db, supabase)
         await cache_token_data(cache_key, result.model_dump_json(), CACHE_TTL)
@@ -87,10 +174,38 @@ async def verify_token(
 
     # Handle JWT token
     result = await handle_jwt_token(token, supabase)
-    await cache_token_data(cache_key, result.model_dump_json(), JWT_CACHE_TTL)
+    await cache_token_data(cache_key, result.model_dump_json(), _jwt_cache_ttl(token))
     return result
 
 
+def _jwt_seconds_left(token: str) -> Optional[float]:
+    """Seconds until a JWT expires; None for other tokens or no ``exp``."""
+    if token.startswith(("sk-mira-", "mk-mira-")):
+        return None
+    try:
+        claims = jwt.decode(token, options={"verify_signature": False})
+    except jwt.PyJWTError:
+        return None
+    return seconds_until_expiry(claims)
+
+
+def _jwt_cache_ttl(token: str) -> int:
+    """JWT_CACHE_TTL, but never past the token's own expiry."""
+    remaining = _jwt_seconds_left(token)
+    if remaining is None:
+        return JWT_CACHE_TTL
+    return max(1, min(JWT_CACHE_TTL, int(remaining)))
+
+
+def _auth_cache_ttl(token: str) -> float:
+    """AUTH_CACHE_TTL_SEC, but never past a JWT's own expiry (an expired
+    token is not cached at all)."""
+    remaining = _jwt_seconds_left(token)
+    if remaining is None:
+        return AUTH_CACHE_TTL_SEC
+    return min(AUTH_CACHE_TTL_SEC, remaining)
+
+
 async def handle_api_token(token: str, db: AsyncSession, supabase: SupabaseClient):
     api_token = await db.exec(
         select(ApiToken).where(
@@ -125,6 +240,7 @@ async def handle_api_token(token: str, db: AsyncSession, supabase: SupabaseClien
         **user_response.user.model_dump(),
         roles=user_roles,
         api_key_id=api_token.id,
+        api_key_meta=api_token.meta_data or {},
     )
 
 
@@ -159,6 +275,9 @@ async def handle_machine_token(token: str, db: AsyncSession):
 
 
 async def handle_jwt_token(token: str, supabase: SupabaseClient):
+    if JWT_VERIFY_MODE == "local":
+        return await handle_jwt_token_locally(token)
+
     try:
         decoded_token = jwt.decode(token, options={"verify_signature": False})
         user_res = await supabase.auth.get_user(token)
@@ -178,6 +297,73 @@ async def handle_jwt_token(token: str, supabase: SupabaseClient):
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+async def handle_jwt_token_locally(token: str):
+    try:
+        claims = await jwt_keys.decode(token)
+    except jwt.PyJWTError as e:
+        logger.info(f"JWT validation error: {e}")
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    aud = claims.get("aud")
+    user = User(
+        id=claims["sub"],
+        aud=aud[0] if isinstance(aud, list) else aud or "",
+        email=claims.get("email") or None,
+        phone=claims.get("phone") or None,
+        role=claims.get("role"),
+        app_metadata=claims.get("app_metadata") or {},
+        user_metadata=claims.get("user_metadata") or {},
+        is_anonymous=claims.get("is_anonymous", False),
+        # Access tokens don't carry the account creation time; the background
+        # revalidation replaces this with the full Supabase profile.
+        created_at=datetime.fromtimestamp(claims.get("iat", 0), tz=timezone.utc),
+        roles=claims.get("user_roles", []),
+        api_key_id=DEFAULT_JWT_API_KEY_ID,
+    )
+
+    task = asyncio.create_task(_revalidate_jwt(token, user.roles))
+    _revalidations.add(task)
+    task.add_done_callback(_revalidations.discard)
+    return user
+
+
+_revalidations: set = set()
+
+
+async def _revalidate_jwt(token: str, roles: list):
+    """Check a locally verified JWT against Supabase off the request path.
+
+    Runs whenever the token's Redis entry is (re)built, i.e. at most every
+    JWT_CACHE_TTL, so signed-out sessions and deleted users are revoked on
+    that schedule.
+    """
+    try:
+        supabase = await get_supabase_client()
+        user_res = await supabase.auth.get_user(token)
+    except Exception as e:
+        if getattr(e, "status", None) not in (401, 403):
+            logger.warning(f"JWT revalidation skipped: {str(e)}")
+            return
+        user_res = None
+
+    try:
+        if not user_res or not user_res.user:
+            logger.info("Revoking JWT rejected by Supabase")
+            await revoke_token(token)
+            return
+
+        user = User(
+            **user_res.user.model_dump(),
+            roles=roles,
+            api_key_id=DEFAULT_JWT_API_KEY_ID,
+        )
+        await redis_client.set(
+            f"token:{token}", user.model_dump_json(), ex=_jwt_cache_ttl(token), xx=True
+        )
+    except Exception as e:
+        logger.error(f"JWT revalidation error: {str(e)}")
+
+
 async def cache_token_data(key: str, data: str, ttl: int):
     await redis_client.set(
         key,
@@ -1,16 +1,32 @@
 from pydantic import BaseModel, RootModel
-from typing import Dict
+from typing import Dict, Optional
 
 
 class ModelConfig(BaseModel):
     id: str
     prompt_token: float
     completion_token: float
+    # Prompt + completion tokens the model accepts, when known
+    context_window: Optional[int] = None
 
 
 class SupportedModelsSettings(RootModel):
     root: Dict[str, ModelConfig]
 
 
+class RateLimits(BaseModel):
+    rpm: Optional[int] = None  # requests per minute
+    tpm: Optional[int] = None  # tokens per minute
+
+
+class RateLimitSettings(BaseModel):
+    # Defaults for API keys without "rate_limit" in their meta_data
+    api_key: RateLimits = RateLimits()
+    user: RateLimits = RateLimits()
+
+
 # Add more settings types as needed
-SETTINGS_MODELS = {"SUPPORTED_MODELS": SupportedModelsSettings}
+SETTINGS_MODELS = {
+    "SUPPORTED_MODELS": SupportedModelsSettings,
+    "RATE_LIMITS": RateLimitSettings,
+}
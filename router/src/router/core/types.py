@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from gotrue import User as GoUser
 from pydantic import BaseModel
 
@@ -6,6 +6,7 @@ from pydantic import BaseModel
 class User(GoUser):
     roles: List[str] = []
     api_key_id: Optional[int] = None
+    api_key_meta: Dict[str, Any] = {}
 
 
 class ModelPricing(BaseModel):
@@ -13,17 +13,39 @@ from fastapi.middleware import Middleware
 from contextlib import asynccontextmanager
 from src.router.db.session import async_engine
 from src.router.utils.metrics import PrometheusMiddleware
+from src.router.utils.opensearch import bulk_indexer
+from src.router.utils.inference_logs import inference_log_sender
+from src.router.utils.http import http_clients
+from src.router.utils.pubsub import pubsub
+from src.router.utils.machine_registry import machine_registry, sync_machines
+from src.router.utils.circuit_breaker import circuit_breakers
+from src.router.api.v1.flow_batches import flow_batch_runner
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # # Startup - expose metrics endpoint
     # instrumentator.expose(app)
-    
+    await http_clients.start()
+    await pubsub.start()
+    await sync_machines()
+    await machine_registry.start()
+    await circuit_breakers.load()
+    await bulk_indexer.start()
+    await inference_log_sender.start()
+    # Resumes batch jobs left unfinished by a previous run
+    await flow_batch_runner.start()
+
     try:
         yield
     # Shutdown
     finally:
+        await flow_batch_runner.stop()
+        await inference_log_sender.stop()
+        await bulk_indexer.stop()
+        await http_clients.close()
+        await pubsub.stop()
+        await machine_registry.stop()
         await cleanup()
         await async_engine.dispose()
 
@@ -1,10 +1,12 @@
 from typing import List
-from sqlalchemy import func, JSON
+from sqlalchemy import Index, func, JSON
 from sqlmodel import SQLModel, Field as SQLField
 from datetime import datetime
 
 
 class Flows(SQLModel, table=True):
+    __table_args__ = (Index("ix_flows_created_at_id", "created_at", "id"),)
+
     id: int | None = SQLField(default=None, primary_key=True)
     system_prompt: str = SQLField(nullable=False)
     name: str = SQLField(nullable=False, unique=False)
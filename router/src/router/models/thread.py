@@ -1,5 +1,5 @@
 from typing import Dict, List, Optional
-from sqlalchemy import Column, DateTime, func, JSON
+from sqlalchemy import Column, DateTime, Index, func, JSON
 from sqlmodel import SQLModel, Field as SQLField
 from datetime import datetime
 from uuid import UUID, uuid4
@@ -8,6 +8,9 @@ from uuid import UUID, uuid4
 # Thread Model
 class Thread(SQLModel, table=True):
     __tablename__ = "threads"
+    __table_args__ = (
+        Index("ix_threads_user_id_updated_at_id", "user_id", "updated_at", "id"),
+    )
 
     id: UUID = SQLField(default_factory=uuid4, primary_key=True)
     title: str = SQLField(nullable=False)
@@ -21,6 +24,9 @@ class Thread(SQLModel, table=True):
 # Message Model
 class Message(SQLModel, table=True):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_thread_id_created_at_id", "thread_id", "created_at", "id"),
+    )
 
     id: UUID = SQLField(default_factory=uuid4, primary_key=True)
     thread_id: UUID = SQLField(nullable=False, index=True)
@@ -1,11 +1,15 @@
 from sqlmodel import SQLModel, Field, Column
 from typing import Optional, Dict, Any
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import Index, func
 from sqlalchemy.dialects.postgresql import JSONB
 
 
 class ApiToken(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_apitoken_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     user_id: str
     token: str
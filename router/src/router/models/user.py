@@ -51,4 +51,5 @@ class User(SQLModel, table=True):
                 postgresql_using="gin",
             ),
             Index("ix_users_credits_user_id", "credits", "user_id"),
+            Index("ix_user_created_at_id", "created_at", "id"),
         ]
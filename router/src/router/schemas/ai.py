@@ -55,3 +55,21 @@ class VerifyRequest(BaseModel):
     messages: list[Message] = Field([], title="Messages")
     models: list[str] = Field(["mira/llama3.1"], title="Models")
     min_yes: int = Field(3, title="Minimum yes")
+    stream: bool = Field(
+        False,
+        title="Stream",
+        description="Stream each model's verdict as server-sent events",
+    )
+
+
+class VerifyClaim(BaseModel):
+    id: Optional[str] = Field(
+        None, title="Claim ID", description="Echoed back with the claim's result"
+    )
+    messages: list[Message] = Field([], title="Messages")
+
+
+class VerifyBatchRequest(BaseModel):
+    claims: list[VerifyClaim] = Field(..., title="Claims", min_length=1)
+    models: list[str] = Field(["mira/llama3.1"], title="Models")
+    min_yes: int = Field(3, title="Minimum yes")
@@ -25,6 +25,14 @@ class FlowChatCompletion(BaseModel):
     )
 
 
+class FlowBatchRow(BaseModel):
+    """One line of a flow batch dataset."""
+
+    id: Optional[Union[str, int]] = None
+    variables: Dict[str, Any] = Field(default_factory=dict)
+    messages: List[Message] = Field(default_factory=list)
+
+
 class FlowUpdateRequest(BaseModel):
     system_prompt: Optional[str] = Field(None, title="System Prompt")
     name: Optional[str] = Field(None, title="Name")
@@ -7,6 +7,10 @@ class MachineInfo(BaseModel):
     network_ip: str
 
 
+class LivenessBatchRequest(BaseModel):
+    network_ips: List[str] = Field(min_length=1, max_length=1000)
+
+
 class MachineAuthToken(BaseModel):
     description: str | None = None
 
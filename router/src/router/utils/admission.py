@@ -0,0 +1,212 @@
+"""
+Adaptive concurrency limits per model (AIMD).
+
+Every upstream call for a model takes a permit. While fewer than ``limit``
+calls are in flight a permit is granted at once; otherwise the request waits
+in a short queue and is shed with 429 and ``Retry-After`` if nothing frees up
+within ``ADMISSION_QUEUE_TIMEOUT_SEC`` or the queue is full.
+
+The limit adapts to what the upstream can take:
+
+- additive increase: each successful call adds ``1 / limit`` while the limit
+  is actually in use, i.e. about +1 per limit's worth of calls
+- multiplicative decrease: an error, or a first-token latency above
+  ``ADMISSION_LATENCY_TOLERANCE`` times the long-run baseline, cuts the limit
+  by ``DECREASE_FACTOR`` (at most once per baseline latency, so one burst of
+  slow responses counts once)
+
+Limits are per worker. With ``ADMISSION_CONTROL_ENABLED`` off every request
+is admitted.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from src.router.core.config import (
+    ADMISSION_CONTROL_ENABLED,
+    ADMISSION_INITIAL_LIMIT,
+    ADMISSION_LATENCY_TOLERANCE,
+    ADMISSION_MAX_LIMIT,
+    ADMISSION_MIN_LIMIT,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_QUEUE_TIMEOUT_SEC,
+)
+from src.router.utils.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_LIMIT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_REJECTED,
+)
+
+DECREASE_FACTOR = 0.9
+BASELINE_ALPHA = 0.05
+
+
+class Permit:
+    """One admitted upstream call. Release it exactly once, with the outcome."""
+
+    __slots__ = ("limiter", "started", "ttft", "released")
+
+    def __init__(self, limiter: Optional["AdaptiveLimiter"]):
+        self.limiter = limiter
+        self.started = time.monotonic()
+        self.ttft: Optional[float] = None
+        self.released = False
+
+    def first_token(self) -> None:
+        """Mark the first token; measured from admission, not queueing."""
+        if self.ttft is None:
+            self.ttft = time.monotonic() - self.started
+
+    def release(self, ok: bool = True) -> None:
+        if not self.released:
+            self.released = True
+            if self.limiter is not None:
+                self.limiter._release(ok, self.ttft)
+
+
+
+class PermitStreamingResponse(StreamingResponse):
+    """Streams ``content`` and releases ``permit`` however the response ends.
+
+    The body's own ``finally`` never runs if the client goes away before the
+    first chunk, or is left suspended if the send is cancelled mid-stream, so
+    the body is closed here and the permit released after it (a no-op when
+    the body already released it with its outcome).
+    """
+
+    def __init__(self, content, permit: Permit, **kwargs):
+        super().__init__(content, **kwargs)
+        self.permit = permit
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                await self.body_iterator.aclose()
+            finally:
+                self.permit.release()
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        name: str,
+        initial_limit: float = ADMISSION_INITIAL_LIMIT,
+        min_limit: float = ADMISSION_MIN_LIMIT,
+        max_limit: float = ADMISSION_MAX_LIMIT,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SEC,
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.baseline: Optional[float] = None
+        self._last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._publish()
+
+    def _publish(self) -> None:
+        ADMISSION_LIMIT.labels(model=self.name).set(self.limit)
+        ADMISSION_IN_FLIGHT.labels(model=self.name).set(self.in_flight)
+        ADMISSION_QUEUE_DEPTH.labels(model=self.name).set(len(self._waiters))
+
+    def _reject(self) -> HTTPException:
+        ADMISSION_REJECTED.labels(model=self.name).inc()
+        return HTTPException(
+            status_code=429,
+            detail=f"Too many concurrent requests for {self.name}, retry later",
+            headers={"Retry-After": str(max(1, math.ceil(self.queue_timeout)))},
+        )
+
+    async def acquire(self) -> Permit:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self._publish()
+            return Permit(self)
+
+        if len(self._waiters) >= self.queue_size:
+            raise self._reject()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            # The releasing call hands its slot over by resolving the future
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject()
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(True, None)  # handed a slot we will not use
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._publish()
+        return Permit(self)
+
+    def _release(self, ok: bool, latency: Optional[float]) -> None:
+        self._adapt(ok, latency)
+        self.in_flight -= 1
+        self._wake()
+        self._publish()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _adapt(self, ok: bool, latency: Optional[float]) -> None:
+        slow = False
+        if latency is not None:
+            if self.baseline is None:
+                self.baseline = latency
+            slow = latency > self.baseline * ADMISSION_LATENCY_TOLERANCE
+            if not slow:
+                self.baseline += BASELINE_ALPHA * (latency - self.baseline)
+
+        if ok and not slow:
+            # Only grow while the current limit is actually being used
+            if self.in_flight >= self.limit / 2:
+                self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+            return
+
+        now = time.monotonic()
+        if now - self._last_decrease >= (self.baseline or 1.0):
+            self._last_decrease = now
+            self.limit = max(self.limit * DECREASE_FACTOR, self.min_limit)
+
+
+class AdmissionController:
+    def __init__(self, enabled: bool = ADMISSION_CONTROL_ENABLED):
+        self.enabled = enabled
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def limiter(self, model: str) -> AdaptiveLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limiter = self._limiters[model] = AdaptiveLimiter(model)
+        return limiter
+
+    async def acquire(self, model: str) -> Permit:
+        """Admit one upstream call for ``model`` or raise 429."""
+        if not self.enabled:
+            return Permit(None)
+        return await self.limiter(model).acquire()
+
+
+admission = AdmissionController()
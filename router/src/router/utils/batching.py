@@ -0,0 +1,136 @@
+"""
+Bounded in-memory batching for fire-and-forget side writes.
+
+A ``BackgroundBatcher`` buffers items submitted from the request path and
+flushes them from a single background task, either when ``batch_size`` items
+are waiting or every ``interval`` seconds. Submitting never blocks: once the
+buffer holds ``queue_max`` items new ones are rejected (and counted), which is
+the backpressure policy - the request path must never wait on a side system.
+"""
+
+import asyncio
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, List, Optional
+
+from src.router.utils.logger import logger
+from src.router.utils.metrics import (
+    BATCH_FLUSH_FAILURES,
+    BATCH_FLUSH_LATENCY,
+    BATCH_ITEMS_FLUSHED,
+    BATCH_QUEUE_DEPTH,
+    BATCH_REJECTED,
+)
+
+
+class BackgroundBatcher(ABC):
+    """Base class; subclasses implement ``send`` for a list of items."""
+
+    def __init__(
+        self,
+        name: str,
+        batch_size: int,
+        interval: float,
+        queue_max: int,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+    ):
+        self.name = name
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.queue_max = queue_max
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._items: Deque[Any] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        BATCH_QUEUE_DEPTH.labels(batcher=name).set_function(lambda: len(self._items))
+
+    @property
+    def enabled(self) -> bool:
+        return True
+
+    def submit(self, item: Any) -> bool:
+        """Queue an item for the next flush. Returns False if it was rejected."""
+        if not self.enabled:
+            return False
+        if len(self._items) >= self.queue_max:
+            BATCH_REJECTED.labels(batcher=self.name).inc()
+            return False
+        self._items.append(item)
+        if len(self._items) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    @abstractmethod
+    async def send(self, items: List[Any]) -> None:
+        """Deliver one batch; raise to have it retried."""
+
+    async def start(self) -> None:
+        if self._task is None and self.enabled:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name=f"batcher:{self.name}")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop the background task and drain whatever is still buffered."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Batcher {self.name} did not drain in {timeout}s, "
+                f"dropping {len(self._items)} items"
+            )
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._drain()
+
+        await self._drain()
+
+    async def _drain(self) -> None:
+        while self._items:
+            batch = [
+                self._items.popleft()
+                for _ in range(min(self.batch_size, len(self._items)))
+            ]
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Any]) -> None:
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.send(batch)
+                BATCH_ITEMS_FLUSHED.labels(batcher=self.name).inc(len(batch))
+                break
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    BATCH_FLUSH_FAILURES.labels(batcher=self.name).inc(len(batch))
+                    logger.error(
+                        f"Batcher {self.name} failed to flush {len(batch)} items: {str(e)}"
+                    )
+                    break
+                # Exponential backoff with full jitter
+                delay = random.uniform(0, self.retry_backoff * (2**attempt))
+                logger.warning(
+                    f"Batcher {self.name} flush failed ({str(e)}), retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+        BATCH_FLUSH_LATENCY.labels(batcher=self.name).observe(
+            time.perf_counter() - start
+        )
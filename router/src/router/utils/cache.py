@@ -1,96 +1,151 @@
+import asyncio
+import hashlib
 import json
+import re
 import uuid
 import time
-from typing import Optional, Dict, Any
-import httpx
+from typing import Optional, Dict, Any, List
 from fastapi.responses import StreamingResponse, Response
-from src.router.core.config import ENABLE_CACHE, CACHE_API_URL, CACHE_API_KEY
+from src.router.core.config import (
+    ENABLE_CACHE,
+    RESPONSE_CACHE_TTL_SEC,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_MAX_ENTRY_BYTES,
+    RESPONSE_CACHE_REPLAY_CHUNK_CHARS,
+)
+from src.router.core.types import User
+from src.router.schemas.ai import AiRequest
+from src.router.utils.local_cache import TTLCache
 from src.router.utils.logger import logger
+from src.router.utils.metrics import RESPONSE_CACHE_REQUESTS
+from src.router.utils.redis import redis_client
+
+RESPONSE_CACHE_KEY = "resp_cache:{hash}"
+
+# Request fields that change the completion, besides model and messages
+_CACHE_KEY_FIELDS = {"max_tokens", "reasoning_effort", "tools", "tool_choice"}
+
+_REPLAY_CHUNK_RE = re.compile(r"\S*\s*")
+
+
+def canonical_request_hash(model: str, req: AiRequest) -> str:
+    """Stable hash of everything that determines a completion."""
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": msg.role, "content": msg.content} for msg in req.messages
+        ],
+        "params": req.model_dump(include=_CACHE_KEY_FIELDS, exclude_none=True),
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def split_for_replay(content: str, chunk_chars: int) -> List[str]:
+    """Split text on word boundaries into chunks of about ``chunk_chars``."""
+    chunks, current = [], ""
+    for word in _REPLAY_CHUNK_RE.findall(content):
+        current += word
+        if len(current) >= chunk_chars:
+            chunks.append(current)
+            current = ""
+    if current:
+        chunks.append(current)
+    return chunks or [""]
 
 
 class CacheService:
-    """Service for handling external cache operations"""
-    
+    """Two-tier response cache: a per-worker LRU in front of Redis.
+
+    Keyed by ``canonical_request_hash``. Only used for API keys that opt in
+    with ``"response_cache": true`` in their meta_data. Lookups hit the LRU
+    first (no I/O); writes go to the LRU immediately and to Redis in the
+    background so neither path adds latency to the completion.
+    """
+
     def __init__(self):
         self.enabled = ENABLE_CACHE
-        self.api_url = CACHE_API_URL
-        self.api_key = CACHE_API_KEY
-    
-    async def check(self, query: str) -> Optional[Dict[str, Any]]:
-        """Check if a query exists in cache"""
-        if not self.enabled or not query:
-            return None
-        
+        self._local = TTLCache(
+            maxsize=100_000,
+            ttl=RESPONSE_CACHE_TTL_SEC,
+            max_bytes=RESPONSE_CACHE_MAX_BYTES,
+        )
+        self._pending: set = set()
+
+    def enabled_for(self, user: User) -> bool:
+        return self.enabled and bool(user.api_key_meta.get("response_cache"))
+
+    async def check(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached ``{"response": ...}`` for a request hash, if any."""
+        data = self._local.get(key)
+        if data is not None:
+            RESPONSE_CACHE_REQUESTS.labels(result="local_hit").inc()
+            return data
+
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.api_url}/cache",
-                    json={"query": query},
-                    headers={
-                        "Content-Type": "application/json",
-                        "X-API-Key": self.api_key
-                    },
-                    timeout=2.0  # Short timeout for cache check
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get("hit") and data.get("response"):
-                        return data
-                        
+            raw = await redis_client.get(RESPONSE_CACHE_KEY.format(hash=key))
         except Exception as e:
             logger.warning(f"Cache check failed: {str(e)}")
-        
-        return None
-    
-    async def save(self, query: str, response: str) -> None:
-        """Save a response to cache (fire and forget)"""
-        if not self.enabled or not query or not response:
+            raw = None
+
+        if raw is None:
+            RESPONSE_CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+
+        RESPONSE_CACHE_REQUESTS.labels(result="redis_hit").inc()
+        data = json.loads(raw)
+        self._local.set(key, data, size=len(raw))
+        return data
+
+    def save(self, key: str, response: str) -> None:
+        """Store a response in both tiers; the Redis write is fire and forget."""
+        if not response:
             return
-        
+        raw = json.dumps({"response": response})
+        if len(raw) > RESPONSE_CACHE_MAX_ENTRY_BYTES:
+            return
+        self._local.set(key, {"response": response}, size=len(raw))
+
+        task = asyncio.create_task(self._save_shared(key, raw))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _save_shared(self, key: str, raw: str) -> None:
         try:
-            async with httpx.AsyncClient() as client:
-                await client.post(
-                    f"{self.api_url}/cache",
-                    json={
-                        "query": query,
-                        "response": response
-                    },
-                    headers={
-                        "Content-Type": "application/json",
-                        "X-API-Key": self.api_key
-                    },
-                    timeout=5.0
-                )
-                logger.info(f"Cached response for query: {query[:50]}...")
+            await redis_client.set(
+                RESPONSE_CACHE_KEY.format(hash=key), raw, ex=int(RESPONSE_CACHE_TTL_SEC)
+            )
         except Exception as e:
             logger.warning(f"Failed to save to cache: {str(e)}")
-    
+
     def build_streaming_response(self, cached_content: str, model: str) -> StreamingResponse:
         """Build a streaming response from cached content"""
         async def stream_cached_response():
-            # Send initial chunk
-            chunk = {
-                "id": f"chatcmpl-{uuid.uuid4().hex[:8]}",
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": model,
-                "choices": [{
-                    "index": 0,
-                    "delta": {
-                        "role": "assistant",
-                        "content": cached_content
-                    },
-                    "finish_reason": None
-                }]
-            }
-            yield f"data: {json.dumps(chunk)}\n\n"
-            
+            chunk_id = f"chatcmpl-{uuid.uuid4().hex[:8]}"
+            created = int(time.time())
+            pieces = split_for_replay(cached_content, RESPONSE_CACHE_REPLAY_CHUNK_CHARS)
+            for i, piece in enumerate(pieces):
+                delta = {"content": piece}
+                if i == 0:
+                    delta["role"] = "assistant"
+                chunk = {
+                    "id": chunk_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "delta": delta,
+                        "finish_reason": None
+                    }]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+
             # Send final chunk with finish reason
             final_chunk = {
-                "id": chunk["id"],
+                "id": chunk_id,
                 "object": "chat.completion.chunk",
-                "created": chunk["created"],
+                "created": created,
                 "model": model,
                 "choices": [{
                     "index": 0,
@@ -0,0 +1,284 @@
+"""
+Passive outlier ejection for machines and deployments.
+
+Every completion reports its outcome for its deployment
+(``<model>-machine-<id>``) and for the machine as a whole. An outcome is a
+failure if the call errored, the stream stalled, or the first token took
+longer than ``CIRCUIT_SLOW_TTFT_SEC``. A breaker trips (ejects the target)
+after ``CIRCUIT_CONSECUTIVE_FAILURES`` failures in a row, or when at least
+``CIRCUIT_FAILURE_RATE`` of the last ``CIRCUIT_WINDOW_SEC`` worth of outcomes
+(minimum ``CIRCUIT_MIN_REQUESTS``) failed.
+
+An ejected target stays out for ``CIRCUIT_BASE_EJECTION_SEC``, doubling on
+every ejection up to ``CIRCUIT_MAX_EJECTION_SEC``. Once that expires the
+breaker is half-open: a single probe request is let through, which closes the
+breaker on success and ejects again (with the longer backoff) on failure.
+
+Outcomes are counted per worker; ejections and recoveries are shared. They
+are stored in the ``circuits:open`` hash and broadcast over pub/sub, so every
+worker steers away from a bad node as soon as one of them ejects it.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+from src.router.core.config import (
+    CIRCUIT_BASE_EJECTION_SEC,
+    CIRCUIT_CONSECUTIVE_FAILURES,
+    CIRCUIT_FAILURE_RATE,
+    CIRCUIT_MAX_EJECTION_SEC,
+    CIRCUIT_MIN_REQUESTS,
+    CIRCUIT_SLOW_TTFT_SEC,
+    CIRCUIT_WINDOW_SEC,
+)
+from src.router.utils.logger import logger
+from src.router.utils.metrics import CIRCUIT_TRANSITIONS, CIRCUITS_OPEN
+from src.router.utils.nr import track
+from src.router.utils.pubsub import pubsub
+from src.router.utils.redis import redis_client
+
+CIRCUITS_KEY = "circuits:open"
+CIRCUIT_CHANNEL = "circuits:events"
+
+# A half-open probe that never reports back frees its slot after this long
+PROBE_TIMEOUT_SEC = 60.0
+
+
+class StreamStalled(Exception):
+    """No bytes arrived from upstream within the stall timeout."""
+
+
+async def guard_stalls(chunks: AsyncIterator[bytes], timeout: float):
+    """Re-yield ``chunks``, raising StreamStalled if the gap between two
+    chunks exceeds ``timeout`` seconds."""
+    iterator = chunks.__aiter__()
+    while True:
+        try:
+            async with asyncio.timeout(timeout):
+                chunk = await iterator.__anext__()
+        except StopAsyncIteration:
+            return
+        except TimeoutError:
+            raise StreamStalled(f"No data from upstream for {timeout:.0f}s")
+        yield chunk
+
+
+class Breaker:
+    __slots__ = (
+        "outcomes",
+        "consecutive_failures",
+        "ejections",
+        "open_until",
+        "probe_started",
+        "closed_at",
+    )
+
+    def __init__(self):
+        self.outcomes: Deque[Tuple[float, bool]] = deque()
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.open_until = 0.0
+        self.probe_started: Optional[float] = None
+        self.closed_at = 0.0
+
+    def is_open(self, now: float) -> bool:
+        return now < self.open_until
+
+    def is_half_open(self, now: float) -> bool:
+        return bool(self.open_until) and now >= self.open_until
+
+    def available(self, now: float) -> bool:
+        if self.is_open(now):
+            return False
+        if self.is_half_open(now) and self.probe_started is not None:
+            return now - self.probe_started > PROBE_TIMEOUT_SEC
+        return True
+
+    def should_trip(self, now: float) -> bool:
+        while self.outcomes and self.outcomes[0][0] < now - CIRCUIT_WINDOW_SEC:
+            self.outcomes.popleft()
+        if self.consecutive_failures >= CIRCUIT_CONSECUTIVE_FAILURES:
+            return True
+        if len(self.outcomes) < CIRCUIT_MIN_REQUESTS:
+            return False
+        failures = sum(1 for _, ok in self.outcomes if not ok)
+        return failures / len(self.outcomes) >= CIRCUIT_FAILURE_RATE
+
+
+def deployment_key(model: str, machine_id: int) -> str:
+    return f"{model}-machine-{machine_id}"
+
+
+def machine_key(machine_id: int) -> str:
+    return f"machine-{machine_id}"
+
+
+class CircuitBreakers:
+    def __init__(self):
+        self._breakers: Dict[str, Breaker] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _get(self, key: str) -> Breaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = Breaker()
+        return breaker
+
+    # Steering
+
+    def allow(self, model: str, machine_id: int) -> bool:
+        """Whether the deployment may be picked (closed, or half-open with
+        its probe slot free). Has no side effects."""
+        now = time.time()
+        for key in (machine_key(machine_id), deployment_key(model, machine_id)):
+            breaker = self._breakers.get(key)
+            if breaker is not None and not breaker.available(now):
+                return False
+        return True
+
+    def on_selected(self, model: str, machine_id: int) -> None:
+        """Claim the probe slot of half-open breakers for a picked deployment."""
+        now = time.time()
+        for key in (machine_key(machine_id), deployment_key(model, machine_id)):
+            breaker = self._breakers.get(key)
+            if breaker is not None and breaker.is_half_open(now):
+                breaker.probe_started = now
+
+    def open_count(self) -> int:
+        now = time.time()
+        return sum(1 for b in self._breakers.values() if b.is_open(now))
+
+    # Outcomes
+
+    def record(
+        self,
+        model: str,
+        machine_id: int,
+        ok: bool,
+        ttft: Optional[float] = None,
+    ) -> None:
+        if not machine_id:
+            return
+        if ok and ttft is not None and ttft > CIRCUIT_SLOW_TTFT_SEC:
+            ok = False
+        now = time.time()
+        for key in (machine_key(machine_id), deployment_key(model, machine_id)):
+            self._record(key, ok, now)
+
+    def _record(self, key: str, ok: bool, now: float) -> None:
+        breaker = self._get(key)
+        half_open = breaker.is_half_open(now)
+        breaker.outcomes.append((now, ok))
+        if ok:
+            breaker.consecutive_failures = 0
+        else:
+            breaker.consecutive_failures += 1
+
+        if half_open:
+            if ok:
+                self._close(key, breaker)
+                self._share(key, None)
+            else:
+                self._trip(key, breaker, now)
+        elif not ok and not breaker.is_open(now) and breaker.should_trip(now):
+            self._trip(key, breaker, now)
+
+    def _trip(self, key: str, breaker: Breaker, now: float) -> None:
+        # Forget ejections if the target has been healthy for a while
+        healthy_for = now - breaker.closed_at
+        if not breaker.open_until and healthy_for > CIRCUIT_MAX_EJECTION_SEC:
+            breaker.ejections = 0
+        breaker.ejections += 1
+        duration = min(
+            CIRCUIT_BASE_EJECTION_SEC * 2 ** (breaker.ejections - 1),
+            CIRCUIT_MAX_EJECTION_SEC,
+        )
+        self._open(key, breaker, now + duration, breaker.ejections)
+        logger.warning(f"Ejected {key} for {duration:.0f}s")
+        track("circuit_open", {"key": key, "duration": duration})
+        state = {"until": breaker.open_until, "ejections": breaker.ejections}
+        self._share(key, state)
+
+    def _open(self, key: str, breaker: Breaker, until: float, ejections: int) -> None:
+        breaker.open_until = until
+        breaker.ejections = ejections
+        breaker.probe_started = None
+        breaker.outcomes.clear()
+        breaker.consecutive_failures = 0
+        CIRCUIT_TRANSITIONS.labels(state="open").inc()
+        CIRCUITS_OPEN.set(self.open_count())
+
+    def _close(self, key: str, breaker: Breaker) -> None:
+        breaker.open_until = 0.0
+        breaker.closed_at = time.time()
+        breaker.probe_started = None
+        breaker.outcomes.clear()
+        breaker.consecutive_failures = 0
+        CIRCUIT_TRANSITIONS.labels(state="closed").inc()
+        CIRCUITS_OPEN.set(self.open_count())
+        logger.info(f"Restored {key}")
+
+    # Sharing between workers
+
+    def _share(self, key: str, state: Optional[dict]) -> None:
+        task = asyncio.create_task(self._publish(key, state))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _publish(self, key: str, state: Optional[dict]) -> None:
+        try:
+            if state is None:
+                await redis_client.hdel(CIRCUITS_KEY, key)
+            else:
+                await redis_client.hset(CIRCUITS_KEY, key, json.dumps(state))
+            await pubsub.publish(CIRCUIT_CHANNEL, {"key": key, "state": state})
+        except Exception as e:
+            logger.error(f"Failed to share circuit state for {key}: {str(e)}")
+
+    def apply(self, key: str, state: Optional[dict]) -> None:
+        """Adopt an ejection or recovery decided by another worker."""
+        breaker = self._get(key)
+        if state is None:
+            if breaker.open_until:
+                self._close(key, breaker)
+            return
+        until = float(state.get("until", 0))
+        if until > breaker.open_until:
+            self._open(key, breaker, until, int(state.get("ejections", 1)))
+
+    async def load(self) -> None:
+        """Load every shared ejection, e.g. at startup or after pub/sub
+        reconnects and messages may have been missed."""
+        try:
+            states = await redis_client.hgetall(CIRCUITS_KEY)
+        except Exception as e:
+            logger.error(f"Failed to load circuit states: {str(e)}")
+            return
+        now = time.time()
+        stale = []
+        for key, value in states.items():
+            key = key.decode() if isinstance(key, bytes) else key
+            state = json.loads(value)
+            # Recently expired entries still mark targets awaiting a probe
+            if state.get("until", 0) > now - CIRCUIT_MAX_EJECTION_SEC:
+                self.apply(key, state)
+            else:
+                stale.append(key)
+        if stale:
+            await redis_client.hdel(CIRCUITS_KEY, *stale)
+
+
+circuit_breakers = CircuitBreakers()
+
+
+async def _on_circuit_event(message: Optional[dict]) -> None:
+    if message is None:
+        await circuit_breakers.load()
+    elif isinstance(message, dict) and "key" in message:
+        circuit_breakers.apply(message["key"], message.get("state"))
+
+
+pubsub.subscribe(CIRCUIT_CHANNEL, _on_circuit_event)
@@ -0,0 +1,133 @@
+"""
+Coalescing of identical in-flight completions.
+
+When several callers send the same request (same ``canonical_request_hash``)
+at the same time, only the first one reaches LiteLLM. Streaming callers all
+read the upstream SSE bytes from one shared buffer, late joiners replaying it
+from the start; non-streaming callers share the same response object. Each
+caller still runs its own SSE scan and ``save_log``, so billing and logging
+stay per request.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from src.router.utils.local_cache import SingleFlight
+from src.router.utils.logger import logger
+from src.router.utils.metrics import COALESCED_REQUESTS
+
+StreamOpener = Callable[[], AsyncContextManager[Tuple[Any, AsyncIterator[bytes]]]]
+
+
+class SharedStream:
+    """Append-only buffer of SSE chunks read by any number of subscribers."""
+
+    def __init__(self):
+        self.headers: Any = None
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        # Wake everyone waiting on the current event, then start a new one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def open(self, headers: Any) -> None:
+        self.headers = headers
+        self._ready.set()
+
+    def append(self, chunk: bytes) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._ready.set()
+        self._notify()
+
+    async def wait_ready(self) -> None:
+        await self._ready.wait()
+        if self.headers is None and self.error is not None:
+            raise self.error
+
+    async def subscribe(self) -> AsyncIterator[bytes]:
+        i = 0
+        while True:
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class CompletionCoalescer:
+    def __init__(self):
+        self._streams: Dict[str, SharedStream] = {}
+        self._flight = SingleFlight()
+
+    async def _drive(self, key: str, shared: SharedStream, open_stream: StreamOpener):
+        try:
+            async with open_stream() as (headers, chunks):
+                shared.open(headers)
+                async for chunk in chunks:
+                    shared.append(chunk)
+            shared.finish()
+        except asyncio.CancelledError:
+            shared.finish(ConnectionError("Upstream stream cancelled"))
+            raise
+        except Exception as e:
+            logger.error(f"Coalesced upstream stream failed: {str(e)}")
+            shared.finish(e)
+        finally:
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+
+    @asynccontextmanager
+    async def stream(self, key: str, open_stream: StreamOpener):
+        """Drop-in for ``open_upstream_stream``: yields ``(headers, chunks)``."""
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = SharedStream()
+            self._streams[key] = shared
+            shared.task = asyncio.create_task(self._drive(key, shared, open_stream))
+        else:
+            COALESCED_REQUESTS.labels(kind="stream").inc()
+
+        shared.subscribers += 1
+        try:
+            await shared.wait_ready()
+            yield shared.headers, shared.subscribe()
+        finally:
+            shared.subscribers -= 1
+            # Nobody is listening any more: stop paying for the upstream call
+            if shared.subscribers == 0 and not shared.done and shared.task:
+                shared.task.cancel()
+
+    async def complete(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a non-streaming completion once for all concurrent callers."""
+        if self._flight.in_flight(key):
+            COALESCED_REQUESTS.labels(kind="completion").inc()
+        return await self._flight.do(key, fn)
+
+
+completion_coalescer = CompletionCoalescer()
@@ -0,0 +1,278 @@
+"""
+Flow lookups for ``/v1/flow/{flow_id}/chat/completions``.
+
+A flow is cached in three tiers: a per-worker ``TTLCache``, a shared Redis
+entry (``flow:{flow_id}``) and Postgres. Every write bumps the flow's version
+counter (``flow:{flow_id}:version``) and rewrites the Redis entry in one
+script, so concurrent writes land in version order, then publishes
+the new version on ``FLOW_CHANNEL`` so that every worker drops its copy at
+once. Misses are never cached: a flow created a moment ago is found on the
+next request. A flow loaded from Postgres is only written back to Redis if its
+version has not moved since the load began, so a load that races a delete
+cannot bring the flow back.
+
+The system prompt is compiled into a ``PromptTemplate`` (literal segments and
+variable slots) when the flow is written, so a request renders it in a single
+pass.
+"""
+
+import json
+import re
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from sqlmodel import select
+
+from src.router.core.config import (
+    FLOW_CACHE_MAX_ENTRIES,
+    FLOW_CACHE_REDIS_TTL_SEC,
+    FLOW_CACHE_TTL_SEC,
+)
+from src.router.models.flows import Flows
+from src.router.utils.local_cache import SingleFlight, TTLCache
+from src.router.utils.logger import logger
+from src.router.utils.metrics import FLOW_CACHE_REQUESTS
+from src.router.utils.pubsub import pubsub
+from src.router.utils.redis import redis_client
+
+FLOW_KEY = "flow:{flow_id}"
+FLOW_VERSION_KEY = "flow:{flow_id}:version"
+FLOW_CHANNEL = "flows:invalidate"
+
+VARIABLE_PATTERN = re.compile(r"\{\{([^}]+)\}\}")
+
+# Caches a flow loaded from Postgres only if no create, update or delete
+# bumped its version since the load read it; a plain SET NX would let a load
+# that raced a delete resurrect the flow.
+#
+# KEYS[1]  flow key
+# KEYS[2]  flow version key
+# ARGV[1]  version read before the load
+# ARGV[2]  serialized flow
+# ARGV[3]  ttl in seconds
+_POPULATE_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') ~= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# Moves a flow to its next version and writes (or deletes) its entry in one
+# step, so concurrent writes land in version order. Fails if another write
+# took that version first; the caller re-serializes and retries.
+#
+# KEYS[1]  flow key
+# KEYS[2]  flow version key
+# ARGV[1]  version the entry was serialized with
+# ARGV[2]  serialized flow ("" deletes the entry)
+# ARGV[3]  ttl in seconds
+_WRITE_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') + 1 ~= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[1])
+if ARGV[2] == '' then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return 1
+"""
+
+_populate = redis_client.register_script(_POPULATE_SCRIPT)
+_write_entry = redis_client.register_script(_WRITE_SCRIPT)
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A prompt split around its ``{{variable}}`` placeholders.
+
+    ``segments`` always has one more element than ``slots``; rendering
+    interleaves them.
+    """
+
+    segments: Tuple[str, ...]
+    slots: Tuple[str, ...]
+
+    @classmethod
+    def compile(cls, prompt: str) -> "PromptTemplate":
+        parts = VARIABLE_PATTERN.split(prompt)
+        return cls(segments=tuple(parts[0::2]), slots=tuple(parts[1::2]))
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        out = [self.segments[0]]
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            out.append(str(values[slot]))
+            out.append(segment)
+        return "".join(out)
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        return {"segments": list(self.segments), "slots": list(self.slots)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, List[str]]) -> "PromptTemplate":
+        return cls(segments=tuple(data["segments"]), slots=tuple(data["slots"]))
+
+
+@dataclass(frozen=True)
+class CachedFlow:
+    id: int
+    name: str
+    system_prompt: str
+    variables: List[str]
+    template: PromptTemplate
+    version: int = 0
+
+    @classmethod
+    def from_model(cls, flow: Flows, version: int) -> "CachedFlow":
+        return cls(
+            id=flow.id,
+            name=flow.name,
+            system_prompt=flow.system_prompt,
+            variables=flow.variables or [],
+            template=PromptTemplate.compile(flow.system_prompt),
+            version=version,
+        )
+
+    def dumps(self) -> str:
+        return json.dumps(
+            {
+                "id": self.id,
+                "name": self.name,
+                "system_prompt": self.system_prompt,
+                "variables": self.variables,
+                "template": self.template.to_dict(),
+                "version": self.version,
+            }
+        )
+
+    @classmethod
+    def loads(cls, raw) -> "CachedFlow":
+        data = json.loads(raw)
+        if "template" not in data:
+            # Written before templates were cached
+            template = PromptTemplate.compile(data["system_prompt"])
+        else:
+            template = PromptTemplate.from_dict(data["template"])
+        return cls(
+            id=data["id"],
+            name=data["name"],
+            system_prompt=data["system_prompt"],
+            variables=data.get("variables") or [],
+            template=template,
+            version=data.get("version", 0),
+        )
+
+
+class FlowCache:
+    def __init__(
+        self,
+        maxsize: int = FLOW_CACHE_MAX_ENTRIES,
+        ttl: float = FLOW_CACHE_TTL_SEC,
+    ):
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._loads = SingleFlight()
+        # Bumped on every invalidation; loads that straddle one are not kept
+        self._generation = 0
+
+    async def get(self, flow_id: int, db) -> Optional[CachedFlow]:
+        flow = self._local.get(flow_id)
+        if flow is not None:
+            FLOW_CACHE_REQUESTS.labels(result="local_hit").inc()
+            return flow
+
+        generation = self._generation
+        flow = await self._loads.do(flow_id, lambda: self._load(flow_id, db))
+        if flow is not None and generation == self._generation:
+            self._local.set(flow_id, flow)
+        return flow
+
+    async def _load(self, flow_id: int, db) -> Optional[CachedFlow]:
+        key = FLOW_KEY.format(flow_id=flow_id)
+        version_key = FLOW_VERSION_KEY.format(flow_id=flow_id)
+        version = 0
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.get(version_key)
+                raw, version = await pipe.execute()
+            if raw:
+                FLOW_CACHE_REQUESTS.labels(result="redis_hit").inc()
+                return CachedFlow.loads(raw)
+            version = int(version or 0)
+        except Exception as e:
+            logger.error(f"Failed to read flow {flow_id} from Redis: {str(e)}")
+
+        FLOW_CACHE_REQUESTS.labels(result="miss").inc()
+        model = (await db.exec(select(Flows).where(Flows.id == flow_id))).one_or_none()
+        if model is None:
+            return None
+
+        flow = CachedFlow.from_model(model, version)
+        try:
+            await _populate(
+                keys=[key, version_key],
+                args=[version, flow.dumps(), FLOW_CACHE_REDIS_TTL_SEC],
+            )
+        except Exception as e:
+            logger.error(f"Failed to cache flow {flow_id}: {str(e)}")
+        return flow
+
+    async def store(self, flow: Flows) -> CachedFlow:
+        """Compile and publish a flow that was just created or updated."""
+        cached = CachedFlow.from_model(flow, 0)
+        version = await self._write(
+            flow.id, lambda v: replace(cached, version=v).dumps()
+        )
+        cached = replace(cached, version=version)
+        await self._announce(flow.id, version)
+        self._local.set(flow.id, cached)
+        return cached
+
+    async def forget(self, flow_id: int) -> None:
+        """Drop a deleted flow everywhere."""
+        version = await self._write(flow_id, lambda v: "")
+        await self._announce(flow_id, version)
+
+    async def _write(self, flow_id: int, serialize: Callable[[int], str]) -> int:
+        """Write the entry ``serialize`` returns for the next version ("" to
+        delete it); returns that version."""
+        keys = [
+            FLOW_KEY.format(flow_id=flow_id),
+            FLOW_VERSION_KEY.format(flow_id=flow_id),
+        ]
+        while True:
+            version = int(await redis_client.get(keys[1]) or 0) + 1
+            args = [version, serialize(version), FLOW_CACHE_REDIS_TTL_SEC]
+            if await _write_entry(keys=keys, args=args):
+                return version
+
+    async def _announce(self, flow_id: int, version: int) -> None:
+        self.invalidate(flow_id, version)
+        try:
+            await pubsub.publish(FLOW_CHANNEL, {"flow_id": flow_id, "version": version})
+        except Exception as e:
+            logger.error(f"Failed to publish flow invalidation: {str(e)}")
+
+    def invalidate(self, flow_id: Optional[int] = None, version: int = 0) -> None:
+        self._generation += 1
+        if flow_id is None:
+            self._local.clear()
+            return
+        flow = self._local.get(flow_id)
+        if flow is not None and flow.version < version:
+            self._local.pop(flow_id)
+
+
+flow_cache = FlowCache()
+
+
+def _on_flow_invalidated(message: Optional[Dict[str, Any]]) -> None:
+    if isinstance(message, dict) and "flow_id" in message:
+        flow_cache.invalidate(int(message["flow_id"]), int(message.get("version", 0)))
+    else:
+        flow_cache.invalidate()
+
+
+pubsub.subscribe(FLOW_CHANNEL, _on_flow_invalidated)
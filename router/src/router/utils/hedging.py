@@ -0,0 +1,121 @@
+"""
+Hedged upstream calls for non-streaming completions.
+
+If a call has not returned after the model's ``HEDGE_PERCENTILE`` latency
+(learned from its recent calls), a duplicate is sent - to a different
+machine when the router picks machines itself - and whichever finishes
+first wins; the other is cancelled. Only the winner's response is returned,
+so only it is logged and billed.
+
+Hedges are limited by a budget: every call earns ``HEDGE_BUDGET_RATIO`` of a
+hedge, so at most that fraction of extra upstream load is added.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from src.router.core.config import (
+    HEDGE_BUDGET_RATIO,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_PERCENTILE,
+    HEDGING_ENABLED,
+)
+from src.router.utils.logger import logger
+from src.router.utils.metrics import HEDGED_REQUESTS
+
+T = TypeVar("T")
+
+# Calls receive the list of machine ids already used by this request, so the
+# hedge can avoid the machine the first attempt went to
+Attempt = Callable[[List[int]], Awaitable[T]]
+
+LATENCY_WINDOW = 200
+# Recompute a model's percentile after this many new samples
+RECOMPUTE_EVERY = 10
+# Unused budget accumulates up to this many hedges
+MAX_BUDGET = 10.0
+
+
+class LatencyTracker:
+    """Recent call latencies per model and their percentile."""
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE):
+        self.percentile = percentile
+        self._samples: Dict[str, Deque[float]] = {}
+        self._cached: Dict[str, float] = {}
+        self._pending: Dict[str, int] = {}
+
+    def observe(self, model: str, latency: float) -> None:
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = self._samples[model] = deque(maxlen=LATENCY_WINDOW)
+        samples.append(latency)
+        self._pending[model] = self._pending.get(model, 0) + 1
+
+    def threshold(self, model: str) -> Optional[float]:
+        """Latency after which to hedge, or None while there is too little data."""
+        samples = self._samples.get(model)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        if model not in self._cached or self._pending[model] >= RECOMPUTE_EVERY:
+            ordered = sorted(samples)
+            index = min(int(len(ordered) * self.percentile), len(ordered) - 1)
+            self._cached[model] = ordered[index]
+            self._pending[model] = 0
+        return self._cached[model]
+
+
+class Hedger:
+    def __init__(self, enabled: bool = HEDGING_ENABLED):
+        self.enabled = enabled
+        self.latencies = LatencyTracker()
+        self._budget = 1.0
+
+    def _take_budget(self) -> bool:
+        if self._budget >= 1.0:
+            self._budget -= 1.0
+            return True
+        return False
+
+    async def run(self, model: str, attempt: Attempt[T]) -> T:
+        """Run ``attempt``, hedging it with a second one if it is slow."""
+        tried: List[int] = []
+        start = time.monotonic()
+        self._budget = min(self._budget + HEDGE_BUDGET_RATIO, MAX_BUDGET)
+
+        delay = self.latencies.threshold(model) if self.enabled else None
+        primary = asyncio.ensure_future(attempt(tried))
+        pending = {primary}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    if self._take_budget():
+                        HEDGED_REQUESTS.labels(outcome="sent").inc()
+                        pending.add(asyncio.ensure_future(attempt(tried)))
+                    else:
+                        HEDGED_REQUESTS.labels(outcome="budget_exhausted").inc()
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            HEDGED_REQUESTS.labels(outcome="won").inc()
+                        self.latencies.observe(model, time.monotonic() - start)
+                        return task.result()
+                    error = task.exception()
+                if pending:
+                    logger.warning(f"Hedged attempt for {model} failed: {str(error)}")
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+hedger = Hedger()
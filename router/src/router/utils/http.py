@@ -0,0 +1,136 @@
+"""
+Shared keep-alive HTTP clients for outbound side calls.
+
+Each upstream (LiteLLM admin API, webhooks, image fetch, OpenSearch, Supabase
+JWKS) gets one named ``httpx.AsyncClient`` with its own pool limits and
+timeouts, so calls on the request path reuse warm connections instead of
+paying a TCP/TLS handshake every time. Clients are opened in the FastAPI lifespan and closed on
+shutdown; ``http_clients.get(name)`` lazily opens one if used outside of it
+(scripts, tests).
+"""
+
+from typing import Any, Dict
+
+import httpx
+
+from src.router.core.config import (
+    HTTP2_ENABLED,
+    OPENSEARCH_BASE_URL,
+    OPENSEARCH_USER,
+    OPENSEARCH_PASSWORD,
+)
+from src.router.utils.logger import logger
+from src.router.utils.metrics import (
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_TIMEOUTS,
+)
+
+try:
+    import h2  # noqa: F401
+
+    _H2_AVAILABLE = True
+except ImportError:  # optional dependency
+    _H2_AVAILABLE = False
+
+
+class _InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """Transport that exposes pool usage and counts pool timeouts."""
+
+    def __init__(self, pool: str, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+
+    def connection_count(self, idle: bool) -> int:
+        return sum(1 for c in self._pool.connections if c.is_idle() == idle)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            return await super().handle_async_request(request)
+        except httpx.PoolTimeout:
+            HTTP_POOL_TIMEOUTS.labels(pool=self.pool).inc()
+            raise
+
+
+class HttpClientRegistry:
+    """Named, long-lived ``httpx.AsyncClient`` pools."""
+
+    def __init__(self):
+        self._configs: Dict[str, Dict[str, Any]] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def register(
+        self,
+        name: str,
+        timeout: float,
+        max_connections: int,
+        max_keepalive: int | None = None,
+        http2: bool = False,
+        **client_kwargs: Any,
+    ) -> None:
+        self._configs[name] = {
+            "timeout": httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive or max_connections,
+                keepalive_expiry=30.0,
+            ),
+            "http2": http2 and HTTP2_ENABLED and _H2_AVAILABLE,
+            **client_kwargs,
+        }
+
+    def _open(self, name: str) -> httpx.AsyncClient:
+        config = dict(self._configs[name])
+        limits = config.pop("limits")
+        transport = _InstrumentedTransport(
+            pool=name, limits=limits, http2=config.pop("http2")
+        )
+        client = httpx.AsyncClient(transport=transport, **config)
+
+        HTTP_POOL_LIMIT.labels(pool=name).set(limits.max_connections)
+        HTTP_POOL_CONNECTIONS.labels(pool=name, state="active").set_function(
+            lambda: transport.connection_count(idle=False)
+        )
+        HTTP_POOL_CONNECTIONS.labels(pool=name, state="idle").set_function(
+            lambda: transport.connection_count(idle=True)
+        )
+        self._clients[name] = client
+        return client
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._open(name)
+        return client
+
+    async def start(self) -> None:
+        for name in self._configs:
+            self.get(name)
+
+    async def close(self) -> None:
+        for name, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP client {name}: {str(e)}")
+        self._clients.clear()
+
+
+http_clients = HttpClientRegistry()
+
+http_clients.register("litellm", timeout=30.0, max_connections=10)
+http_clients.register("webhooks", timeout=10.0, max_connections=10)
+http_clients.register("auth", timeout=5.0, max_connections=4)
+http_clients.register(
+    "images", timeout=30.0, max_connections=20, max_keepalive=5, http2=True
+)
+# Direct calls to node-service machines; completions can run for minutes
+http_clients.register("nodes", timeout=600.0, max_connections=200, max_keepalive=50)
+if OPENSEARCH_BASE_URL:
+    http_clients.register(
+        "opensearch",
+        timeout=30.0,
+        max_connections=4,
+        base_url=OPENSEARCH_BASE_URL.rstrip("/"),
+        auth=(OPENSEARCH_USER, OPENSEARCH_PASSWORD),
+    )
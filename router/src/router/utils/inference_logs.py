@@ -0,0 +1,89 @@
+"""
+Batched delivery of inference logs to the inference-logs webhook (node service).
+"""
+
+import gzip
+import json
+from typing import Any, Dict, List
+
+from src.router.core.config import (
+    INFERENCE_LOGS_WEBHOOK_URL,
+    INFERENCE_LOGS_BATCH_SIZE,
+    INFERENCE_LOGS_BATCH_INTERVAL_SEC,
+    INFERENCE_LOGS_QUEUE_MAX,
+    INFERENCE_LOGS_COMPRESSION,
+)
+from src.router.utils.batching import BackgroundBatcher
+from src.router.utils.http import http_clients
+from src.router.utils.logger import logger
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+class RetryableWebhookError(Exception):
+    """Raised for webhook responses worth retrying (429 / 5xx)."""
+
+
+class InferenceLogSender(BackgroundBatcher):
+    """Buffers inference logs and POSTs them as one ``{"logs": [...]}`` payload.
+
+    Flushes every INFERENCE_LOGS_BATCH_INTERVAL_SEC or once
+    INFERENCE_LOGS_BATCH_SIZE logs are waiting, over the shared webhooks pool.
+    """
+
+    def __init__(self):
+        super().__init__(
+            name="inference_logs",
+            batch_size=INFERENCE_LOGS_BATCH_SIZE,
+            interval=INFERENCE_LOGS_BATCH_INTERVAL_SEC,
+            queue_max=INFERENCE_LOGS_QUEUE_MAX,
+            max_retries=3,
+            retry_backoff=1.0,
+        )
+        self.webhook_url = (
+            INFERENCE_LOGS_WEBHOOK_URL.rstrip("/") + "/webhooks"
+            if INFERENCE_LOGS_WEBHOOK_URL
+            else ""
+        )
+        self.encoding = INFERENCE_LOGS_COMPRESSION
+        if self.encoding == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, falling back to gzip")
+            self.encoding = "gzip"
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.webhook_url)
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.encoding == "zstd":
+            return zstandard.ZstdCompressor().compress(data)
+        return gzip.compress(data)
+
+    async def send(self, items: List[Dict[str, Any]]) -> None:
+        data_bytes = json.dumps({"logs": items}).encode("utf-8")
+
+        resp = await http_clients.get("webhooks").post(
+            self.webhook_url,
+            content=self._compress(data_bytes),
+            headers={
+                "Content-Type": "application/json",
+                "Content-Encoding": self.encoding,
+                "Accept-Encoding": "gzip, deflate",
+            },
+        )
+        if resp.status_code == 429 or resp.status_code >= 500:
+            raise RetryableWebhookError(
+                f"Inference log webhook status {resp.status_code}: {resp.text[:200]}"
+            )
+        if resp.status_code >= 300:
+            logger.warning(
+                f"Inference log webhook status {resp.status_code}: {resp.text[:200]}"
+            )
+        else:
+            logger.debug(f"Sent {len(items)} logs to inference-logs webhook")
+
+
+inference_log_sender = InferenceLogSender()
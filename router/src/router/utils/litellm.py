@@ -4,6 +4,7 @@ LiteLLM Proxy API Integration for dynamic model management
 import httpx
 from typing import Dict, List, Optional, Any
 from src.router.core.config import LITELLM_API_URL, LITELLM_MASTER_KEY
+from src.router.utils.http import http_clients
 from src.router.utils.logger import logger
 from src.router.utils.settings import get_supported_models
 
@@ -56,61 +57,61 @@ async def add_machine_to_litellm(
         logger.info(f"Machine {machine_id} will support all models")
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # First, get existing models to check for duplicates
-            existing_response = await client.get(
-                f"{LITELLM_API_URL}/v1/models",
-                headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
-            )
+        client = http_clients.get("litellm")
+        # First, get existing models to check for duplicates
+        existing_response = await client.get(
+            f"{LITELLM_API_URL}/v1/models",
+            headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
+        )
             
-            existing_model_ids = set()
-            if existing_response.status_code == 200:
-                existing_data = existing_response.json()
-                existing_model_ids = {model.get("id") for model in existing_data.get("data", [])}
+        existing_model_ids = set()
+        if existing_response.status_code == 200:
+            existing_data = existing_response.json()
+            existing_model_ids = {model.get("id") for model in existing_data.get("data", [])}
             
-            for model_name, config in models_to_add.items():
-                # Create unique deployment ID for this machine-model combination
-                deployment_id = f"{model_name}-machine-{machine_id}"
+        for model_name, config in models_to_add.items():
+            # Create unique deployment ID for this machine-model combination
+            deployment_id = f"{model_name}-machine-{machine_id}"
                 
-                # Skip if this deployment already exists
-                if deployment_id in existing_model_ids:
-                    logger.info(f"Deployment {deployment_id} already exists, skipping")
-                    continue
+            # Skip if this deployment already exists
+            if deployment_id in existing_model_ids:
+                logger.info(f"Deployment {deployment_id} already exists, skipping")
+                continue
                 
-                litellm_config = {
-                    "model_name": model_name,
-                    "litellm_params": {
-                        "model": f"openai/{config.id}",  # Use openai/ prefix for OpenAI-compatible endpoint
-                        "api_base": f"http://{machine_ip}:34523/v1",
-                        "api_key": "dummy",  # Node-service uses its own API keys
-                        "weight": traffic_weight,  # Load balancing weight (0.5 = 50% traffic)
-                    },
-                    "model_info": {
-                        "id": deployment_id,
-                        "mode": "completion",
-                        "input_cost_per_token": float(config.prompt_token),
-                        "output_cost_per_token": float(config.completion_token),
-                        "machine_id": machine_id,
-                        "machine_name": machine_name,
-                        "traffic_weight": traffic_weight,
-                    }
+            litellm_config = {
+                "model_name": model_name,
+                "litellm_params": {
+                    "model": f"openai/{config.id}",  # Use openai/ prefix for OpenAI-compatible endpoint
+                    "api_base": f"http://{machine_ip}:34523/v1",
+                    "api_key": "dummy",  # Node-service uses its own API keys
+                    "weight": traffic_weight,  # Load balancing weight (0.5 = 50% traffic)
+                },
+                "model_info": {
+                    "id": deployment_id,
+                    "mode": "completion",
+                    "input_cost_per_token": float(config.prompt_token),
+                    "output_cost_per_token": float(config.completion_token),
+                    "machine_id": machine_id,
+                    "machine_name": machine_name,
+                    "traffic_weight": traffic_weight,
                 }
+            }
                 
-                logger.info(f"Adding deployment {deployment_id} to LiteLLM")
+            logger.info(f"Adding deployment {deployment_id} to LiteLLM")
                 
-                response = await client.post(
-                    f"{LITELLM_API_URL}/model/new",
-                    json=litellm_config,
-                    headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
-                )
+            response = await client.post(
+                f"{LITELLM_API_URL}/model/new",
+                json=litellm_config,
+                headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
+            )
                 
-                if response.status_code != 200:
-                    error_msg = f"Failed to add model {deployment_id} to LiteLLM: {response.status_code} - {response.text}"
-                    logger.error(error_msg)
-                    raise LiteLLMError(error_msg)
+            if response.status_code != 200:
+                error_msg = f"Failed to add model {deployment_id} to LiteLLM: {response.status_code} - {response.text}"
+                logger.error(error_msg)
+                raise LiteLLMError(error_msg)
                 
-                deployments_added.append(litellm_config)
-                logger.info(f"Successfully added {deployment_id} to LiteLLM")
+            deployments_added.append(litellm_config)
+            logger.info(f"Successfully added {deployment_id} to LiteLLM")
                 
     except httpx.RequestError as e:
         error_msg = f"Failed to connect to LiteLLM API: {str(e)}"
@@ -147,25 +148,25 @@ async def remove_machine_from_litellm(
     supported_models = await get_supported_models()
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            for model_name in supported_models.keys():
-                deployment_id = f"{model_name}-machine-{machine_id}"
+        client = http_clients.get("litellm")
+        for model_name in supported_models.keys():
+            deployment_id = f"{model_name}-machine-{machine_id}"
                 
-                logger.info(f"Removing deployment {deployment_id} from LiteLLM")
+            logger.info(f"Removing deployment {deployment_id} from LiteLLM")
                 
-                response = await client.post(
-                    f"{LITELLM_API_URL}/model/delete",
-                    json={"id": deployment_id},
-                    headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
-                )
+            response = await client.post(
+                f"{LITELLM_API_URL}/model/delete",
+                json={"id": deployment_id},
+                headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
+            )
                 
-                if response.status_code == 200:
-                    deployments_removed.append(deployment_id)
-                    logger.info(f"Successfully removed {deployment_id} from LiteLLM")
-                elif response.status_code == 404:
-                    logger.info(f"Deployment {deployment_id} not found in LiteLLM, skipping")
-                else:
-                    logger.warning(f"Failed to remove {deployment_id}: {response.status_code} - {response.text}")
+            if response.status_code == 200:
+                deployments_removed.append(deployment_id)
+                logger.info(f"Successfully removed {deployment_id} from LiteLLM")
+            elif response.status_code == 404:
+                logger.info(f"Deployment {deployment_id} not found in LiteLLM, skipping")
+            else:
+                logger.warning(f"Failed to remove {deployment_id}: {response.status_code} - {response.text}")
                     
     except httpx.RequestError as e:
         error_msg = f"Failed to connect to LiteLLM API: {str(e)}"
@@ -239,88 +240,88 @@ async def update_machine_in_litellm(
         models_to_manage = all_supported_models
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Get existing models
-            existing_response = await client.get(
-                f"{LITELLM_API_URL}/v1/models",
-                headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
-            )
+        client = http_clients.get("litellm")
+        # Get existing models
+        existing_response = await client.get(
+            f"{LITELLM_API_URL}/v1/models",
+            headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
+        )
             
-            existing_model_ids = set()
-            if existing_response.status_code == 200:
-                existing_data = existing_response.json()
-                existing_model_ids = {model.get("id") for model in existing_data.get("data", [])}
+        existing_model_ids = set()
+        if existing_response.status_code == 200:
+            existing_data = existing_response.json()
+            existing_model_ids = {model.get("id") for model in existing_data.get("data", [])}
             
-            # Update or add each model
-            for model_name, config in models_to_manage.items():
-                deployment_id = f"{model_name}-machine-{machine_id}"
+        # Update or add each model
+        for model_name, config in models_to_manage.items():
+            deployment_id = f"{model_name}-machine-{machine_id}"
                 
-                if deployment_id in existing_model_ids:
-                    # Update existing deployment
-                    update_config = {
-                        "model_id": deployment_id,
-                        "litellm_params": {
-                            "model": f"openai/{config.id}",
-                            "api_base": f"http://{machine_ip}:34523/v1",
-                            "api_key": "dummy",
-                            "weight": traffic_weight,
-                        }
+            if deployment_id in existing_model_ids:
+                # Update existing deployment
+                update_config = {
+                    "model_id": deployment_id,
+                    "litellm_params": {
+                        "model": f"openai/{config.id}",
+                        "api_base": f"http://{machine_ip}:34523/v1",
+                        "api_key": "dummy",
+                        "weight": traffic_weight,
                     }
+                }
                     
-                    response = await client.post(
-                        f"{LITELLM_API_URL}/model/update",
-                        json=update_config,
-                        headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
-                    )
+                response = await client.post(
+                    f"{LITELLM_API_URL}/model/update",
+                    json=update_config,
+                    headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
+                )
                     
-                    if response.status_code == 200:
-                        logger.info(f"Successfully updated {deployment_id} in LiteLLM")
-                    else:
-                        logger.error(f"Failed to update {deployment_id}: {response.status_code} - {response.text}")
+                if response.status_code == 200:
+                    logger.info(f"Successfully updated {deployment_id} in LiteLLM")
                 else:
-                    # Add new deployment
-                    add_config = {
-                        "model_name": model_name,
-                        "litellm_params": {
-                            "model": f"openai/{config.id}",
-                            "api_base": f"http://{machine_ip}:34523/v1",
-                            "api_key": "dummy",
-                            "weight": traffic_weight,
-                        },
-                        "model_info": {
-                            "id": deployment_id,
-                            "mode": "completion",
-                            "input_cost_per_token": float(config.prompt_token),
-                            "output_cost_per_token": float(config.completion_token),
-                            "machine_id": machine_id,
-                            "machine_name": machine_name,
-                            "traffic_weight": traffic_weight,
-                        }
+                    logger.error(f"Failed to update {deployment_id}: {response.status_code} - {response.text}")
+            else:
+                # Add new deployment
+                add_config = {
+                    "model_name": model_name,
+                    "litellm_params": {
+                        "model": f"openai/{config.id}",
+                        "api_base": f"http://{machine_ip}:34523/v1",
+                        "api_key": "dummy",
+                        "weight": traffic_weight,
+                    },
+                    "model_info": {
+                        "id": deployment_id,
+                        "mode": "completion",
+                        "input_cost_per_token": float(config.prompt_token),
+                        "output_cost_per_token": float(config.completion_token),
+                        "machine_id": machine_id,
+                        "machine_name": machine_name,
+                        "traffic_weight": traffic_weight,
                     }
+                }
+                    
+                response = await client.post(
+                    f"{LITELLM_API_URL}/model/new",
+                    json=add_config,
+                    headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
+                )
                     
+                if response.status_code == 200:
+                    logger.info(f"Successfully added {deployment_id} to LiteLLM")
+                else:
+                    logger.error(f"Failed to add {deployment_id}: {response.status_code} - {response.text}")
+            
+        # Remove deployments for models no longer supported
+        for model_name in all_supported_models.keys():
+            if model_name not in models_to_manage:
+                deployment_id = f"{model_name}-machine-{machine_id}"
+                if deployment_id in existing_model_ids:
                     response = await client.post(
-                        f"{LITELLM_API_URL}/model/new",
-                        json=add_config,
+                        f"{LITELLM_API_URL}/model/delete",
+                        json={"id": deployment_id},
                         headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
                     )
-                    
-                    if response.status_code == 200:
-                        logger.info(f"Successfully added {deployment_id} to LiteLLM")
-                    else:
-                        logger.error(f"Failed to add {deployment_id}: {response.status_code} - {response.text}")
-            
-            # Remove deployments for models no longer supported
-            for model_name in all_supported_models.keys():
-                if model_name not in models_to_manage:
-                    deployment_id = f"{model_name}-machine-{machine_id}"
-                    if deployment_id in existing_model_ids:
-                        response = await client.post(
-                            f"{LITELLM_API_URL}/model/delete",
-                            json={"id": deployment_id},
-                            headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
-                        )
-                        if response.status_code in [200, 404]:
-                            logger.info(f"Removed {deployment_id} from LiteLLM")
+                    if response.status_code in [200, 404]:
+                        logger.info(f"Removed {deployment_id} from LiteLLM")
                             
     except Exception as e:
         error_msg = f"Failed to update machine in LiteLLM: {str(e)}"
@@ -339,17 +340,17 @@ async def get_litellm_deployments() -> Dict[str, Any]:
         return {}
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"{LITELLM_API_URL}/model/info",
-                headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
-            )
+        client = http_clients.get("litellm")
+        response = await client.get(
+            f"{LITELLM_API_URL}/model/info",
+            headers={"Authorization": f"Bearer {LITELLM_MASTER_KEY}"}
+        )
             
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logger.error(f"Failed to get LiteLLM deployments: {response.status_code}")
-                return {}
+        if response.status_code == 200:
+            return response.json()
+        else:
+            logger.error(f"Failed to get LiteLLM deployments: {response.status_code}")
+            return {}
                 
     except Exception as e:
         logger.error(f"Error getting LiteLLM deployments: {str(e)}")
@@ -0,0 +1,98 @@
+"""
+Per-worker in-memory caching primitives.
+
+``TTLCache`` is a small LRU with per-entry expiry for values that are read on
+every request and are expensive to rebuild (parsed users, settings, ...).
+``SingleFlight`` collapses concurrent cache misses for the same key into one
+backend call whose result is shared by every waiter.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU with per-entry expiry, bounded by entry count and optionally by
+    the total ``size`` (e.g. bytes) callers report for each entry."""
+
+    def __init__(self, maxsize: int, ttl: float, max_bytes: Optional[int] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any, int]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self.pop(key)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(
+        self, key: Hashable, value: Any, ttl: Optional[float] = None, size: int = 0
+    ) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or (self.max_bytes is not None and size > self.max_bytes):
+            return
+        self.pop(key)
+        self._data[key] = (time.monotonic() + ttl, value, size)
+        self.bytes += size
+        while len(self._data) > self.maxsize or (
+            self.max_bytes is not None and self.bytes > self.max_bytes
+        ):
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self.bytes -= evicted_size
+
+    def pop(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share it.
+
+    The call runs in its own task, so a caller that is cancelled (e.g. the
+    client disconnected) does not cancel it for everyone else.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved if nobody is left waiting
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,274 @@
+"""
+Indexed registry of machines and their liveness.
+
+Redis holds:
+
+- ``machines:heartbeats``: sorted set of machine id -> last heartbeat (unix time)
+- ``machines:ips``: hash of network ip -> machine id
+- ``machines:info``: hash of machine id -> routing info (JSON)
+- ``machines:version``: counter bumped whenever routing info changes
+
+Each worker keeps a snapshot of all of it, indexed by id, ip and model, and
+refreshes it with one pipelined delta poll every
+``MACHINE_REGISTRY_POLL_INTERVAL_SEC``: only heartbeats newer than the last one
+seen are fetched, and the info hash is reloaded only when the version moved.
+Liveness checks and machine selection then run against the snapshot without
+any Redis I/O.
+
+Heartbeats only touch the sorted set. Routing info is written when an admin
+registers, updates or deletes a machine, and for all machines at startup.
+"""
+
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from pydantic import BaseModel
+from sqlmodel import select
+
+from src.router.core.config import (
+    MACHINE_LIVENESS_TTL_SEC,
+    MACHINE_REGISTRY_POLL_INTERVAL_SEC,
+)
+from src.router.db.session import get_session_context
+from src.router.models.machines import Machine
+from src.router.utils.local_cache import SingleFlight
+from src.router.utils.logger import logger
+from src.router.utils.metrics import MACHINES_ONLINE
+from src.router.utils.redis import redis_client
+
+HEARTBEATS_KEY = "machines:heartbeats"
+MACHINE_IPS_KEY = "machines:ips"
+MACHINE_INFO_KEY = "machines:info"
+REGISTRY_VERSION_KEY = "machines:version"
+
+# Heartbeats are scored with the clock of whichever worker received them, so
+# every poll re-reads a small window before the newest score it has seen
+CLOCK_SKEW_SEC = 2.0
+
+
+class RegisteredMachine(BaseModel):
+    id: int
+    network_ip: str
+    traffic_weight: float = 0.5
+    supported_models: Optional[List[str]] = None
+    disabled: bool = False
+
+    @classmethod
+    def from_machine(cls, machine: Machine) -> "RegisteredMachine":
+        return cls(
+            id=machine.id,
+            network_ip=machine.network_ip,
+            traffic_weight=machine.traffic_weight,
+            supported_models=machine.supported_models,
+            disabled=machine.disabled,
+        )
+
+    def supports(self, model: str) -> bool:
+        return not self.supported_models or model in self.supported_models
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+async def record_heartbeats(machine_ids: Iterable[int], now: float) -> None:
+    """Mark machines online. This is the whole heartbeat write: one ZADD,
+    no database access; routing info is published separately."""
+    await redis_client.zadd(HEARTBEATS_KEY, {str(mid): now for mid in machine_ids})
+
+
+async def publish_machine(machine: Machine, old_network_ip: Optional[str] = None):
+    """Store changed routing info and tell every worker to reload it."""
+    info = RegisteredMachine.from_machine(machine)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        if old_network_ip and old_network_ip != info.network_ip:
+            pipe.hdel(MACHINE_IPS_KEY, old_network_ip)
+        pipe.hset(MACHINE_IPS_KEY, info.network_ip, str(info.id))
+        pipe.hset(MACHINE_INFO_KEY, str(info.id), info.model_dump_json())
+        pipe.incr(REGISTRY_VERSION_KEY)
+        await pipe.execute()
+
+
+async def sync_machines() -> None:
+    """Publish the routing info of every machine in the database."""
+    try:
+        async with get_session_context() as db:
+            machines = (await db.exec(select(Machine))).all()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for machine in machines:
+                info = RegisteredMachine.from_machine(machine)
+                pipe.hset(MACHINE_IPS_KEY, info.network_ip, str(info.id))
+                pipe.hset(MACHINE_INFO_KEY, str(info.id), info.model_dump_json())
+            pipe.incr(REGISTRY_VERSION_KEY)
+            await pipe.execute()
+        logger.info(f"Synced {len(machines)} machines to the registry")
+    except Exception as e:
+        logger.error(f"Failed to sync machines to the registry: {str(e)}")
+
+
+async def remove_machine(machine_id: int, network_ip: str) -> None:
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.zrem(HEARTBEATS_KEY, str(machine_id))
+        pipe.hdel(MACHINE_IPS_KEY, network_ip)
+        pipe.hdel(MACHINE_INFO_KEY, str(machine_id))
+        pipe.incr(REGISTRY_VERSION_KEY)
+        await pipe.execute()
+
+
+class MachineRegistry:
+    def __init__(
+        self,
+        poll_interval: float = MACHINE_REGISTRY_POLL_INTERVAL_SEC,
+        liveness_ttl: float = MACHINE_LIVENESS_TTL_SEC,
+    ):
+        self.poll_interval = poll_interval
+        self.liveness_ttl = liveness_ttl
+        self.heartbeats: Dict[int, float] = {}
+        self.machines: Dict[int, RegisteredMachine] = {}
+        self.by_ip: Dict[str, int] = {}
+        self.by_model: Dict[str, Set[int]] = {}
+        self.any_model: Set[int] = set()
+        self.version: Optional[bytes] = None
+        self.cursor = 0.0  # newest heartbeat score seen
+        self.refreshed_at = float("-inf")
+        self._flight = SingleFlight()
+        self._task: Optional[asyncio.Task] = None
+
+    # Lookups (snapshot only)
+
+    def is_online(self, machine_id: int, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return self.heartbeats.get(machine_id, 0.0) > now - self.liveness_ttl
+
+    def online_ids(self) -> List[int]:
+        cutoff = time.time() - self.liveness_ttl
+        return [mid for mid, seen in self.heartbeats.items() if seen > cutoff]
+
+    def machine_id_for_ip(self, network_ip: str) -> Optional[int]:
+        return self.by_ip.get(network_ip)
+
+    def online_machines(self, model: Optional[str] = None) -> List[RegisteredMachine]:
+        """Online, enabled machines, optionally only those serving ``model``."""
+        if model is None:
+            ids: Iterable[int] = self.machines
+        else:
+            ids = self.by_model.get(model, set()) | self.any_model
+        now = time.time()
+        return [
+            self.machines[mid]
+            for mid in ids
+            if self.is_online(mid, now) and not self.machines[mid].disabled
+        ]
+
+    # Refresh
+
+    def _reindex(self) -> None:
+        by_model: Dict[str, Set[int]] = {}
+        any_model: Set[int] = set()
+        for machine in self.machines.values():
+            if not machine.supported_models:
+                any_model.add(machine.id)
+            for model in machine.supported_models or ():
+                by_model.setdefault(model, set()).add(machine.id)
+        self.by_ip = {m.network_ip: m.id for m in self.machines.values()}
+        self.by_model = by_model
+        self.any_model = any_model
+
+    def _parse_info(self, raw) -> Optional[RegisteredMachine]:
+        try:
+            return RegisteredMachine.model_validate_json(raw)
+        except ValueError as e:
+            logger.warning(f"Skipping malformed machine registry entry: {str(e)}")
+            return None
+
+    async def poll(self) -> None:
+        now = time.time()
+        since = max(self.cursor - CLOCK_SKEW_SEC, now - self.liveness_ttl)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.get(REGISTRY_VERSION_KEY)
+            pipe.zrangebyscore(HEARTBEATS_KEY, since, "+inf", withscores=True)
+            version, updates = await pipe.execute()
+
+        unknown = []
+        for member, score in updates:
+            machine_id = int(_decode(member))
+            if score > self.heartbeats.get(machine_id, 0.0):
+                self.heartbeats[machine_id] = score
+            self.cursor = max(self.cursor, score)
+            if machine_id not in self.machines:
+                unknown.append(machine_id)
+
+        if version != self.version:
+            raw = await redis_client.hgetall(MACHINE_INFO_KEY)
+            machines = {}
+            for value in raw.values():
+                machine = self._parse_info(value)
+                if machine:
+                    machines[machine.id] = machine
+            self.machines = machines
+            self.version = version
+            # Forget heartbeats of machines that were removed
+            self.heartbeats = {
+                mid: seen for mid, seen in self.heartbeats.items() if mid in machines
+            }
+            self._reindex()
+        elif unknown:
+            values = await redis_client.hmget(
+                MACHINE_INFO_KEY, [str(m) for m in unknown]
+            )
+            for value in values:
+                machine = value and self._parse_info(value)
+                if machine:
+                    self.machines[machine.id] = machine
+            self._reindex()
+
+        # Drop machines that went offline long ago to keep the snapshot small
+        cutoff = now - 10 * self.liveness_ttl
+        self.heartbeats = {
+            mid: seen for mid, seen in self.heartbeats.items() if seen > cutoff
+        }
+        self.refreshed_at = time.monotonic()
+        MACHINES_ONLINE.set(len(self.online_ids()))
+
+    async def _refresh(self) -> None:
+        try:
+            await self.poll()
+        except Exception as e:
+            logger.error(f"Machine registry refresh failed: {str(e)}")
+            # Keep serving the last snapshot; the poller retries
+            self.refreshed_at = time.monotonic()
+
+    async def ensure_fresh(self) -> None:
+        """Refresh inline if the background poller is not keeping up
+        (not started yet, or stalled)."""
+        if time.monotonic() - self.refreshed_at > 2 * self.poll_interval:
+            await self._flight.do("poll", self._refresh)
+
+    async def _run(self) -> None:
+        while True:
+            await self._flight.do("poll", self._refresh)
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="machine-registry")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+machine_registry = MachineRegistry()
+
+
+async def get_online_machines() -> list[str]:
+    """IDs of machines that sent a heartbeat within the liveness TTL."""
+    await machine_registry.ensure_fresh()
+    return [str(machine_id) for machine_id in machine_registry.online_ids()]
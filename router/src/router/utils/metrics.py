@@ -117,3 +117,177 @@ class PrometheusMiddleware(BaseHTTPMiddleware):
             ).observe(process_time)
             
             raise 
+
+
+# Background batchers (OpenSearch bulk indexing, webhook deliveries, ...)
+BATCH_QUEUE_DEPTH = Gauge(
+    'background_batch_queue_depth',
+    'Items buffered and waiting to be flushed',
+    ['batcher']
+)
+
+BATCH_FLUSH_LATENCY = Histogram(
+    'background_batch_flush_duration_seconds',
+    'Time spent flushing one batch, including retries',
+    ['batcher']
+)
+
+BATCH_ITEMS_FLUSHED = Counter(
+    'background_batch_items_flushed_total',
+    'Items successfully flushed',
+    ['batcher']
+)
+
+BATCH_REJECTED = Counter(
+    'background_batch_rejected_total',
+    'Items rejected because the buffer was full',
+    ['batcher']
+)
+
+BATCH_FLUSH_FAILURES = Counter(
+    'background_batch_flush_failures_total',
+    'Items dropped after exhausting flush retries',
+    ['batcher']
+)
+
+
+# Shared outbound HTTP client pools
+HTTP_POOL_CONNECTIONS = Gauge(
+    'http_client_pool_connections',
+    'Open connections in an outbound HTTP client pool',
+    ['pool', 'state']
+)
+
+HTTP_POOL_LIMIT = Gauge(
+    'http_client_pool_max_connections',
+    'Configured connection limit of an outbound HTTP client pool',
+    ['pool']
+)
+
+HTTP_POOL_TIMEOUTS = Counter(
+    'http_client_pool_timeouts_total',
+    'Requests that timed out waiting for a pooled connection',
+    ['pool']
+)
+
+
+# Token verification cache
+AUTH_CACHE_REQUESTS = Counter(
+    'auth_cache_requests_total',
+    'Token verifications by cache outcome (hit, negative_hit, redis_hit, miss)',
+    ['result']
+)
+
+
+# Response cache
+RESPONSE_CACHE_REQUESTS = Counter(
+    'response_cache_requests_total',
+    'Response cache lookups by outcome (local_hit, redis_hit, miss)',
+    ['result']
+)
+
+
+# Flow cache
+FLOW_CACHE_REQUESTS = Counter(
+    'flow_cache_requests_total',
+    'Flow lookups by cache outcome (local_hit, redis_hit, miss)',
+    ['result']
+)
+
+
+# Flow batch jobs
+FLOW_BATCH_ROWS = Counter(
+    'flow_batch_rows_total',
+    'Flow batch rows processed by outcome (ok, error)',
+    ['status']
+)
+FLOW_BATCH_JOBS_RUNNING = Gauge(
+    'flow_batch_jobs_running',
+    'Flow batch jobs run by this worker'
+)
+
+
+# Request coalescing
+COALESCED_REQUESTS = Counter(
+    'coalesced_requests_total',
+    'Requests served by joining an identical in-flight upstream call',
+    ['kind']
+)
+
+
+# Machine registry
+MACHINES_ONLINE = Gauge(
+    'machines_online',
+    'Machines with a recent heartbeat, as seen by this worker'
+)
+
+
+# Outlier ejection
+CIRCUIT_TRANSITIONS = Counter(
+    'circuit_breaker_transitions_total',
+    'Circuit breaker state changes for machines and deployments',
+    ['state']
+)
+
+CIRCUITS_OPEN = Gauge(
+    'circuit_breakers_open',
+    'Machines and deployments currently ejected'
+)
+
+
+# Hedged requests
+HEDGED_REQUESTS = Counter(
+    'hedged_requests_total',
+    'Hedged upstream calls by outcome (sent, won, budget_exhausted)',
+    ['outcome']
+)
+
+
+
+# Adaptive concurrency limits
+ADMISSION_LIMIT = Gauge(
+    'admission_concurrency_limit',
+    'Current adaptive concurrency limit per model',
+    ['model']
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    'admission_in_flight',
+    'Upstream calls currently holding a concurrency slot per model',
+    ['model']
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'admission_queue_depth',
+    'Requests waiting for a concurrency slot per model',
+    ['model']
+)
+
+ADMISSION_REJECTED = Counter(
+    'admission_rejected_total',
+    'Requests shed with 429 by the concurrency limiter',
+    ['model']
+)
+
+
+# Rate limiting
+RATE_LIMITED_REQUESTS = Counter(
+    'rate_limited_requests_total',
+    'Requests rejected by rate limits, by scope (key, user) and where the '
+    'check was decided (local, redis)',
+    ['scope', 'source']
+)
+
+
+# Native routing
+ROUTING_DECISIONS = Counter(
+    'routing_decisions_total',
+    'Machines picked by the native router, by strategy',
+    ['strategy']
+)
+
+ROUTING_FAILURES = Counter(
+    'routing_failures_total',
+    'Native routing failures (no_candidates, connect, status, upstream)',
+    ['reason']
+)
@@ -3,7 +3,7 @@ import itertools
 
 from fastapi import HTTPException
 from src.router.schemas.machine import MachineInfo
-from src.router.utils.redis import get_online_machines, redis_client
+from src.router.utils.machine_registry import get_online_machines, machine_registry
 from sqlmodel import col, select
 from src.router.models.machines import Machine
 from sqlmodel.ext.asyncio.session import AsyncSession
@@ -16,8 +16,6 @@ _machine_counter = itertools.cycle(range(1000000))  # Large enough cycle
 
 async def _get_cached_machine_list():
     """Internal function to cache machine list without db dependency"""
-    logger.info("Cache miss for machines - fetching from Redis")
-
     # Get all online machine IDs
     machine_ids = await get_online_machines()
     if not machine_ids:
@@ -26,26 +24,17 @@ async def _get_cached_machine_list():
             detail="No online machines available",
         )
 
-    # Get all network IPs in a single Redis operation
-    redis_keys = [f"network_ip:{mid}" for mid in machine_ids]
-    network_ips = await redis_client.mget(redis_keys)
-
-    # Build the machine list
+    # Build the machine list from the registry snapshot
     machines: List[MachineInfo] = []
     missing_ids: List[str] = []
 
-    for machine_id, ip in zip(machine_ids, network_ips):
-        if ip:
-            machines.append(
-                MachineInfo(
-                    id=int(machine_id),
-                    network_ip=ip.decode() if isinstance(ip, bytes) else ip,
-                )
-            )
+    for machine_id in machine_ids:
+        machine = machine_registry.machines.get(int(machine_id))
+        if machine:
+            machines.append(MachineInfo(id=machine.id, network_ip=machine.network_ip))
         else:
             missing_ids.append(machine_id)
 
-    logger.info(f"Fetched {len(machines)} machines from Redis")
     return machines, missing_ids
 
 
@@ -68,19 +57,11 @@ async def get_cached_machines(db: AsyncSession) -> List[MachineInfo]:
         )
         db_machines = db_machines.all()
 
-        # Update Redis and add to machines list
-        async with redis_client.pipeline() as pipe:
-            for machine in db_machines:
-                if machine.id is not None:  # Handle None case
-                    str_id = str(machine.id)
-                    machine_id = int(machine.id)
-                    await pipe.set(f"network_ip:{str_id}", machine.network_ip)
-                    machines.append(
-                        MachineInfo(id=machine_id, network_ip=machine.network_ip)
-                    )
-            await pipe.execute()
-
-        # Clear cache to update with new Redis values
+        for machine in db_machines:
+            if machine.id is not None:  # Handle None case
+                machines.append(
+                    MachineInfo(id=int(machine.id), network_ip=machine.network_ip)
+                )
 
     return machines
 
@@ -1,9 +1,19 @@
+import json
+from typing import Any, Dict, List, Tuple
+
 from opensearchpy import OpenSearch, RequestsHttpConnection
 from src.router.core.config import (
     OPENSEARCH_BASE_URL,
     OPENSEARCH_USER,
     OPENSEARCH_PASSWORD,
+    OPENSEARCH_BULK_SIZE,
+    OPENSEARCH_BULK_INTERVAL_SEC,
+    OPENSEARCH_BULK_QUEUE_MAX,
 )
+from src.router.utils.batching import BackgroundBatcher
+from src.router.utils.http import http_clients
+from src.router.utils.logger import logger
+from src.router.utils.metrics import BATCH_FLUSH_FAILURES
 
 OPENSEARCH_MODEL_USAGE_INDEX = "mira-model-usage"
 OPENSEARCH_LLM_USAGE_LOG_INDEX = "mira-llm-usage-log"
@@ -24,3 +34,59 @@ opensearch_client = OpenSearch(
 #     # verify_certs=True,
 #     connection_class=RequestsHttpConnection,
 # )
+
+
+class OpenSearchBulkIndexer(BackgroundBatcher):
+    """Buffers documents and writes them through the ``_bulk`` API.
+
+    Used on the completion hot path instead of one synchronous ``index`` call
+    per document, so ``save_log`` never waits on OpenSearch.
+    """
+
+    def __init__(self):
+        super().__init__(
+            name="opensearch",
+            batch_size=OPENSEARCH_BULK_SIZE,
+            interval=OPENSEARCH_BULK_INTERVAL_SEC,
+            queue_max=OPENSEARCH_BULK_QUEUE_MAX,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(OPENSEARCH_BASE_URL)
+
+    def index(self, index: str, body: Dict[str, Any]) -> bool:
+        """Queue a document for indexing. Returns False if it was rejected."""
+        return self.submit((index, body))
+
+    async def send(self, items: List[Tuple[str, Dict[str, Any]]]) -> None:
+        lines = []
+        for index, body in items:
+            lines.append(json.dumps({"index": {"_index": index}}))
+            lines.append(json.dumps(body, default=str))
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+
+        response = await http_clients.get("opensearch").post(
+            "/_bulk",
+            content=payload,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        response.raise_for_status()
+
+        # Per-document failures are not retried: resending the batch would
+        # duplicate the documents that were accepted.
+        result = response.json()
+        if result.get("errors"):
+            failed = [
+                item["index"]
+                for item in result.get("items", [])
+                if item.get("index", {}).get("error")
+            ]
+            BATCH_FLUSH_FAILURES.labels(batcher=self.name).inc(len(failed))
+            logger.error(
+                f"OpenSearch rejected {len(failed)} of {len(items)} documents: "
+                f"{failed[0]['error'] if failed else 'unknown error'}"
+            )
+
+
+bulk_indexer = OpenSearchBulkIndexer()
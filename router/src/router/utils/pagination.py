@@ -0,0 +1,138 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Lists are ordered by a unique key such as ``(updated_at, id)``. A page
+returns an opaque cursor that encodes the key of its last row, and the next
+page continues with ``WHERE (updated_at, id) < (:updated_at, :id)``. Unlike
+OFFSET, the database never walks past the rows of earlier pages, so every
+page costs the same as the first when a composite index matches the order.
+``keyset_nulls_last`` pages on a nullable leading column.
+
+Totals are optional. ``approximate_count`` counts at most ``COUNT_CAP`` rows
+of a filtered query, and ``estimated_rows`` reads the planner's row estimate
+for a whole table. Neither cost grows with the size of the table.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import literal_column, text, tuple_
+from sqlmodel import func, select
+
+# Filtered totals stop counting here and are reported as estimates
+COUNT_CAP = 10_000
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [
+        v.isoformat()
+        if isinstance(v, datetime)
+        else v if v is None or isinstance(v, int) else str(v)
+        for v in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Tuple[Any, ...]:
+    """Decode a cursor whose values have the given ``types``; 400 if invalid.
+
+    A value may be None, for a row whose key column is NULL.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(payload) != len(types):
+            raise ValueError("wrong number of values")
+        return tuple(
+            None
+            if value is None
+            else datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for kind, value in zip(types, payload)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(query, columns: Sequence[Any], after: Optional[Tuple], descending: bool):
+    """Order ``query`` by ``columns`` and start after the row keyed ``after``."""
+    if after is not None:
+        key = tuple_(*columns)
+        query = query.where(key < tuple_(*after) if descending else key > tuple_(*after))
+    return query.order_by(*(c.desc() if descending else c.asc() for c in columns))
+
+
+async def keyset_nulls_last(
+    db,
+    query,
+    columns: Sequence[Any],
+    after: Optional[Tuple],
+    descending: bool,
+    limit: int,
+) -> List[Any]:
+    """One page of ``query`` ordered like ``keyset``, for a nullable leading
+    column.
+
+    Rows whose leading key is NULL follow all others, ordered by the remaining
+    columns, and a cursor taken on one of them has a NULL leading value. Each
+    part is fetched with its own index-ordered query; a row comparison would
+    skip the NULL rows altogether.
+    """
+    lead, *rest = columns
+    rows: List[Any] = []
+    if after is None or after[0] is not None:
+        head = keyset(query.where(lead.is_not(None)), columns, after, descending)
+        rows = list((await db.exec(head.limit(limit))).all())
+    if len(rows) < limit:
+        tail_after = after[1:] if after is not None and after[0] is None else None
+        tail = keyset(query.where(lead.is_(None)), rest, tail_after, descending)
+        rows += (await db.exec(tail.limit(limit - len(rows)))).all()
+    return rows
+
+
+def next_cursor(rows: List[Any], limit: int, fields: Sequence[str]) -> Optional[str]:
+    """Cursor for the page after ``rows``, or None on the last page."""
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor([getattr(last, field) for field in fields])
+
+
+def set_page_headers(
+    response: Response,
+    cursor: Optional[str],
+    total: Optional[Tuple[int, bool]] = None,
+) -> None:
+    """Page metadata for endpoints that return a bare JSON array."""
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+    if total is not None:
+        count, exact = total
+        response.headers["X-Total-Count"] = str(count)
+        if not exact:
+            response.headers["X-Total-Count-Estimated"] = "true"
+
+
+async def approximate_count(db, query) -> Tuple[int, bool]:
+    """Count rows of ``query`` up to COUNT_CAP; returns (count, exact)."""
+    capped = (
+        query.with_only_columns(literal_column("1"))
+        .order_by(None)
+        .limit(COUNT_CAP + 1)
+    )
+    result = await db.exec(select(func.count()).select_from(capped.subquery()))
+    count = result.one()
+    return min(count, COUNT_CAP), count <= COUNT_CAP
+
+
+async def estimated_rows(db, table: str) -> int:
+    """The planner's row estimate for ``table`` (refreshed by autovacuum)."""
+    result = await db.execute(
+        text(
+            "SELECT greatest(reltuples, 0)::bigint FROM pg_class "
+            "WHERE oid = to_regclass(:table)"
+        ),
+        {"table": table},
+    )
+    return int(result.scalar() or 0)
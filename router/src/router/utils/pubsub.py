@@ -0,0 +1,102 @@
+"""
+One Redis pub/sub listener per worker.
+
+Used to broadcast cache invalidations between uvicorn workers. Modules register
+a handler for a channel at import time with ``pubsub.subscribe`` and publish
+with ``pubsub.publish``; the lifespan starts a single background task that
+listens on all registered channels.
+
+If the connection drops, messages published in the meantime are lost, so after
+reconnecting every handler is called with ``None`` and should drop whatever it
+caches.
+"""
+
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.router.utils.logger import logger
+from src.router.utils.redis import redis_client
+
+Handler = Callable[[Optional[Any]], Awaitable[None] | None]
+
+
+class PubSubListener:
+    def __init__(self, reconnect_delay: float = 1.0):
+        self.reconnect_delay = reconnect_delay
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        """Register a handler; must be called before ``start``."""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def publish(self, channel: str, message: Any) -> None:
+        await redis_client.publish(channel, json.dumps(message))
+
+    async def start(self) -> None:
+        if self._task is None and self._handlers:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="pubsub-listener")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _dispatch(self, channel: str, message: Optional[Any]) -> None:
+        for handler in self._handlers.get(channel, []):
+            try:
+                result = handler(message)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Pub/sub handler for {channel} failed: {str(e)}")
+
+    async def _run(self) -> None:
+        connected_before = False
+        while not self._stopping:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(*self._handlers.keys())
+                if connected_before:
+                    # We may have missed invalidations while disconnected
+                    for channel in self._handlers:
+                        await self._dispatch(channel, None)
+                connected_before = True
+
+                while not self._stopping:
+                    msg = await pubsub.get_message(timeout=1.0)
+                    if msg is None or msg.get("type") != "message":
+                        continue
+                    channel = msg["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    try:
+                        data = json.loads(msg["data"])
+                    except (TypeError, ValueError):
+                        data = msg["data"]
+                    await self._dispatch(channel, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(
+                    f"Pub/sub listener error: {str(e)}, "
+                    f"reconnecting in {self.reconnect_delay}s"
+                )
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+pubsub = PubSubListener()
@@ -0,0 +1,234 @@
+"""
+Requests-per-minute and tokens-per-minute limits per API key and per user.
+
+Limits come from the API key's meta_data (``{"rate_limit": {"rpm": 60,
+"tpm": 100000}}``) and otherwise from the ``RATE_LIMITS`` setting, which
+also holds the per-user limits. Each limit is a token bucket holding one
+minute's allowance and refilling continuously, kept in Redis and updated
+atomically by a Lua script, so all workers share it.
+
+A request takes one unit from every RPM bucket and needs every TPM bucket to
+be above zero. Tokens are only known once the completion is done, so
+``debit_tokens`` takes them afterwards; a bucket can go into debt and then
+rejects requests until it refills.
+
+Every worker remembers the levels Redis last reported. Other workers only
+ever drain a bucket, so the real level is at most what that memory plus the
+refill since says; a bucket that is empty even by that estimate is rejected
+without a round trip.
+
+Note: all buckets of a request must live on the same Redis node, which holds
+for our single-node (non-cluster) Valkey deployment.
+"""
+
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from src.router.core.types import User
+from src.router.utils.local_cache import TTLCache
+from src.router.utils.logger import logger
+from src.router.utils.metrics import RATE_LIMITED_REQUESTS
+from src.router.utils.redis import redis_client
+from src.router.utils.settings import get_rate_limits
+
+RATE_LIMIT_KEY = "ratelimit:{scope}:{id}:{kind}"
+
+# KEYS[i]         bucket hashes {tokens, ts}
+# ARGV[1]         "take" (all or nothing) or "debit" (always, may go into debt)
+# ARGV[3i-1..3i+1] capacity, refill per second and cost of KEYS[i]
+# Returns {allowed, level of KEYS[1], level of KEYS[2], ...}
+_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local debit = ARGV[1] == 'debit'
+local levels = {}
+local allowed = 1
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[3 * i - 1])
+    local rate = tonumber(ARGV[3 * i])
+    local cost = tonumber(ARGV[3 * i + 1])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    tokens = math.min(capacity, tokens + elapsed * rate)
+    if tokens <= 0 or tokens < cost then
+        allowed = 0
+    end
+    levels[i] = tokens
+end
+local result = {debit and 1 or allowed}
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[3 * i - 1])
+    local rate = tonumber(ARGV[3 * i])
+    if debit or allowed == 1 then
+        levels[i] = math.max(levels[i] - tonumber(ARGV[3 * i + 1]), -capacity)
+    end
+    redis.call('HSET', KEYS[i], 'tokens', levels[i], 'ts', now)
+    redis.call('EXPIRE', KEYS[i], math.ceil((capacity - levels[i]) / rate) + 1)
+    result[i + 1] = tostring(levels[i])
+end
+return result
+"""
+
+_bucket = redis_client.register_script(_BUCKET_SCRIPT)
+
+
+class Bucket:
+    __slots__ = ("key", "scope", "kind", "capacity", "rate")
+
+    def __init__(self, scope: str, id, kind: str, per_minute: int):
+        self.key = RATE_LIMIT_KEY.format(scope=scope, id=id, kind=kind)
+        self.scope = scope
+        self.kind = kind
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+
+    def reset_after(self, level: float) -> float:
+        """Seconds until the bucket is full again."""
+        return max(0.0, (self.capacity - level) / self.rate)
+
+    def available_after(self, level: float, cost: float) -> float:
+        """Seconds until the bucket can pay ``cost`` (or is above zero)."""
+        return max(0.0, (max(cost, 1.0) - level) / self.rate)
+
+
+def _fill(bucket: Bucket, level: float) -> float:
+    return level / bucket.capacity
+
+
+class RateLimitStatus:
+    """Bucket levels after a check, rendered as ``x-ratelimit-*`` headers."""
+
+    def __init__(self, levels: List[Tuple[Bucket, float]]):
+        self.levels = levels
+
+    def headers(self) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        # The tightest bucket of each kind is the one that matters to clients
+        tightest: Dict[str, Tuple[Bucket, float]] = {}
+        for bucket, level in self.levels:
+            current = tightest.get(bucket.kind)
+            if current is None or _fill(bucket, level) < _fill(*current):
+                tightest[bucket.kind] = (bucket, level)
+        for kind, name in (("rpm", "requests"), ("tpm", "tokens")):
+            if kind in tightest:
+                bucket, level = tightest[kind]
+                headers[f"x-ratelimit-limit-{name}"] = str(int(bucket.capacity))
+                headers[f"x-ratelimit-remaining-{name}"] = str(max(0, int(level)))
+                headers[f"x-ratelimit-reset-{name}"] = (
+                    f"{math.ceil(bucket.reset_after(level))}s"
+                )
+        return headers
+
+
+class RateLimiter:
+    def __init__(self):
+        # key -> (level, monotonic time it was reported at)
+        self._levels = TTLCache(maxsize=50_000, ttl=60)
+
+    async def buckets(self, user: User) -> List[Bucket]:
+        defaults = await get_rate_limits()
+        buckets = []
+        if user.api_key_id is not None and user.api_key_id > 0:
+            limits = user.api_key_meta.get("rate_limit") or {}
+            for kind in ("rpm", "tpm"):
+                limit = limits.get(kind, getattr(defaults.api_key, kind))
+                if limit:
+                    buckets.append(Bucket("key", user.api_key_id, kind, limit))
+        for kind in ("rpm", "tpm"):
+            limit = getattr(defaults.user, kind)
+            if limit:
+                buckets.append(Bucket("user", user.id, kind, limit))
+        return buckets
+
+    def _estimate(self, bucket: Bucket) -> Optional[float]:
+        entry = self._levels.get(bucket.key)
+        if entry is None:
+            return None
+        level, at = entry
+        return min(bucket.capacity, level + (time.monotonic() - at) * bucket.rate)
+
+    def _remember(self, buckets: List[Bucket], levels: List[float]) -> None:
+        now = time.monotonic()
+        for bucket, level in zip(buckets, levels):
+            self._levels.set(bucket.key, (level, now))
+
+    def _reject(
+        self, levels: List[Tuple[Bucket, float]], costs: List[float], source: str
+    ) -> HTTPException:
+        retry_after = 0.0
+        for (bucket, level), cost in zip(levels, costs):
+            if level <= 0 or level < cost:
+                retry_after = max(retry_after, bucket.available_after(level, cost))
+                RATE_LIMITED_REQUESTS.labels(scope=bucket.scope, source=source).inc()
+        headers = RateLimitStatus(levels).headers()
+        headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+        return HTTPException(
+            status_code=429, detail="Rate limit exceeded", headers=headers
+        )
+
+    async def check(self, user: User) -> Optional[RateLimitStatus]:
+        """Take one request from the user's buckets or raise 429.
+
+        Returns None when no limits apply."""
+        buckets = await self.buckets(user)
+        if not buckets:
+            return None
+        costs = [1.0 if b.kind == "rpm" else 0.0 for b in buckets]
+
+        estimates = [self._estimate(b) for b in buckets]
+        if any(
+            level is not None and (level <= 0 or level < cost)
+            for level, cost in zip(estimates, costs)
+        ):
+            known = [
+                (b, level if level is not None else b.capacity)
+                for b, level in zip(buckets, estimates)
+            ]
+            raise self._reject(known, costs, "local")
+
+        try:
+            result = await _bucket(
+                keys=[b.key for b in buckets], args=self._args("take", buckets, costs)
+            )
+        except Exception as e:
+            # Fail open: an unreachable Redis must not take the API down
+            logger.error(f"Rate limit check failed: {str(e)}")
+            return None
+
+        levels = [float(level) for level in result[1:]]
+        self._remember(buckets, levels)
+        status = list(zip(buckets, levels))
+        if not int(result[0]):
+            raise self._reject(status, costs, "redis")
+        return RateLimitStatus(status)
+
+    async def debit_tokens(self, user: User, tokens: int) -> None:
+        """Take a finished request's tokens from the user's TPM buckets."""
+        if tokens <= 0:
+            return
+        buckets = [b for b in await self.buckets(user) if b.kind == "tpm"]
+        if not buckets:
+            return
+        costs = [float(tokens)] * len(buckets)
+        try:
+            result = await _bucket(
+                keys=[b.key for b in buckets], args=self._args("debit", buckets, costs)
+            )
+        except Exception as e:
+            logger.error(f"Rate limit token debit failed: {str(e)}")
+            return
+        self._remember(buckets, [float(level) for level in result[1:]])
+
+    @staticmethod
+    def _args(mode: str, buckets: List[Bucket], costs: List[float]) -> list:
+        args: list = [mode]
+        for bucket, cost in zip(buckets, costs):
+            args.extend([bucket.capacity, repr(bucket.rate), cost])
+        return args
+
+
+rate_limiter = RateLimiter()
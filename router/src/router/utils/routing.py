@@ -0,0 +1,282 @@
+"""
+Native routing of completions to node-service machines.
+
+With ``ROUTING_MODE=direct`` the router picks a machine per request and calls
+its ``/v1/chat/completions`` directly instead of going through LiteLLM. The
+pick is made by one of these strategies (``ROUTING_STRATEGY``):
+
+- ``weighted``: random, proportional to ``Machine.traffic_weight``
+- ``least_outstanding``: fewest requests in flight from this worker
+- ``p2c``: power of two choices - two weighted random picks, keep the less
+  loaded one
+- ``ewma``: lowest latency EWMA (time to first byte) times outstanding + 1
+
+Candidates come from the machine registry snapshot: online, enabled machines
+whose ``supported_models`` allow the requested model. Load and latency are
+tracked per worker.
+"""
+
+import random
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+from openai.types.chat import ChatCompletion
+
+from src.router.core.config import (
+    NODE_SERVICE_PORT,
+    ROUTING_STRATEGY,
+    ROUTING_MAX_ATTEMPTS,
+)
+from src.router.utils.circuit_breaker import circuit_breakers
+from src.router.utils.http import http_clients
+from src.router.utils.logger import logger
+from src.router.utils.machine_registry import (
+    MachineRegistry,
+    RegisteredMachine,
+    machine_registry,
+)
+from src.router.utils.metrics import ROUTING_DECISIONS, ROUTING_FAILURES
+from src.router.utils.settings import get_supported_models
+
+NODE_CHAT_PATH = "/v1/chat/completions"
+
+EWMA_ALPHA = 0.3
+# Latency assumed for machines without samples yet, and charged on failures
+DEFAULT_LATENCY = 1.0
+ERROR_LATENCY = 10.0
+
+# Fields of the OpenAI request the node-service understands
+_NODE_PARAMS = ("max_tokens", "reasoning_effort")
+
+
+class NodeRequestError(Exception):
+    """A node answered with an error status."""
+
+    def __init__(self, machine_id: int, status_code: int, detail: str):
+        super().__init__(f"Machine {machine_id} returned {status_code}: {detail}")
+        self.machine_id = machine_id
+        self.status_code = status_code
+
+
+def node_url(machine: RegisteredMachine) -> str:
+    return f"http://{machine.network_ip}:{NODE_SERVICE_PORT}{NODE_CHAT_PATH}"
+
+
+class MachineLoad:
+    """This worker's view of one machine: requests in flight and latency."""
+
+    __slots__ = ("outstanding", "ewma")
+
+    def __init__(self):
+        self.outstanding = 0
+        self.ewma = 0.0
+
+    def observe(self, latency: float) -> None:
+        self.ewma = latency if not self.ewma else (
+            EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma
+        )
+
+    def cost(self) -> float:
+        return (self.ewma or DEFAULT_LATENCY) * (self.outstanding + 1)
+
+
+Loads = Dict[int, MachineLoad]
+Candidates = List[RegisteredMachine]
+
+
+def _weighted(candidates: Candidates, loads: Loads) -> RegisteredMachine:
+    weights = [max(m.traffic_weight, 0.0) for m in candidates]
+    if not any(weights):
+        return random.choice(candidates)
+    return random.choices(candidates, weights)[0]
+
+
+def _least_outstanding(candidates: Candidates, loads: Loads) -> RegisteredMachine:
+    fewest = min(loads[m.id].outstanding for m in candidates)
+    return random.choice([m for m in candidates if loads[m.id].outstanding == fewest])
+
+
+def _power_of_two(candidates: Candidates, loads: Loads) -> RegisteredMachine:
+    a = _weighted(candidates, loads)
+    b = _weighted(candidates, loads)
+    key = lambda m: (loads[m.id].outstanding, loads[m.id].ewma)  # noqa: E731
+    return a if key(a) <= key(b) else b
+
+
+def _lowest_ewma(candidates: Candidates, loads: Loads) -> RegisteredMachine:
+    shuffled = random.sample(candidates, len(candidates))
+    return min(shuffled, key=lambda m: loads[m.id].cost())
+
+
+STRATEGIES: Dict[str, Callable[[Candidates, Loads], RegisteredMachine]] = {
+    "weighted": _weighted,
+    "least_outstanding": _least_outstanding,
+    "p2c": _power_of_two,
+    "ewma": _lowest_ewma,
+}
+
+
+def deployment_id(model: str, machine_id: int) -> str:
+    """Same ``<model>-machine-<id>`` id LiteLLM uses for a deployment."""
+    return f"{model}-machine-{machine_id}"
+
+
+class NodeRouter:
+    def __init__(
+        self,
+        strategy: str = ROUTING_STRATEGY,
+        registry: MachineRegistry = machine_registry,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown routing strategy: {strategy}")
+        self.strategy = strategy
+        self.registry = registry
+        self.loads: Loads = defaultdict(MachineLoad)
+
+    async def choose(
+        self, model: str, exclude: Iterable[int] = ()
+    ) -> RegisteredMachine:
+        await self.registry.ensure_fresh()
+        excluded = set(exclude)
+        candidates = [
+            m for m in self.registry.online_machines(model) if m.id not in excluded
+        ]
+        if not candidates:
+            ROUTING_FAILURES.labels(reason="no_candidates").inc()
+            raise HTTPException(
+                status_code=503, detail=f"No online machines available for {model}"
+            )
+        # Skip ejected machines, unless that would leave nothing to try
+        healthy = [m for m in candidates if circuit_breakers.allow(model, m.id)]
+        ROUTING_DECISIONS.labels(strategy=self.strategy).inc()
+        machine = STRATEGIES[self.strategy](healthy or candidates, self.loads)
+        circuit_breakers.on_selected(model, machine.id)
+        return machine
+
+    async def _payload(self, params: Dict[str, Any], stream: bool) -> Dict[str, Any]:
+        model_config = (await get_supported_models())[params["model"]]
+        payload = {
+            "model": model_config.id,
+            "messages": params["messages"],
+            "stream": stream,
+        }
+        for name in _NODE_PARAMS:
+            if params.get(name) is not None:
+                payload[name] = params[name]
+        return payload
+
+    def _record_failure(
+        self, model: str, machine: RegisteredMachine, reason: str
+    ) -> None:
+        self.loads[machine.id].observe(ERROR_LATENCY)
+        circuit_breakers.record(model, machine.id, ok=False)
+        ROUTING_FAILURES.labels(reason=reason).inc()
+
+    def _record_status(
+        self, model: str, machine: RegisteredMachine, status_code: int
+    ) -> None:
+        # Client errors say nothing about the node's health
+        if status_code >= 500 or status_code == 429:
+            self._record_failure(model, machine, "status")
+        else:
+            ROUTING_FAILURES.labels(reason="status").inc()
+
+    @asynccontextmanager
+    async def stream(self, completion_params: Dict[str, Any]):
+        """Same contract as ``open_upstream_stream``: yields ``(headers, chunks)``.
+
+        Connection failures are retried on another machine; once a node has
+        accepted the request it is never resent.
+        """
+        model = completion_params["model"]
+        payload = await self._payload(completion_params, stream=True)
+        client = http_clients.get("nodes")
+        tried: List[int] = []
+        accepted = False
+
+        while True:
+            machine = await self.choose(model, exclude=tried)
+            tried.append(machine.id)
+            load = self.loads[machine.id]
+            load.outstanding += 1
+            start = time.monotonic()
+            request = client.stream("POST", node_url(machine), json=payload)
+            try:
+                async with request as response:
+                    if response.status_code >= 400:
+                        detail = (await response.aread())[:200].decode(errors="replace")
+                        self._record_status(model, machine, response.status_code)
+                        raise NodeRequestError(machine.id, response.status_code, detail)
+
+                    async def chunks():
+                        first, tail = True, b""
+                        async for chunk in response.aiter_bytes():
+                            if first:
+                                load.observe(time.monotonic() - start)
+                                first = False
+                            tail = (tail + chunk)[-32:]
+                            yield chunk
+                        # node-service ends the stream without a [DONE] marker
+                        if b"[DONE]" not in tail:
+                            yield b"data: [DONE]\n\n"
+
+                    headers = {"x-litellm-model-id": deployment_id(model, machine.id)}
+                    accepted = True
+                    yield headers, chunks()
+                    return
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                self._record_failure(model, machine, "connect")
+                if accepted or len(tried) >= ROUTING_MAX_ATTEMPTS:
+                    raise
+                logger.warning(f"Machine {machine.id} unreachable, rerouting: {str(e)}")
+            finally:
+                load.outstanding -= 1
+
+    async def complete(
+        self, completion_params: Dict[str, Any], tried: Optional[List[int]] = None
+    ) -> Tuple[ChatCompletion, int]:
+        """Run a non-streaming completion; returns ``(response, machine_id)``.
+
+        ``tried`` holds machines this request already went to (e.g. by a
+        hedged attempt); they are skipped and every pick is appended.
+        """
+        model = completion_params["model"]
+        payload = await self._payload(completion_params, stream=False)
+        client = http_clients.get("nodes")
+        tried = [] if tried is None else tried
+        attempts = 0
+
+        while True:
+            machine = await self.choose(model, exclude=tried)
+            tried.append(machine.id)
+            attempts += 1
+            load = self.loads[machine.id]
+            load.outstanding += 1
+            start = time.monotonic()
+            try:
+                response = await client.post(node_url(machine), json=payload)
+                if response.status_code >= 400:
+                    self._record_status(model, machine, response.status_code)
+                    raise NodeRequestError(
+                        machine.id, response.status_code, response.text[:200]
+                    )
+                load.observe(time.monotonic() - start)
+                return ChatCompletion.model_validate(response.json()), machine.id
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                self._record_failure(model, machine, "connect")
+                if attempts >= ROUTING_MAX_ATTEMPTS:
+                    raise
+                logger.warning(f"Machine {machine.id} unreachable, rerouting: {str(e)}")
+            except httpx.HTTPError:
+                # Timed out or dropped after the node accepted the request
+                self._record_failure(model, machine, "upstream")
+                raise
+            finally:
+                load.outstanding -= 1
+
+
+node_router = NodeRouter()
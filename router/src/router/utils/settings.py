@@ -1,14 +1,70 @@
-from typing import Any, Dict, Optional, TypeVar, Type
+import time
+from typing import Any, Dict, Optional, Tuple, TypeVar, Type
 from pydantic import BaseModel
 from sqlmodel import select
 from src.router.db.session import get_session_context
 from src.router.models.system_settings import SystemSettings
 from fastapi import HTTPException
 from src.router.core.settings_types import SETTINGS_MODELS
-from src.router.utils.redis import get_cached_setting, set_cached_setting
+from src.router.core.config import SETTINGS_SNAPSHOT_MAX_AGE_SEC
+from src.router.utils.logger import logger
+from src.router.utils.pubsub import pubsub
+from src.router.utils.redis import get_cached_setting, set_cached_setting, redis_client
 
 T = TypeVar("T", bound=BaseModel)
 
+SETTINGS_VERSION_KEY = "system_settings:version"
+SETTINGS_CHANNEL = "system_settings:invalidate"
+
+
+class SettingsSnapshot:
+    """Per-worker cache of already-validated setting values.
+
+    Entries are dropped when any worker publishes a newer settings version on
+    SETTINGS_CHANNEL. SETTINGS_SNAPSHOT_MAX_AGE_SEC bounds staleness should an
+    invalidation ever be missed.
+    """
+
+    def __init__(self, max_age: float = SETTINGS_SNAPSHOT_MAX_AGE_SEC):
+        self.max_age = max_age
+        self.version = 0
+        self._generation = 0
+        self._values: Dict[Tuple[str, Optional[type]], Tuple[float, Any]] = {}
+
+    def get(self, name: str, model: Optional[type]) -> Any:
+        entry = self._values.get((name, model))
+        if entry is None or time.monotonic() - entry[0] > self.max_age:
+            return None
+        return entry[1]
+
+    def put(self, name: str, model: Optional[type], value: Any, generation: int):
+        # Skip values fetched before an invalidation that arrived mid-fetch
+        if generation == self._generation:
+            self._values[(name, model)] = (time.monotonic(), value)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def invalidate(self, version: Optional[int] = None) -> None:
+        if version is not None:
+            if version == self.version:
+                return
+            self.version = version
+        self._generation += 1
+        self._values.clear()
+
+
+settings_snapshot = SettingsSnapshot()
+
+
+def _on_settings_invalidated(message: Optional[Dict[str, Any]]) -> None:
+    version = message.get("version") if isinstance(message, dict) else None
+    settings_snapshot.invalidate(version)
+
+
+pubsub.subscribe(SETTINGS_CHANNEL, _on_settings_invalidated)
+
 
 async def get_setting(name: str):
     """Get a system setting by name."""
@@ -21,7 +77,22 @@ async def get_setting(name: str):
 
 
 async def get_setting_value(name: str, model: Type[T] = None):
-    """Get a system setting value by name with optional model validation."""
+    """Get a system setting value by name with optional model validation.
+
+    Served from the in-process snapshot when possible; the returned value is
+    shared and must not be mutated.
+    """
+    value = settings_snapshot.get(name, model)
+    if value is not None:
+        return value
+
+    generation = settings_snapshot.generation
+    value = await _load_setting_value(name, model)
+    settings_snapshot.put(name, model, value, generation)
+    return value
+
+
+async def _load_setting_value(name: str, model: Type[T] = None):
     # Try to get from cache first
     cached_value = await get_cached_setting(name)
     if cached_value:
@@ -57,6 +128,21 @@ async def get_supported_models():
     return resp.root
 
 
+async def get_rate_limits():
+    """Get the default rate limits; nothing is limited until the setting exists."""
+    model = SETTINGS_MODELS["RATE_LIMITS"]
+    generation = settings_snapshot.generation
+    try:
+        return await get_setting_value("RATE_LIMITS", model)
+    except HTTPException as e:
+        if e.status_code != 404:
+            raise
+        # Remember the absence too, so requests don't query the DB for it
+        value = model()
+        settings_snapshot.put("RATE_LIMITS", model, value, generation)
+        return value
+
+
 def validate_setting_name(name: str):
     """Validate if the setting name is supported and has a defined model."""
     if name not in SETTINGS_MODELS:
@@ -101,4 +187,12 @@ async def update_setting_value(
     # Update cache
     await set_cached_setting(name, setting.value)
 
+    # Tell every worker to drop its snapshot
+    version = await redis_client.incr(SETTINGS_VERSION_KEY)
+    settings_snapshot.invalidate(version)
+    try:
+        await pubsub.publish(SETTINGS_CHANNEL, {"name": name, "version": version})
+    except Exception as e:
+        logger.error(f"Failed to publish settings invalidation: {str(e)}")
+
     return setting
@@ -0,0 +1,119 @@
+"""
+Lightweight incremental scanner for OpenAI-compatible SSE streams.
+
+The streaming chat path forwards upstream bytes to the client untouched and
+only needs a few facts out of them (content deltas, usage, errors). Instead of
+parsing every chunk into a pydantic object, the scanner looks for those fields
+with byte-level regexes and decodes only the matched JSON string. A full
+``json.loads`` happens only for the (usually final) chunk that carries usage.
+"""
+
+import json
+import re
+from json.decoder import scanstring
+from typing import Callable, List, Optional
+
+from src.router.core.config import STREAM_LOG_MAX_CHARS
+
+_DATA_PREFIX = b"data:"
+_DONE = b"[DONE]"
+_CONTENT_RE = re.compile(rb'"content"\s*:\s*"')
+_USAGE_RE = re.compile(rb'"usage"\s*:\s*\{')
+_ERROR_RE = re.compile(rb'^\{\s*"error"\s*:')
+
+
+class SSEScanner:
+    """Extract content deltas and usage from raw SSE bytes as they stream by.
+
+    Output text is kept as a list of chunks capped at ``max_chars`` so long
+    generations never trigger quadratic string concatenation or unbounded
+    memory growth. ``truncated`` is set once the cap has been hit.
+
+    ``on_content`` is called with every content delta, uncapped, so in-process
+    consumers can follow the generation without parsing the SSE again.
+    """
+
+    def __init__(
+        self,
+        max_chars: int = STREAM_LOG_MAX_CHARS,
+        on_content: Optional[Callable[[str], None]] = None,
+    ):
+        self.max_chars = max_chars
+        self.on_content = on_content
+        self.chunks: List[str] = []
+        self.chars = 0
+        self.truncated = False
+        self.usage: dict = {}
+        self.error: Optional[str] = None
+        self.events = 0
+        self.done = False
+        self._pending = b""
+
+    def feed(self, data: bytes) -> None:
+        """Feed a raw chunk of the upstream body; may split events anywhere."""
+        if self._pending:
+            data = self._pending + data
+        lines = data.split(b"\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._scan_line(line)
+
+    def close(self) -> None:
+        """Process a trailing line that was not newline-terminated."""
+        if self._pending:
+            line, self._pending = self._pending, b""
+            self._scan_line(line)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def _scan_line(self, line: bytes) -> None:
+        if not line.startswith(_DATA_PREFIX):
+            return
+        payload = line[len(_DATA_PREFIX) :].strip()
+        if not payload:
+            return
+        if payload == _DONE:
+            self.done = True
+            return
+
+        self.events += 1
+
+        if _ERROR_RE.match(payload):
+            try:
+                error = json.loads(payload).get("error")
+            except ValueError:
+                error = payload.decode("utf-8", "replace")
+            self.error = error if isinstance(error, str) else json.dumps(error)
+            return
+
+        match = _CONTENT_RE.search(payload)
+        if match:
+            try:
+                content, _ = scanstring(payload[match.end() :].decode("utf-8"), 0)
+            except (ValueError, UnicodeDecodeError):
+                content = ""
+            if content:
+                self._append(content)
+                if self.on_content is not None:
+                    self.on_content(content)
+
+        if _USAGE_RE.search(payload):
+            try:
+                usage = json.loads(payload).get("usage")
+            except ValueError:
+                usage = None
+            if isinstance(usage, dict):
+                self.usage = usage
+
+    def _append(self, content: str) -> None:
+        if self.truncated:
+            return
+        remaining = self.max_chars - self.chars
+        if len(content) > remaining:
+            content = content[:remaining]
+            self.truncated = True
+        if content:
+            self.chunks.append(content)
+            self.chars += len(content)
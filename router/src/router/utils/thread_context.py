@@ -0,0 +1,168 @@
+"""
+Per-thread conversation context kept in Redis.
+
+Every thread's recent messages are mirrored into an append-only Redis list
+(``thread_context:{thread_id}``) of ``{"role", "content", "tokens"}`` entries,
+capped at ``THREAD_CONTEXT_MAX_MESSAGES``. Postgres stays the source of
+truth: messages are written there first and then appended to the list with
+RPUSHX, so a list is only ever extended while it exists. A missing (expired
+or never built) list is rebuilt from the thread's latest messages on the next
+read. Every append also bumps the thread's sequence number
+(``thread_context:{thread_id}:seq``), and a rebuild is only cached if no
+message was appended since it began reading Postgres; otherwise that message
+could be missing from a list that reads keep alive.
+
+A turn therefore reads one bounded list instead of the whole thread, and
+``fit_to_budget`` keeps only the newest messages that fit the model's
+context window, leaving ``THREAD_CONTEXT_REPLY_TOKENS`` for the answer.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlmodel import select
+
+from src.router.core.config import (
+    THREAD_CONTEXT_MAX_MESSAGES,
+    THREAD_CONTEXT_REPLY_TOKENS,
+    THREAD_CONTEXT_TTL_SEC,
+    THREAD_CONTEXT_WINDOW_TOKENS,
+)
+from src.router.core.settings_types import ModelConfig
+from src.router.models.thread import Message
+from src.router.utils.logger import logger
+from src.router.utils.nr import track
+from src.router.utils.redis import redis_client
+from src.router.utils.user import approximate_tokens
+
+CONTEXT_KEY = "thread_context:{thread_id}"
+CONTEXT_SEQ_KEY = "thread_context:{thread_id}:seq"
+
+# KEYS[1]  context list
+# KEYS[2]  sequence key
+# ARGV[1]  sequence number read before the rebuild
+# ARGV[2]  ttl in seconds
+# ARGV[3:] entries
+_REBUILD_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') ~= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('RPUSH', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+_store_rebuild = redis_client.register_script(_REBUILD_SCRIPT)
+
+
+def _entry(role: str, content: str) -> Dict[str, Any]:
+    return {"role": role, "content": content, "tokens": approximate_tokens(content)}
+
+
+def context_budget(model_config: Optional[ModelConfig]) -> int:
+    """Prompt tokens available for the thread history with this model."""
+    window = THREAD_CONTEXT_WINDOW_TOKENS
+    if model_config is not None and model_config.context_window:
+        window = model_config.context_window
+    return max(window - THREAD_CONTEXT_REPLY_TOKENS, 1)
+
+
+def fit_to_budget(entries: List[Dict[str, Any]], budget: int) -> List[Dict[str, str]]:
+    """Newest messages whose tokens fit ``budget``, oldest first. The latest
+    message is always kept."""
+    kept: List[Dict[str, str]] = []
+    used = 0
+    for entry in reversed(entries):
+        used += entry["tokens"]
+        if kept and used > budget:
+            break
+        kept.append({"role": entry["role"], "content": entry["content"]})
+    kept.reverse()
+    return kept
+
+
+async def append_to_context(thread_id: UUID, role: str, content: str) -> None:
+    """Mirror a message that was just committed to Postgres."""
+    if not content:
+        return
+    key = CONTEXT_KEY.format(thread_id=thread_id)
+    seq_key = CONTEXT_SEQ_KEY.format(thread_id=thread_id)
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            # Bumped even when the list is missing, for rebuilds in progress
+            pipe.incr(seq_key)
+            pipe.expire(seq_key, THREAD_CONTEXT_TTL_SEC)
+            pipe.rpushx(key, json.dumps(_entry(role, content)))
+            pipe.ltrim(key, -THREAD_CONTEXT_MAX_MESSAGES, -1)
+            pipe.expire(key, THREAD_CONTEXT_TTL_SEC)
+            await pipe.execute()
+    except Exception as e:
+        # The list is rebuilt from Postgres once it expires
+        logger.error(f"Failed to append to thread context {thread_id}: {str(e)}")
+
+
+async def _rebuild(thread_id: UUID, db) -> List[Dict[str, Any]]:
+    key = CONTEXT_KEY.format(thread_id=thread_id)
+    seq_key = CONTEXT_SEQ_KEY.format(thread_id=thread_id)
+    try:
+        seq: Optional[int] = int(await redis_client.get(seq_key) or 0)
+    except Exception as e:
+        logger.error(f"Failed to read thread context {thread_id}: {str(e)}")
+        seq = None
+
+    query = (
+        select(Message)
+        .where(Message.thread_id == thread_id, Message.content != "")
+        .order_by(Message.created_at.desc())
+        .limit(THREAD_CONTEXT_MAX_MESSAGES)
+    )
+    messages = (await db.exec(query)).all()
+    entries = [_entry(msg.role, msg.content) for msg in reversed(messages)]
+    if entries and seq is not None:
+        try:
+            await _store_rebuild(
+                keys=[key, seq_key],
+                args=[
+                    seq,
+                    THREAD_CONTEXT_TTL_SEC,
+                    *[json.dumps(entry) for entry in entries],
+                ],
+            )
+        except Exception as e:
+            logger.error(f"Failed to cache thread context {thread_id}: {str(e)}")
+    return entries
+
+
+async def load_context(
+    thread_id: UUID, db, model_config: Optional[ModelConfig]
+) -> List[Dict[str, str]]:
+    """The thread's messages to send upstream, within the model's budget."""
+    key = CONTEXT_KEY.format(thread_id=thread_id)
+    raw: List[bytes] = []
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.lrange(key, -THREAD_CONTEXT_MAX_MESSAGES, -1)
+            pipe.expire(key, THREAD_CONTEXT_TTL_SEC)
+            raw, _ = await pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to read thread context {thread_id}: {str(e)}")
+
+    source = "cache"
+    entries = [json.loads(item) for item in raw]
+    if not entries:
+        source = "db"
+        entries = await _rebuild(thread_id, db)
+
+    messages = fit_to_budget(entries, context_budget(model_config))
+    track(
+        "thread_context",
+        {
+            "thread_id": str(thread_id),
+            "source": source,
+            "messages": len(messages),
+            "dropped": len(entries) - len(messages),
+        },
+    )
+    return messages
@@ -1,12 +1,19 @@
+import uuid
+from typing import Iterable, Optional
+
 from fastapi import HTTPException
+from pydantic import BaseModel
 from sqlmodel import select
+from src.router.core.config import CREDIT_HOLD_TTL_SEC, CREDIT_HOLD_DEFAULT_MAX_TOKENS
+from src.router.core.settings_types import ModelConfig
 from src.router.db.session import DBSession
+from src.router.utils.billing import USER_CREDIT_KEY, CREDIT_HOLDS_KEY
 from src.router.utils.redis import redis_client
 from src.router.models.user import User as UserModel
 
 
 async def get_user_credits(user_id: int, db: DBSession):
-    redis_key = f"user_credit:{user_id}"
+    redis_key = USER_CREDIT_KEY.format(user_id=user_id)
     current_credit = await redis_client.get(redis_key)
 
     if current_credit is not None:
@@ -21,5 +28,123 @@ async def get_user_credits(user_id: int, db: DBSession):
         raise HTTPException(status_code=404, detail="User not found")
 
     current_credit = user_credits
-    await redis_client.set(redis_key, current_credit)
+    # NX: never clobber a balance another request has already debited
+    await redis_client.set(redis_key, current_credit, nx=True)
     return current_credit
+
+
+class CreditHold(BaseModel):
+    """Credits reserved for one in-flight request, settled by ``charge_credits``."""
+
+    member: str
+    amount: float
+    balance: float
+
+
+# Holds live in a sorted set of "<hold_id>:<amount>" scored by expiry time, so
+# abandoned holds (crashed worker, lost settle) drop out on their own.
+#
+# KEYS[1]  user credit key
+# KEYS[2]  user holds zset
+# ARGV[1]  hold id
+# ARGV[2]  estimated cost
+# ARGV[3]  hold ttl in seconds
+# Returns nil if the balance is not loaded, otherwise {member, hold, balance}
+# where hold is "0" when nothing is available.
+_RESERVE_SCRIPT = """
+local balance = redis.call('GET', KEYS[1])
+if not balance then
+    return nil
+end
+balance = tonumber(balance)
+
+local now = tonumber(redis.call('TIME')[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+
+local held = 0
+for _, member in ipairs(redis.call('ZRANGE', KEYS[2], 0, -1)) do
+    held = held + tonumber(string.match(member, ':([^:]+)$'))
+end
+
+local available = balance - held
+if available <= 0 then
+    return {'', '0', tostring(balance)}
+end
+
+local hold = math.min(tonumber(ARGV[2]), available)
+local member = ARGV[1] .. ':' .. tostring(hold)
+local ttl = tonumber(ARGV[3])
+redis.call('ZADD', KEYS[2], now + ttl, member)
+redis.call('EXPIRE', KEYS[2], ttl)
+return {member, tostring(hold), tostring(balance)}
+"""
+
+_reserve = redis_client.register_script(_RESERVE_SCRIPT)
+
+
+def approximate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def approximate_usage(messages: Iterable[str], completion: str) -> dict:
+    """OpenAI-style usage estimated from text, for upstreams that report none."""
+    prompt_tokens = sum(approximate_tokens(content) for content in messages)
+    completion_tokens = approximate_tokens(completion) if completion else 0
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def estimate_request_cost(
+    model_config: ModelConfig,
+    messages: Iterable[str],
+    max_tokens: Optional[int] = None,
+) -> float:
+    """Upper-bound cost of a completion: ~4 chars per prompt token plus
+    ``max_tokens`` (or CREDIT_HOLD_DEFAULT_MAX_TOKENS) completion tokens."""
+    prompt_tokens = approximate_tokens("".join(messages))
+    completion_tokens = max_tokens or CREDIT_HOLD_DEFAULT_MAX_TOKENS
+    return (
+        prompt_tokens * model_config.prompt_token
+        + completion_tokens * model_config.completion_token
+    )
+
+
+async def reserve_credits(
+    user_id, estimated_cost: float, db: DBSession
+) -> Optional[CreditHold]:
+    """Atomically reserve up to ``estimated_cost`` against the user's balance.
+
+    Returns None when the balance minus outstanding holds is exhausted. If
+    less than the estimate is available, the remainder is reserved so a
+    request with any credits left is still admitted, while concurrent ones are
+    not.
+    """
+    keys = [
+        USER_CREDIT_KEY.format(user_id=user_id),
+        CREDIT_HOLDS_KEY.format(user_id=user_id),
+    ]
+    args = [uuid.uuid4().hex, repr(float(estimated_cost)), CREDIT_HOLD_TTL_SEC]
+
+    result = await _reserve(keys=keys, args=args)
+    if result is None:
+        # Balance not cached yet: load it from the database and retry once
+        await get_user_credits(user_id, db)
+        result = await _reserve(keys=keys, args=args)
+        if result is None:
+            raise HTTPException(status_code=404, detail="User not found")
+
+    member, amount, balance = (
+        value.decode() if isinstance(value, bytes) else value for value in result
+    )
+    if float(amount) <= 0:
+        return None
+    return CreditHold(member=member, amount=float(amount), balance=float(balance))
+
+
+async def release_credits(user_id, hold: Optional[CreditHold]) -> None:
+    """Drop a hold without charging anything (e.g. cache hits, failed calls)."""
+    if hold is not None:
+        await redis_client.zrem(CREDIT_HOLDS_KEY.format(user_id=user_id), hold.member)
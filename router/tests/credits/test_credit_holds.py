@@ -0,0 +1,15 @@
+from src.router.core.settings_types import ModelConfig
+from src.router.utils.user import estimate_request_cost
+
+MODEL = ModelConfig(id="test/model", prompt_token=0.001, completion_token=0.002)
+
+
+def test_estimate_uses_max_tokens():
+    cost = estimate_request_cost(MODEL, ["x" * 400], max_tokens=50)
+    assert cost == 101 * 0.001 + 50 * 0.002
+
+
+def test_estimate_falls_back_to_default_max_tokens():
+    assert estimate_request_cost(MODEL, ["hi"]) > estimate_request_cost(
+        MODEL, ["hi"], max_tokens=1
+    )
@@ -0,0 +1,216 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from src.router.api.v1.flow_batches import (
+    FlowBatchJob,
+    _row_done,
+    parse_row,
+    router,
+)
+from src.router.core.security import verify_user
+from src.router.core.settings_types import ModelConfig
+from src.router.db.session import get_async_session
+from src.router.utils.flow_cache import PromptTemplate
+from src.router.utils.user import estimate_request_cost
+
+TEMPLATE = PromptTemplate.compile("Translate to {{language}}")
+MODEL = ModelConfig(id="m", prompt_token=0.001, completion_token=0.002)
+
+app = FastAPI()
+app.include_router(router)
+app.dependency_overrides[verify_user] = lambda: SimpleNamespace(id="user-1")
+app.dependency_overrides[get_async_session] = lambda: None
+client = TestClient(app)
+
+
+def test_rows_are_validated_against_the_flow_template():
+    row = json.loads(
+        parse_row(
+            b'{"id": 7, "variables": {"language": "French", "extra": 1},'
+            b' "messages": [{"role": "user", "content": "Hello"}]}',
+            1,
+            TEMPLATE,
+        )
+    )
+    assert row == {
+        "id": 7,
+        "variables": {"language": "French"},
+        "messages": [{"role": "user", "content": "Hello"}],
+    }
+
+    for line, detail in [
+        (b"{}", "Row 2: Missing required variables: language"),
+        (b"not json", "Row 2: Invalid JSON"),
+        (
+            b'{"variables": {"language": "x"},'
+            b' "messages": [{"role": "system", "content": "x"}]}',
+            "Row 2: System message is not allowed in request",
+        ),
+    ]:
+        with pytest.raises(HTTPException) as error:
+            parse_row(line, 2, TEMPLATE)
+        assert error.value.status_code == 400
+        assert error.value.detail.startswith(detail)
+
+
+def test_done_bitmap_matches_redis_setbit_order():
+    # SETBIT key 0 1 and SETBIT key 9 1 produce b"\x80\x40"
+    done = b"\x80\x40"
+    assert [idx for idx in range(24) if _row_done(done, idx)] == [0, 9]
+
+
+@patch("src.router.api.v1.flow_batches.redis_client")
+@patch("src.router.api.v1.flow_batches.get_user_credits", new_callable=AsyncMock)
+@patch("src.router.api.v1.flow_batches.flow_cache")
+@patch(
+    "src.router.api.v1.flow_batches.get_supported_models",
+    new_callable=AsyncMock,
+    return_value={"m": MODEL},
+)
+def test_invalid_upload_is_rejected_and_discarded(_models, cache, credits, redis):
+    cache.get = AsyncMock(return_value=SimpleNamespace(id=1, template=TEMPLATE))
+    credits.return_value = 10.0
+    redis.rpush = AsyncMock()
+    redis.delete = AsyncMock()
+
+    response = client.post(
+        "/v1/flow/1/batches?model=m",
+        content=b'{"variables": {"language": "de"}}\n\n{"variables": {}}\n',
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Row 2: Missing required variables: language"
+    redis.delete.assert_awaited_once()
+
+
+def make_job(**meta):
+    job = FlowBatchJob(
+        runner=None,
+        meta={
+            "id": "job-1",
+            "user_id": "user-1",
+            "model": "m",
+            "concurrency": "2",
+            "total": "1",
+            "template": json.dumps(TEMPLATE.to_dict()),
+            **meta,
+        },
+    )
+    job.model_config = MODEL
+    return job
+
+
+def test_rows_are_retried_and_priced_from_upstream_usage():
+    upstream = AsyncMock(
+        side_effect=[
+            RuntimeError("connection reset"),
+            (
+                SimpleNamespace(
+                    choices=[SimpleNamespace(message=SimpleNamespace(content="Bonjour"))],
+                    usage=SimpleNamespace(
+                        prompt_tokens=10, completion_tokens=5, total_tokens=15
+                    ),
+                ),
+                3,
+            ),
+        ]
+    )
+    row = {"id": "a", "variables": {"language": "French"}, "messages": []}
+
+    with patch(
+        "src.router.api.v1.flow_batches.create_upstream_completion", upstream
+    ), patch("src.router.api.v1.flow_batches.asyncio.sleep", AsyncMock()), patch(
+        "src.router.api.v1.flow_batches.circuit_breakers", MagicMock()
+    ):
+        line, cost, usage_doc = asyncio.run(make_job().complete(0, row))
+
+    assert upstream.await_count == 2
+    params = upstream.await_args.args[0]
+    assert params["messages"] == [{"role": "system", "content": "Translate to French"}]
+    assert line["status"] == "ok" and line["content"] == "Bonjour"
+    assert abs(cost - (10 * 0.001 + 5 * 0.002)) < 1e-12
+    assert usage_doc["doc_type"] == "model_usage"
+    assert usage_doc["machine_id"] == "3" and usage_doc["total_tokens"] == 15
+    assert usage_doc["flow_batch_id"] == "job-1"
+
+
+@patch("src.router.api.v1.flow_batches.bulk_indexer")
+@patch("src.router.api.v1.flow_batches._checkpoint", new_callable=AsyncMock)
+def test_recorded_rows_update_stats_and_are_logged_once(script, indexer):
+    script.return_value = 1
+    usage_doc = {"machine_id": "3", "total_tokens": 15, "timestamp": "t"}
+
+    assert asyncio.run(make_job()._record(0, {"status": "ok"}, 0.02, usage_doc))
+
+    keys, args = script.await_args.kwargs["keys"], script.await_args.kwargs["args"]
+    assert keys[3:] == ["stats:machine:3", "stats:model:m"]
+    assert args[0] == 0 and args[2:] == ["completed", "0.02", 15]
+    indexer.index.assert_called_once_with("mira-llm-usage-log", usage_doc)
+
+    # The row's bit was already set: nothing is counted or logged again
+    indexer.reset_mock()
+    script.return_value = 0
+    assert not asyncio.run(make_job()._record(0, {"status": "ok"}, 0.02, usage_doc))
+    indexer.index.assert_not_called()
+
+
+@patch("src.router.api.v1.flow_batches.bulk_indexer")
+@patch("src.router.api.v1.flow_batches._settle", new_callable=AsyncMock)
+def test_debits_are_written_to_the_credit_history(script, indexer):
+    script.return_value = [b"1.5", b"8.5"]
+
+    assert asyncio.run(make_job()._debit("hold-1")) == 1.5
+
+    index, doc = indexer.index.call_args.args
+    assert index == "mira-credits-history"
+    assert doc["doc_type"] == "credit_history"
+    assert doc["amount"] == -1.5 and doc["previous_balance"] == 10.0
+    assert doc["flow_batch_id"] == "job-1"
+
+    # Nothing accrued since the last debit: no history entry
+    indexer.reset_mock()
+    script.return_value = [b"0", b"8.5"]
+    asyncio.run(make_job()._debit(None))
+    indexer.index.assert_not_called()
+
+
+@patch("src.router.api.v1.flow_batches.redis_client")
+def test_holds_are_priced_from_the_largest_row(redis):
+    long_message = "x" * 4000
+    redis.lindex = AsyncMock(
+        return_value=json.dumps(
+            {
+                "variables": {"language": "French"},
+                "messages": [{"role": "user", "content": long_message}],
+            }
+        )
+    )
+    job = make_job(largest_row="4")
+
+    cost = asyncio.run(job._estimate_row_cost())
+
+    redis.lindex.assert_awaited_once_with("flow_batch:job-1:rows", 4)
+    assert cost == estimate_request_cost(
+        MODEL, ["Translate to French", long_message], None
+    )
+
+
+@patch("src.router.api.v1.flow_batches.redis_client")
+def test_no_row_starts_once_accrued_cost_exceeds_the_hold(redis):
+    redis.get = AsyncMock(return_value=b"")
+    redis.lrange = AsyncMock(return_value=[b"{}"])
+    job = make_job()
+    job.hold_amount, job.accrued = 0.05, 0.06
+    job._rebill = AsyncMock(return_value=False)
+
+    asyncio.run(job._schedule())
+
+    job._rebill.assert_awaited_once()
+    assert job.stop_reason == "insufficient_credits"
+    assert not job._tasks
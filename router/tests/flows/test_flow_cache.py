@@ -0,0 +1,108 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.router.models.flows import Flows
+from src.router.utils.flow_cache import (
+    CachedFlow,
+    FlowCache,
+    PromptTemplate,
+    _on_flow_invalidated,
+    flow_cache,
+)
+
+
+def test_template_renders_every_slot_in_one_pass():
+    template = PromptTemplate.compile("Translate {{text}} to {{lang}}, {{lang}}!")
+
+    assert template.slots == ("text", "lang", "lang")
+    # A value that looks like a placeholder is not substituted again
+    assert (
+        template.render({"text": "{{lang}}", "lang": "French"})
+        == "Translate {{lang}} to French, French!"
+    )
+    assert PromptTemplate.compile("No variables").render({}) == "No variables"
+
+
+def test_cached_flow_survives_a_redis_round_trip():
+    flow = CachedFlow.from_model(
+        Flows(id=3, name="f", system_prompt="Hi {{name}}", variables=["name"], user_id="u"),
+        version=7,
+    )
+
+    assert CachedFlow.loads(flow.dumps()) == flow
+
+
+def db_returning(flow):
+    result = MagicMock()
+    result.one_or_none.return_value = flow
+    return MagicMock(exec=AsyncMock(return_value=result))
+
+
+def fake_redis():
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=[None, b"2"])
+    pipe.__aenter__ = AsyncMock(return_value=pipe)
+    pipe.__aexit__ = AsyncMock(return_value=False)
+    redis = MagicMock()
+    redis.pipeline.return_value = pipe
+    redis.set = AsyncMock()
+    return redis
+
+
+def test_misses_are_not_cached():
+    cache = FlowCache()
+    model = Flows(id=5, name="f", system_prompt="Hi", variables=[], user_id="u")
+
+    with patch("src.router.utils.flow_cache.redis_client", fake_redis()), patch(
+        "src.router.utils.flow_cache._populate", AsyncMock()
+    ):
+        assert asyncio.run(cache.get(5, db_returning(None))) is None
+        flow = asyncio.run(cache.get(5, db_returning(model)))
+
+    assert flow.system_prompt == "Hi"
+    assert flow.version == 2
+
+
+def test_loads_only_repopulate_redis_at_the_version_they_read():
+    cache = FlowCache()
+    model = Flows(id=5, name="f", system_prompt="Hi", variables=[], user_id="u")
+    populate = AsyncMock()
+
+    with patch("src.router.utils.flow_cache.redis_client", fake_redis()), patch(
+        "src.router.utils.flow_cache._populate", populate
+    ):
+        asyncio.run(cache.get(5, db_returning(model)))
+
+    # A delete in between bumps flow:5:version past 2 and the script skips the SET
+    keys, args = populate.await_args.kwargs["keys"], populate.await_args.kwargs["args"]
+    assert keys == ["flow:5", "flow:5:version"]
+    assert args[0] == 2
+
+
+def test_invalidation_drops_only_older_versions():
+    flow_cache._local.set(9, CachedFlow.loads(
+        '{"id": 9, "name": "f", "system_prompt": "x", "version": 4}'
+    ))
+
+    _on_flow_invalidated({"flow_id": 9, "version": 4})
+    assert flow_cache._local.get(9) is not None
+
+    _on_flow_invalidated({"flow_id": 9, "version": 5})
+    assert flow_cache._local.get(9) is None
+
+
+def test_writes_retry_at_the_next_version_when_they_lose_a_race():
+    cache = FlowCache()
+    model = Flows(id=5, name="f", system_prompt="Hi", variables=[], user_id="u")
+    redis = MagicMock(get=AsyncMock(side_effect=[b"2", b"3"]))
+    # Another update took version 3 first
+    write = AsyncMock(side_effect=[0, 1])
+
+    with patch("src.router.utils.flow_cache.redis_client", redis), patch(
+        "src.router.utils.flow_cache._write_entry", write
+    ), patch("src.router.utils.flow_cache.pubsub.publish", AsyncMock()):
+        flow = asyncio.run(cache.store(model))
+
+    assert [c.kwargs["args"][0] for c in write.await_args_list] == [3, 4]
+    assert CachedFlow.loads(write.await_args.kwargs["args"][1]).version == 4
+    assert flow.version == 4
@@ -0,0 +1,45 @@
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from src.router.api.v1.flows import router
+from src.router.db.session import get_async_session
+from src.router.utils.pagination import encode_cursor
+
+
+def client_returning(rows):
+    result = MagicMock()
+    result.all.return_value = rows
+    db = MagicMock(exec=AsyncMock(return_value=result))
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_async_session] = lambda: db
+    return TestClient(app), db
+
+
+def sent_sql(db) -> str:
+    query = db.exec.await_args.args[0]
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+def test_flows_are_unpaged_without_limit_or_cursor():
+    client, db = client_returning([])
+
+    response = client.get("/flows")
+
+    assert response.status_code == 200
+    assert "LIMIT" not in sent_sql(db)
+    assert "x-next-cursor" not in response.headers
+
+
+def test_a_cursor_alone_pages_with_the_default_size():
+    client, db = client_returning([])
+
+    client.get("/flows", params={"cursor": encode_cursor(["2026-01-01T00:00:00", 7])})
+
+    sql = sent_sql(db)
+    assert "(flows.created_at, flows.id) < (" in sql
+    assert "LIMIT" in sql
+    assert db.exec.await_args.args[0]._limit == 100
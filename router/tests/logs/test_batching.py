@@ -0,0 +1,77 @@
+import asyncio
+
+from src.router.utils.batching import BackgroundBatcher
+
+
+class RecordingBatcher(BackgroundBatcher):
+    def __init__(self, fail_times: int = 0, **kwargs):
+        super().__init__(name=f"test-{id(self)}", **kwargs)
+        self.batches = []
+        self.fail_times = fail_times
+
+    async def send(self, items):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("boom")
+        self.batches.append(list(items))
+
+
+def test_flushes_when_batch_is_full():
+    async def run():
+        batcher = RecordingBatcher(batch_size=3, interval=60, queue_max=100)
+        await batcher.start()
+        for i in range(3):
+            batcher.submit(i)
+        await asyncio.sleep(0.05)
+        assert batcher.batches == [[0, 1, 2]]
+        await batcher.stop()
+
+    asyncio.run(run())
+
+
+def test_flushes_on_interval_and_drains_on_stop():
+    async def run():
+        batcher = RecordingBatcher(batch_size=100, interval=0.05, queue_max=100)
+        await batcher.start()
+        batcher.submit("a")
+        await asyncio.sleep(0.15)
+        assert batcher.batches == [["a"]]
+
+        batcher.submit("b")
+        await batcher.stop()
+        assert batcher.batches == [["a"], ["b"]]
+
+    asyncio.run(run())
+
+
+def test_rejects_when_buffer_is_full():
+    batcher = RecordingBatcher(batch_size=10, interval=60, queue_max=2)
+
+    assert batcher.submit(1)
+    assert batcher.submit(2)
+    assert not batcher.submit(3)
+
+
+def test_retries_failed_flushes():
+    async def run():
+        batcher = RecordingBatcher(
+            fail_times=1, batch_size=1, interval=60, queue_max=10, retry_backoff=0
+        )
+        await batcher.start()
+        batcher.submit("x")
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        assert batcher.batches == [["x"]]
+
+    asyncio.run(run())
+
+
+def test_subclass_without_send_cannot_be_constructed():
+    class Incomplete(BackgroundBatcher):
+        pass
+
+    try:
+        Incomplete(name="incomplete", batch_size=1, interval=1, queue_max=1)
+    except TypeError:
+        return
+    raise AssertionError("expected TypeError")
@@ -0,0 +1,56 @@
+import asyncio
+import gzip
+import json
+
+import httpx
+
+from src.router.utils.http import http_clients
+from src.router.utils.inference_logs import InferenceLogSender
+
+
+def make_sender(handler):
+    sender = InferenceLogSender()
+    sender.webhook_url = "http://inference-logs/webhooks"
+    sender.batch_size = 2
+    sender.retry_backoff = 0
+    http_clients._clients["webhooks"] = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler)
+    )
+    return sender
+
+
+def test_sends_one_gzipped_payload_per_batch():
+    payloads = []
+
+    def handler(request):
+        assert request.headers["content-encoding"] == "gzip"
+        payloads.append(json.loads(gzip.decompress(request.content)))
+        return httpx.Response(200)
+
+    async def run():
+        sender = make_sender(handler)
+        await sender.start()
+        for i in range(3):
+            sender.submit({"logId": str(i)})
+        await sender.stop()
+
+    asyncio.run(run())
+    assert [len(p["logs"]) for p in payloads] == [2, 1]
+
+
+def test_retries_on_server_errors():
+    statuses = [503, 200]
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(statuses.pop(0))
+
+    async def run():
+        sender = make_sender(handler)
+        await sender.start()
+        sender.submit({"logId": "a"})
+        await sender.stop()
+
+    asyncio.run(run())
+    assert len(calls) == 2
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.router.utils.admission import AdaptiveLimiter, PermitStreamingResponse
+
+
+def test_queued_request_gets_slot_when_one_frees():
+    async def run():
+        limiter = AdaptiveLimiter("m", initial_limit=1, queue_timeout=1)
+        first = await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert len(limiter._waiters) == 1
+
+        first.release()
+        second = await waiting
+        assert limiter.in_flight == 1
+        second.release()
+        assert limiter.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_sheds_with_retry_after_when_queue_times_out_or_is_full():
+    async def run():
+        limiter = AdaptiveLimiter("m", initial_limit=1, queue_size=1, queue_timeout=0.01)
+        await limiter.acquire()  # holds the only slot
+        queued = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as full:
+            await limiter.acquire()
+        with pytest.raises(HTTPException) as timed_out:
+            await queued
+        return full.value, timed_out.value
+
+    for error in asyncio.run(run()):
+        assert error.status_code == 429
+        assert error.headers["Retry-After"] == "1"
+
+
+def test_limit_grows_on_success_and_backs_off_on_slow_first_token():
+    async def run():
+        limiter = AdaptiveLimiter("m", initial_limit=4, min_limit=2)
+        for _ in range(8):
+            permits = [await limiter.acquire() for _ in range(4)]
+            for permit in permits:
+                permit.ttft = 0.1
+                permit.release()
+        grown = limiter.limit
+
+        permit = await limiter.acquire()
+        permit.ttft = 1.0
+        permit.release()
+        return grown, limiter.limit
+
+    grown, backed_off = asyncio.run(run())
+
+    assert grown > 4
+    assert backed_off == pytest.approx(grown * 0.9)
+
+
+def test_errors_never_push_limit_below_minimum():
+    async def run():
+        limiter = AdaptiveLimiter("m", initial_limit=4, min_limit=3)
+        for _ in range(10):
+            limiter._last_decrease = 0.0
+            (await limiter.acquire()).release(ok=False)
+        return limiter.limit
+
+    assert asyncio.run(run()) == 3
+
+
+def test_streaming_response_releases_permit_however_it_ends():
+    async def run():
+        limiter = AdaptiveLimiter("m", initial_limit=2)
+        closed = []
+
+        async def body():
+            try:
+                yield b"data: 1\n\n"
+                yield b"data: 2\n\n"
+            finally:
+                closed.append(True)
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def gone(message):
+            raise OSError("client gone")
+
+        async def send_one(message):
+            if message.get("body"):
+                raise OSError("client gone")
+
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+        for send in (gone, send_one):
+            response = PermitStreamingResponse(body(), await limiter.acquire())
+            with pytest.raises(Exception):
+                await response(scope, receive, send)
+        return limiter.in_flight, closed
+
+    in_flight, closed = asyncio.run(run())
+    assert in_flight == 0
+    # Never started: nothing to close; suspended mid-stream: closed at once
+    assert closed == [True]
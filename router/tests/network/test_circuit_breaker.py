@@ -0,0 +1,88 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from src.router.utils import circuit_breaker
+from src.router.utils.circuit_breaker import (
+    CircuitBreakers,
+    StreamStalled,
+    guard_stalls,
+)
+
+
+@pytest.fixture
+def breakers():
+    # Sharing needs Redis; the state machine does not
+    with patch.object(CircuitBreakers, "_share"):
+        yield CircuitBreakers()
+
+
+def fail(breakers, times, machine_id=1):
+    for _ in range(times):
+        breakers.record("m", machine_id, ok=False)
+
+
+def test_consecutive_failures_eject_machine(breakers):
+    fail(breakers, circuit_breaker.CIRCUIT_CONSECUTIVE_FAILURES - 1)
+    assert breakers.allow("m", 1)
+
+    fail(breakers, 1)
+    assert not breakers.allow("m", 1)
+    # The machine-level breaker covers its other deployments too
+    assert not breakers.allow("other", 1)
+    assert breakers.allow("m", 2)
+
+
+def test_slow_first_token_counts_as_failure(breakers):
+    slow = circuit_breaker.CIRCUIT_SLOW_TTFT_SEC + 1
+    for _ in range(circuit_breaker.CIRCUIT_CONSECUTIVE_FAILURES):
+        breakers.record("m", 1, ok=True, ttft=slow)
+    assert not breakers.allow("m", 1)
+
+
+def test_half_open_probe_closes_or_backs_off(breakers):
+    fail(breakers, circuit_breaker.CIRCUIT_CONSECUTIVE_FAILURES)
+    breaker = breakers._breakers["machine-1"]
+    first_ejection = breaker.open_until
+
+    with patch("time.time", return_value=first_ejection + 1):
+        # One probe is let through, then the slot is taken
+        assert breakers.allow("m", 1)
+        breakers.on_selected("m", 1)
+        assert not breakers.allow("m", 1)
+
+        breakers.record("m", 1, ok=False)
+        assert breaker.ejections == 2
+        assert breaker.open_until - (first_ejection + 1) == pytest.approx(
+            2 * circuit_breaker.CIRCUIT_BASE_EJECTION_SEC
+        )
+
+    with patch("time.time", return_value=breaker.open_until + 1):
+        breakers.on_selected("m", 1)
+        breakers.record("m", 1, ok=True)
+        assert breakers.allow("m", 1)
+
+
+def test_remote_ejection_is_adopted(breakers):
+    with patch("time.time", return_value=1000.0):
+        breakers.apply("machine-3", {"until": 1010.0, "ejections": 1})
+        assert not breakers.allow("m", 3)
+        breakers.apply("machine-3", None)
+        assert breakers.allow("m", 3)
+
+
+def test_guard_stalls_cuts_silent_streams():
+    async def chunks():
+        yield b"data: 1\n\n"
+        await asyncio.sleep(1)
+        yield b"data: 2\n\n"
+
+    async def run():
+        received = []
+        with pytest.raises(StreamStalled):
+            async for chunk in guard_stalls(chunks(), 0.05):
+                received.append(chunk)
+        return received
+
+    assert asyncio.run(run()) == [b"data: 1\n\n"]
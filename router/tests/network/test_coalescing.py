@@ -0,0 +1,55 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from src.router.utils.coalescing import CompletionCoalescer
+
+
+def test_concurrent_streams_share_one_upstream_call():
+    opened = 0
+
+    @asynccontextmanager
+    async def upstream():
+        nonlocal opened
+        opened += 1
+
+        async def chunks():
+            for i in range(3):
+                await asyncio.sleep(0.01)
+                yield f"data: {i}\n\n".encode()
+
+        yield {"x-litellm-model-id": "m-machine-1"}, chunks()
+
+    async def consume(coalescer):
+        async with coalescer.stream("key", upstream) as (headers, chunks):
+            return headers, [chunk async for chunk in chunks]
+
+    async def run():
+        coalescer = CompletionCoalescer()
+        first = asyncio.create_task(consume(coalescer))
+        await asyncio.sleep(0.015)  # join after the first chunk was sent
+        return await asyncio.gather(first, consume(coalescer))
+
+    results = asyncio.run(run())
+    assert opened == 1
+    assert results[0] == results[1]
+    assert len(results[0][1]) == 3
+
+
+def test_upstream_errors_reach_every_subscriber():
+    @asynccontextmanager
+    async def upstream():
+        raise ConnectionError("litellm down")
+        yield
+
+    async def consume(coalescer):
+        try:
+            async with coalescer.stream("key", upstream):
+                pass
+        except ConnectionError as e:
+            return str(e)
+
+    async def run():
+        coalescer = CompletionCoalescer()
+        return await asyncio.gather(consume(coalescer), consume(coalescer))
+
+    assert asyncio.run(run()) == ["litellm down", "litellm down"]
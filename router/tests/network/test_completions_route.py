@@ -0,0 +1,172 @@
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+from fastapi import FastAPI
+from openai import InternalServerError
+from fastapi.testclient import TestClient
+
+from src.router.api.v1.network import router
+from src.router.core.security import verify_user
+from src.router.core.settings_types import ModelConfig
+from src.router.db.session import get_async_session
+from src.router.utils.rate_limit import Bucket, RateLimitStatus
+from src.router.utils.user import CreditHold
+
+app = FastAPI()
+app.include_router(router)
+app.dependency_overrides[verify_user] = lambda: SimpleNamespace(
+    id="user-1", api_key_id=-1, api_key_meta={"response_cache": True}
+)
+app.dependency_overrides[get_async_session] = lambda: None
+client = TestClient(app)
+
+MODELS = {"m": ModelConfig(id="m", prompt_token=0.001, completion_token=0.002)}
+BODY = {"model": "m", "messages": [{"role": "user", "content": "Hi"}]}
+CHUNKS = [
+    b'data: {"choices": [{"index": 0, "delta": {"content": "Hel"}}]}\n\n',
+    b'data: {"choices": [{"index": 0, "delta": {"content": "lo"}}]}\n\n',
+    b"data: [DONE]\n\n",
+]
+
+
+class FakeNodeRouter:
+    @asynccontextmanager
+    async def stream(self, completion_params):
+        async def chunks():
+            for chunk in CHUNKS:
+                yield chunk
+
+        yield {"x-litellm-model-id": "machine-3"}, chunks()
+
+
+def route_patches(cached=None):
+    rate_limiter = MagicMock()
+    rate_limiter.check = AsyncMock(
+        return_value=RateLimitStatus([(Bucket("user", "user-1", "rpm", 60), 59.0)])
+    )
+    prefix = "src.router.api.v1.network"
+    return [
+        patch(f"{prefix}.get_supported_models", AsyncMock(return_value=MODELS)),
+        patch(f"{prefix}.rate_limiter", rate_limiter),
+        patch(
+            f"{prefix}.reserve_credits",
+            AsyncMock(return_value=CreditHold(member="h", amount=1.0, balance=5.0)),
+        ),
+        patch(f"{prefix}.release_credits", AsyncMock()),
+        patch(f"{prefix}.save_log", AsyncMock()),
+        patch(f"{prefix}.circuit_breakers", MagicMock()),
+        patch(f"{prefix}.ROUTING_MODE", "direct"),
+        patch(f"{prefix}.node_router", FakeNodeRouter()),
+        patch(f"{prefix}.cache_service.enabled", True),
+        patch(f"{prefix}.cache_service.check", AsyncMock(return_value=cached)),
+        patch(f"{prefix}.cache_service.save", MagicMock()),
+    ]
+
+
+def post(body, cached=None, extra=()):
+    patches = route_patches(cached) + list(extra)
+    for p in patches:
+        p.start()
+    try:
+        return client.post("/v1/chat/completions", json=body)
+    finally:
+        for p in reversed(patches):
+            p.stop()
+
+
+def test_streamed_completion_forwards_upstream_chunks():
+    response = post({**BODY, "stream": True})
+
+    assert response.status_code == 200
+    assert response.content == b"".join(CHUNKS)
+    assert response.headers["x-ratelimit-limit-requests"] == "60"
+
+
+def test_cache_hits_return_a_response_with_rate_limit_headers():
+    response = post(BODY, cached={"response": "Hello"})
+
+    assert response.status_code == 200
+    assert response.json()["choices"][0]["message"]["content"] == "Hello"
+    assert response.headers["x-ratelimit-remaining-requests"] == "59"
+
+
+def test_streamed_cache_hit_replays_the_cached_text():
+    response = post({**BODY, "stream": True}, cached={"response": "Hello"})
+
+    assert response.status_code == 200
+    text = "".join(
+        json.loads(line[6:])["choices"][0]["delta"].get("content") or ""
+        for line in response.text.splitlines()
+        if line.startswith("data: {")
+    )
+    assert text == "Hello"
+
+
+class FakeOpenAIStream:
+    response = SimpleNamespace(headers={"x-litellm-model-id": "machine-3"})
+
+    def __init__(self):
+        self.close = AsyncMock()
+
+    async def __aiter__(self):
+        for content in ["Hel", "lo"]:
+            yield MagicMock(
+                model_dump=lambda content=content: {
+                    "choices": [{"index": 0, "delta": {"content": content}}]
+                }
+            )
+
+
+def test_reserialized_streams_end_with_done_and_count_as_healthy():
+    openai_client = MagicMock()
+    openai_client.chat.completions.create = AsyncMock(return_value=FakeOpenAIStream())
+    breakers = MagicMock()
+    save = MagicMock()
+    prefix = "src.router.api.v1.network"
+
+    response = post(
+        {**BODY, "stream": True},
+        extra=[
+            patch(f"{prefix}.ROUTING_MODE", "litellm"),
+            patch(f"{prefix}.SSE_PASSTHROUGH", False),
+            patch(f"{prefix}.openai_client", openai_client),
+            patch(f"{prefix}.circuit_breakers", breakers),
+            patch(f"{prefix}.cache_service.save", save),
+        ],
+    )
+
+    assert response.status_code == 200
+    assert response.text.endswith("data: [DONE]\n\n")
+    assert breakers.record.call_args.kwargs["ok"] is True
+    save.assert_called_once()
+    assert save.call_args.args[1] == "Hello"
+
+
+def test_failed_litellm_completions_are_recorded_against_the_deployment():
+    request = httpx.Request("POST", "http://litellm/v1/chat/completions")
+    error = InternalServerError(
+        "upstream failed",
+        response=httpx.Response(
+            503, headers={"x-litellm-model-id": "m-machine-3"}, request=request
+        ),
+        body=None,
+    )
+    openai_client = MagicMock()
+    openai_client.chat.completions.create = AsyncMock(side_effect=error)
+    breakers = MagicMock()
+    prefix = "src.router.api.v1.network"
+
+    response = post(
+        BODY,
+        extra=[
+            patch(f"{prefix}.ROUTING_MODE", "litellm"),
+            patch(f"{prefix}.openai_client", openai_client),
+            patch(f"{prefix}.circuit_breakers", breakers),
+        ],
+    )
+
+    assert response.status_code >= 500
+    breakers.record.assert_called_once_with("m", 3, ok=False)
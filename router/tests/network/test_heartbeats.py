@@ -0,0 +1,45 @@
+from unittest.mock import AsyncMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.router.api.v1.machines import router
+from src.router.core.security import verify_machine
+
+app = FastAPI()
+app.include_router(router)
+app.dependency_overrides[verify_machine] = lambda: {
+    "type": "machine",
+    "machines": [
+        {"id": 7, "network_ip": "10.0.0.7"},
+        {"id": 8, "network_ip": "10.0.0.8"},
+    ],
+}
+client = TestClient(app)
+
+
+@patch("src.router.api.v1.machines.record_heartbeats", new_callable=AsyncMock)
+def test_heartbeat_uses_token_machines_without_db(record):
+    response = client.post("/liveness/10.0.0.7")
+
+    assert response.status_code == 200
+    assert response.json()["machine_id"] == "7"
+    assert record.await_args.args[0] == [7]
+
+    assert client.post("/liveness/10.0.0.9").status_code == 403
+
+
+@patch("src.router.api.v1.machines.record_heartbeats", new_callable=AsyncMock)
+def test_batch_heartbeat_records_authorized_machines_in_one_write(record):
+    response = client.post(
+        "/liveness/batch",
+        json={"network_ips": ["10.0.0.7", "10.0.0.8", "10.0.0.9", "10.0.0.7"]},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["rejected"] == ["10.0.0.9"]
+    record.assert_awaited_once()
+    assert record.await_args.args[0] == [7, 8]
+
+    response = client.post("/liveness/batch", json={"network_ips": ["10.0.0.9"]})
+    assert response.status_code == 403
@@ -0,0 +1,81 @@
+import asyncio
+
+from src.router.utils.hedging import Hedger
+
+
+def warmed_up(latency=0.01, samples=50):
+    hedger = Hedger(enabled=True)
+    for _ in range(samples):
+        hedger.latencies.observe("m", latency)
+    return hedger
+
+
+def test_slow_call_is_hedged_on_another_machine_and_loser_cancelled():
+    hedger = warmed_up()
+    hedger._budget = 1.0
+    calls, cancelled = [], []
+
+    async def attempt(tried):
+        machine = 2 if tried else 1
+        tried.append(machine)
+        calls.append(machine)
+        try:
+            await asyncio.sleep(1.0 if machine == 1 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(machine)
+            raise
+        return machine
+
+    assert asyncio.run(hedger.run("m", attempt)) == 2
+    assert calls == [1, 2]
+    assert cancelled == [1]
+
+
+def test_hedges_stay_within_budget():
+    hedger = warmed_up()
+    hedger.latencies.threshold = lambda model: 0.01
+    hedger._budget = 0.0
+    calls = 0
+
+    async def attempt(tried):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def run(n):
+        for _ in range(n):
+            await hedger.run("m", attempt)
+
+    # 25 slow calls earn 25 * 5% = one hedge
+    asyncio.run(run(25))
+    assert calls == 26
+
+
+def test_failed_hedge_falls_back_to_primary():
+    hedger = warmed_up()
+    hedger._budget = 1.0
+
+    async def attempt(tried):
+        if tried:
+            raise ConnectionError("no other machine")
+        tried.append(1)
+        await asyncio.sleep(0.05)
+        return "primary"
+
+    assert asyncio.run(hedger.run("m", attempt)) == "primary"
+
+
+def test_no_hedging_without_latency_history():
+    hedger = Hedger(enabled=True)
+    hedger._budget = 5.0
+    calls = 0
+
+    async def attempt(tried):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    asyncio.run(hedger.run("m", attempt))
+    assert calls == 1
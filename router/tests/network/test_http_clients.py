@@ -0,0 +1,21 @@
+import asyncio
+
+from src.router.utils.http import HttpClientRegistry
+
+
+def test_reuses_one_client_per_pool_until_closed():
+    async def run():
+        registry = HttpClientRegistry()
+        registry.register("cache", timeout=2.0, max_connections=5)
+        await registry.start()
+
+        client = registry.get("cache")
+        assert registry.get("cache") is client
+        assert client.timeout.read == 2.0
+
+        await registry.close()
+        assert client.is_closed
+        assert registry.get("cache") is not client
+        await registry.close()
+
+    asyncio.run(run())
@@ -0,0 +1,41 @@
+import time
+
+from src.router.utils.machine_registry import MachineRegistry, RegisteredMachine
+
+
+def registry_with(*machines, heartbeats):
+    registry = MachineRegistry(liveness_ttl=12)
+    registry.machines = {m.id: m for m in machines}
+    registry.heartbeats = heartbeats
+    registry._reindex()
+    return registry
+
+
+def test_lookups_use_heartbeat_age():
+    now = time.time()
+    registry = registry_with(
+        RegisteredMachine(id=1, network_ip="10.0.0.1"),
+        RegisteredMachine(id=2, network_ip="10.0.0.2"),
+        heartbeats={1: now - 1, 2: now - 30},
+    )
+
+    assert registry.online_ids() == [1]
+    assert registry.machine_id_for_ip("10.0.0.2") == 2
+    assert registry.is_online(registry.machine_id_for_ip("10.0.0.1"))
+    assert not registry.is_online(2)
+    assert registry.machine_id_for_ip("10.0.0.3") is None
+
+
+def test_model_index_includes_machines_serving_every_model():
+    now = time.time()
+    registry = registry_with(
+        RegisteredMachine(id=1, network_ip="a", supported_models=["m1"]),
+        RegisteredMachine(id=2, network_ip="b", supported_models=["m2"]),
+        RegisteredMachine(id=3, network_ip="c"),
+        RegisteredMachine(id=4, network_ip="d", disabled=True),
+        heartbeats={1: now, 2: now, 3: now, 4: now},
+    )
+
+    assert sorted(m.id for m in registry.online_machines("m1")) == [1, 3]
+    assert sorted(m.id for m in registry.online_machines("unknown")) == [3]
+    assert sorted(m.id for m in registry.online_machines()) == [1, 2, 3]
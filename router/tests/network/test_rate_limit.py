@@ -0,0 +1,83 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from src.router.core.settings_types import RateLimits, RateLimitSettings
+from src.router.utils.rate_limit import RateLimiter
+
+
+class FakeUser:
+    def __init__(self, api_key_id=7, api_key_meta=None):
+        self.id = "user-1"
+        self.api_key_id = api_key_id
+        self.api_key_meta = api_key_meta or {}
+
+
+SETTINGS = RateLimitSettings(
+    api_key=RateLimits(rpm=100, tpm=10000), user=RateLimits(rpm=1000)
+)
+
+
+def buckets_for(user):
+    with patch(
+        "src.router.utils.rate_limit.get_rate_limits",
+        AsyncMock(return_value=SETTINGS),
+    ):
+        return asyncio.run(RateLimiter().buckets(user))
+
+
+def test_key_meta_overrides_settings_and_jwt_users_only_get_user_limits():
+    keyed = buckets_for(FakeUser(api_key_meta={"rate_limit": {"rpm": 5}}))
+    jwt = buckets_for(FakeUser(api_key_id=-1))
+
+    assert [(b.key, b.capacity) for b in keyed] == [
+        ("ratelimit:key:7:rpm", 5),
+        ("ratelimit:key:7:tpm", 10000),
+        ("ratelimit:user:user-1:rpm", 1000),
+    ]
+    assert [b.key for b in jwt] == ["ratelimit:user:user-1:rpm"]
+
+
+def test_rejected_key_is_refused_locally_until_it_refills():
+    limiter = RateLimiter()
+    script = AsyncMock(return_value=[0, "0.2", "5000", "900"])
+
+    async def run():
+        errors = []
+        for _ in range(2):
+            with pytest.raises(HTTPException) as error:
+                await limiter.check(FakeUser())
+            errors.append(error.value)
+        return errors
+
+    with patch(
+        "src.router.utils.rate_limit.get_rate_limits",
+        AsyncMock(return_value=SETTINGS),
+    ), patch("src.router.utils.rate_limit._bucket", script):
+        errors = asyncio.run(run())
+
+    assert script.await_count == 1
+    for error in errors:
+        assert error.status_code == 429
+        assert error.headers["Retry-After"] == "1"
+        assert error.headers["x-ratelimit-limit-requests"] == "100"
+        assert error.headers["x-ratelimit-remaining-requests"] == "0"
+
+
+def test_headers_report_the_tightest_bucket():
+    limiter = RateLimiter()
+    script = AsyncMock(return_value=[1, "40", "2500", "990"])
+
+    with patch(
+        "src.router.utils.rate_limit.get_rate_limits",
+        AsyncMock(return_value=SETTINGS),
+    ), patch("src.router.utils.rate_limit._bucket", script):
+        status = asyncio.run(limiter.check(FakeUser()))
+
+    headers = status.headers()
+    assert headers["x-ratelimit-remaining-requests"] == "40"
+    assert headers["x-ratelimit-reset-requests"] == "36s"
+    assert headers["x-ratelimit-limit-tokens"] == "10000"
+    assert headers["x-ratelimit-remaining-tokens"] == "2500"
@@ -0,0 +1,33 @@
+from src.router.schemas.ai import AiRequest, Message
+from src.router.utils.cache import canonical_request_hash, split_for_replay
+
+
+def make_request(**overrides):
+    fields = {
+        "model": "gpt-4o",
+        "messages": [
+            Message(role="system", content="Be brief."),
+            Message(role="user", content="Hello"),
+        ],
+    }
+    fields.update(overrides)
+    return AiRequest(**fields)
+
+
+def test_hash_covers_history_and_sampling_params():
+    base = canonical_request_hash("gpt-4o", make_request())
+    assert base == canonical_request_hash("gpt-4o", make_request(stream=True))
+    assert base != canonical_request_hash("gpt-4o-mini", make_request())
+    assert base != canonical_request_hash("gpt-4o", make_request(max_tokens=10))
+    assert base != canonical_request_hash(
+        "gpt-4o",
+        make_request(messages=[Message(role="user", content="Hello")]),
+    )
+
+
+def test_replay_chunks_rebuild_the_text_on_word_boundaries():
+    text = "The quick brown fox jumps over the lazy dog. " * 3
+    chunks = split_for_replay(text, 16)
+    assert "".join(chunks) == text
+    assert len(chunks) > 1
+    assert all(chunk.endswith(" ") for chunk in chunks)
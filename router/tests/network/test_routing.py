@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+from collections import Counter
+
+import httpx
+
+from src.router.utils.http import http_clients
+from src.router.utils.machine_registry import MachineRegistry, RegisteredMachine
+from src.router.utils.routing import STRATEGIES, NodeRouter
+
+
+def machines(*weights):
+    return [
+        RegisteredMachine(id=i + 1, network_ip=f"10.0.0.{i + 1}", traffic_weight=w)
+        for i, w in enumerate(weights)
+    ]
+
+
+def router_with(candidates, strategy="p2c"):
+    registry = MachineRegistry()
+    registry.machines = {m.id: m for m in candidates}
+    registry.heartbeats = {m.id: time.time() for m in candidates}
+    registry.refreshed_at = float("inf")
+    registry._reindex()
+    return NodeRouter(strategy, registry=registry)
+
+
+def test_supported_models_filter_candidates():
+    candidates = machines(0.5, 0.5)
+    candidates[0].supported_models = ["other/model"]
+    router = router_with(candidates)
+
+    picks = {asyncio.run(router.choose("some/model")).id for _ in range(20)}
+
+    assert picks == {2}
+
+
+def test_weighted_follows_traffic_weight():
+    candidates = machines(0.9, 0.1, 0.0)
+    router = router_with(candidates)
+
+    picks = Counter(
+        STRATEGIES["weighted"](candidates, router.loads).id for _ in range(2000)
+    )
+
+    assert picks[3] == 0
+    assert picks[1] > picks[2] * 4
+
+
+def test_load_aware_strategies_avoid_busy_machines():
+    candidates = machines(0.5, 0.5)
+    router = router_with(candidates)
+    router.loads[1].outstanding = 5
+    router.loads[1].observe(2.0)
+    router.loads[2].observe(0.5)
+
+    for name in ("least_outstanding", "ewma"):
+        assert STRATEGIES[name](candidates, router.loads).id == 2
+    # p2c only ever keeps the busier machine when both picks land on it
+    picks = Counter(STRATEGIES["p2c"](candidates, router.loads).id for _ in range(400))
+    assert picks[2] > picks[1]
+
+
+def test_stream_reroutes_on_connect_error_and_terminates_sse():
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        if request.url.host == "10.0.0.1":
+            raise httpx.ConnectError("refused", request=request)
+        chunk = {"choices": [{"delta": {"content": "hi"}}]}
+        return httpx.Response(200, content=f"data: {json.dumps(chunk)}\n\n".encode())
+
+    router = router_with(machines(1.0, 0.0), strategy="weighted")
+
+    async def run():
+        http_clients._clients["nodes"] = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        try:
+            async with router.stream(
+                {"model": "some/model", "messages": [], "stream": True}
+            ) as (headers, chunks):
+                return headers, b"".join([chunk async for chunk in chunks])
+        finally:
+            await http_clients._clients.pop("nodes").aclose()
+
+    async def payload(params, stream):
+        return {"model": params["model"], "messages": [], "stream": stream}
+
+    router._payload = payload
+    headers, body = asyncio.run(run())
+
+    assert [r.url.host for r in requests] == ["10.0.0.1", "10.0.0.2"]
+    assert headers["x-litellm-model-id"] == "some/model-machine-2"
+    assert body.endswith(b"data: [DONE]\n\n")
+    assert router.loads[1].outstanding == router.loads[2].outstanding == 0
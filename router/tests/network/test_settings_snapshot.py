@@ -0,0 +1,29 @@
+from src.router.utils.settings import SettingsSnapshot
+
+
+def test_serves_values_until_a_new_version_is_published():
+    snapshot = SettingsSnapshot(max_age=60)
+    snapshot.put("SUPPORTED_MODELS", None, {"a": 1}, snapshot.generation)
+    assert snapshot.get("SUPPORTED_MODELS", None) == {"a": 1}
+
+    snapshot.invalidate(3)
+    assert snapshot.get("SUPPORTED_MODELS", None) is None
+
+    # A repeated message for the same version keeps the reloaded value
+    snapshot.put("SUPPORTED_MODELS", None, {"a": 2}, snapshot.generation)
+    snapshot.invalidate(3)
+    assert snapshot.get("SUPPORTED_MODELS", None) == {"a": 2}
+
+
+def test_discards_values_fetched_before_an_invalidation():
+    snapshot = SettingsSnapshot(max_age=60)
+    generation = snapshot.generation
+    snapshot.invalidate(1)
+    snapshot.put("SUPPORTED_MODELS", None, {"stale": True}, generation)
+    assert snapshot.get("SUPPORTED_MODELS", None) is None
+
+
+def test_entries_expire_after_max_age():
+    snapshot = SettingsSnapshot(max_age=-1)
+    snapshot.put("SUPPORTED_MODELS", None, {"a": 1}, snapshot.generation)
+    assert snapshot.get("SUPPORTED_MODELS", None) is None
@@ -0,0 +1,77 @@
+import json
+
+from src.router.utils.sse import SSEScanner
+
+
+def _event(payload: dict) -> bytes:
+    return f"data: {json.dumps(payload)}\n\n".encode()
+
+
+def test_scanner_extracts_content_and_usage():
+    body = (
+        _event({"choices": [{"delta": {"role": "assistant", "content": "Hello"}}]})
+        + _event({"choices": [{"delta": {"content": " \"World\" é"}}], "usage": None})
+        + _event(
+            {
+                "choices": [{"delta": {}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30},
+            }
+        )
+        + b"data: [DONE]\n\n"
+    )
+
+    scanner = SSEScanner()
+    # Split at awkward boundaries to exercise incremental buffering
+    for i in range(0, len(body), 7):
+        scanner.feed(body[i : i + 7])
+    scanner.close()
+
+    assert scanner.text == 'Hello "World" é'
+    assert scanner.usage == {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30}
+    assert scanner.done
+    assert scanner.events == 3
+
+
+def test_scanner_ignores_tool_call_arguments():
+    payload = {
+        "choices": [
+            {
+                "delta": {
+                    "content": None,
+                    "tool_calls": [{"function": {"arguments": '{"content": "x"}'}}],
+                }
+            }
+        ]
+    }
+    scanner = SSEScanner()
+    scanner.feed(_event(payload))
+
+    assert scanner.text == ""
+
+
+def test_scanner_bounds_accumulated_text():
+    scanner = SSEScanner(max_chars=5)
+    scanner.feed(_event({"choices": [{"delta": {"content": "abc"}}]}))
+    scanner.feed(_event({"choices": [{"delta": {"content": "defgh"}}]}))
+    scanner.feed(_event({"choices": [{"delta": {"content": "ijk"}}]}))
+
+    assert scanner.text == "abcde"
+    assert scanner.truncated
+
+
+def test_scanner_records_error_events():
+    scanner = SSEScanner()
+    scanner.feed(_event({"error": "upstream failed"}))
+
+    assert scanner.error == "upstream failed"
+
+
+def test_scanner_passes_every_delta_to_on_content_past_the_cap():
+    deltas = []
+    scanner = SSEScanner(max_chars=3, on_content=deltas.append)
+
+    scanner.feed(_event({"choices": [{"delta": {"content": "abcd"}}]}))
+    scanner.feed(_event({"choices": [{"delta": {"content": "ef"}}]}))
+
+    assert scanner.text == "abc"
+    assert deltas == ["abcd", "ef"]
@@ -0,0 +1,75 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.router.api.v1.network import router
+from src.router.core.security import verify_user
+from src.router.core.settings_types import ModelConfig
+from src.router.db.session import get_async_session
+from src.router.utils.user import CreditHold
+
+app = FastAPI()
+app.include_router(router)
+app.dependency_overrides[verify_user] = lambda: SimpleNamespace(id="user-1")
+app.dependency_overrides[get_async_session] = lambda: None
+client = TestClient(app)
+
+MODELS = {
+    name: ModelConfig(id=name, prompt_token=0.001, completion_token=0.002)
+    for name in ("a", "b")
+}
+
+
+async def fake_verify(model, messages, user, idx):
+    # Claim "slow" finishes last; model "b" always says no
+    await asyncio.sleep(0.05 if messages[0]["content"] == "slow" else 0)
+    return {
+        "result": "yes" if model == "a" else "no",
+        "model": model,
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5},
+    }
+
+
+@patch("src.router.api.v1.network.charge_credits", new_callable=AsyncMock)
+@patch(
+    "src.router.api.v1.network.reserve_credits",
+    new_callable=AsyncMock,
+    return_value=CreditHold(member="hold-1", amount=1.0, balance=10.0),
+)
+@patch(
+    "src.router.api.v1.network.get_supported_models",
+    new_callable=AsyncMock,
+    return_value=MODELS,
+)
+@patch("src.router.api.v1.network.verify_with_model", fake_verify)
+def test_batch_streams_claims_in_completion_order_and_debits_once(
+    _models, reserve, charge
+):
+    response = client.post(
+        "/v1/verify/batch",
+        json={
+            "claims": [
+                {"id": "c1", "messages": [{"role": "user", "content": "slow"}]},
+                {"id": "c2", "messages": [{"role": "user", "content": "fast"}]},
+            ],
+            "models": ["a", "b"],
+            "min_yes": 1,
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["id"], line["result"]) for line in lines] == [
+        ("c2", "yes"),
+        ("c1", "yes"),
+    ]
+    reserve.assert_awaited_once()
+    charge.assert_awaited_once()
+    assert charge.await_args.kwargs["hold_member"] == "hold-1"
+    # Every claim and model that answered is billed: 4 x (10 * 0.001 + 5 * 0.002)
+    assert abs(charge.await_args.args[1] - 0.08) < 1e-9
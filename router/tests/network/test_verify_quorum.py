@@ -0,0 +1,50 @@
+import asyncio
+from unittest.mock import patch
+
+from src.router.api.v1.network import verify_quorum
+
+VERDICTS = {
+    "fast-yes": (0.0, "yes"),
+    "fast-no": (0.0, "no"),
+    "mid-yes": (0.01, "yes"),
+    "slow": (5, "no"),
+}
+
+
+def run_quorum(models, min_yes):
+    cancelled = []
+
+    async def fake_verify(model, messages, user, idx):
+        delay, verdict = VERDICTS[model]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+        return {"result": verdict, "model": model, "usage": {"prompt_tokens": 1}}
+
+    async def collect():
+        return [item async for item in verify_quorum(models, [], None, min_yes)]
+
+    with patch("src.router.api.v1.network.verify_with_model", fake_verify):
+        results = asyncio.run(collect())
+    return results, cancelled
+
+
+def test_returns_once_min_yes_is_reached_and_cancels_the_rest():
+    results, cancelled = run_quorum(["slow", "fast-yes", "mid-yes"], min_yes=2)
+
+    assert [(idx, r["result"]) for idx, r in results] == [
+        (1, "yes"),
+        (2, "yes"),
+        (0, "skipped"),
+    ]
+    assert results[-1][1]["usage"] == {}
+    assert cancelled == ["slow"]
+
+
+def test_stops_once_min_yes_can_no_longer_be_reached():
+    results, cancelled = run_quorum(["fast-no", "slow", "slow"], min_yes=3)
+
+    assert [r["result"] for _, r in results] == ["no", "skipped", "skipped"]
+    assert sorted(cancelled) == ["slow", "slow"]
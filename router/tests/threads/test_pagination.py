@@ -0,0 +1,109 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import UUID, uuid4
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+from sqlmodel import select
+
+import asyncio
+
+from src.router.models.thread import Thread
+from src.router.models.user import User
+from src.router.utils.pagination import (
+    decode_cursor,
+    encode_cursor,
+    keyset,
+    keyset_nulls_last,
+    next_cursor,
+)
+
+
+def test_cursor_round_trips_datetimes_ints_and_uuids():
+    stamp = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    key = uuid4()
+
+    assert decode_cursor(encode_cursor([stamp, key]), (datetime, type(key))) == (
+        stamp,
+        key,
+    )
+    assert decode_cursor(encode_cursor([stamp, 42]), (datetime, int)) == (stamp, 42)
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor([1]), "e30="])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, (datetime, int))
+    assert error.value.status_code == 400
+
+
+def test_keyset_continues_after_the_last_row_in_index_order():
+    after = (datetime(2026, 1, 1, tzinfo=timezone.utc), uuid4())
+    query = keyset(select(Thread), [Thread.updated_at, Thread.id], after, True)
+
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "(threads.updated_at, threads.id) < (" in sql
+    assert sql.endswith("ORDER BY threads.updated_at DESC, threads.id DESC")
+
+
+def test_next_cursor_is_only_set_on_full_pages():
+    rows = [SimpleNamespace(created_at=datetime(2026, 1, 1), id=i) for i in (1, 2)]
+
+    assert next_cursor(rows, 3, ("created_at", "id")) is None
+    assert decode_cursor(next_cursor(rows, 2, ("created_at", "id")), (datetime, int)) == (
+        datetime(2026, 1, 1),
+        2,
+    )
+
+
+def test_cursor_round_trips_a_null_key():
+    key = uuid4()
+
+    assert decode_cursor(encode_cursor([None, key]), (datetime, UUID)) == (None, key)
+
+
+def db_returning(*pages):
+    results = []
+    for rows in pages:
+        result = MagicMock()
+        result.all.return_value = rows
+        results.append(result)
+    return MagicMock(exec=AsyncMock(side_effect=results))
+
+
+def sent_sql(db):
+    return [
+        str(call.args[0].compile(dialect=postgresql.dialect()))
+        for call in db.exec.await_args_list
+    ]
+
+
+def test_null_keys_are_paged_after_all_others():
+    columns = [User.created_at, User.id]
+    after = (datetime(2026, 1, 1, tzinfo=timezone.utc), uuid4())
+    db = db_returning(["a"], ["b", "c"])
+
+    rows = asyncio.run(keyset_nulls_last(db, select(User), columns, after, True, 3))
+
+    assert rows == ["a", "b", "c"]
+    head, tail = sent_sql(db)
+    assert '"user".created_at IS NOT NULL' in head
+    assert '("user".created_at, "user".id) < (' in head
+    assert '"user".created_at IS NULL' in tail
+    assert 'ORDER BY "user".id DESC' in tail
+
+
+def test_a_cursor_on_a_null_key_continues_in_the_null_rows():
+    db = db_returning(["b"])
+
+    asyncio.run(
+        keyset_nulls_last(
+            db, select(User), [User.created_at, User.id], (None, uuid4()), True, 3
+        )
+    )
+
+    (tail,) = sent_sql(db)
+    assert '"user".created_at IS NULL' in tail
+    assert '("user".id) < (' in tail
@@ -0,0 +1,66 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+from src.router.core.settings_types import ModelConfig
+from src.router.utils.thread_context import (
+    _rebuild,
+    context_budget,
+    fit_to_budget,
+)
+
+
+def entry(role, content, tokens):
+    return {"role": role, "content": content, "tokens": tokens}
+
+
+def test_keeps_newest_messages_that_fit_the_budget():
+    entries = [
+        entry("user", "first", 50),
+        entry("assistant", "second", 30),
+        entry("user", "third", 40),
+        entry("assistant", "fourth", 20),
+    ]
+
+    kept = fit_to_budget(entries, budget=100)
+
+    assert [m["content"] for m in kept] == ["second", "third", "fourth"]
+    assert kept[0] == {"role": "assistant", "content": "second"}
+
+
+def test_latest_message_is_kept_even_when_over_budget():
+    entries = [entry("user", "old", 1), entry("user", "huge", 500)]
+
+    assert fit_to_budget(entries, budget=100) == [{"role": "user", "content": "huge"}]
+
+
+def test_budget_uses_model_context_window_when_set():
+    config = ModelConfig(
+        id="m", prompt_token=0, completion_token=0, context_window=32000
+    )
+
+    assert context_budget(config) > context_budget(None)
+
+
+def test_rebuilds_are_only_cached_at_the_sequence_they_read():
+    thread_id = uuid4()
+    result = MagicMock()
+    result.all.return_value = [SimpleNamespace(role="user", content="Hi")]
+    db = MagicMock(exec=AsyncMock(return_value=result))
+    redis = MagicMock(get=AsyncMock(return_value=b"7"))
+    store = AsyncMock(return_value=0)
+
+    with patch("src.router.utils.thread_context.redis_client", redis), patch(
+        "src.router.utils.thread_context._store_rebuild", store
+    ):
+        entries = asyncio.run(_rebuild(thread_id, db))
+
+    # A message appended meanwhile bumps the sequence and the script skips
+    # the write; this read still answers from Postgres
+    assert [e["content"] for e in entries] == ["Hi"]
+    keys, args = store.await_args.kwargs["keys"], store.await_args.kwargs["args"]
+    assert keys == [f"thread_context:{thread_id}", f"thread_context:{thread_id}:seq"]
+    assert args[0] == 7
+    assert json.loads(args[2])["content"] == "Hi"
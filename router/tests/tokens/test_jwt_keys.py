@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import jwt
+import pytest
+
+from src.router.core import jwt_keys as jwt_keys_module
+from src.router.core.jwt_keys import JWTKeySet
+from src.router.core.security import AUTH_CACHE_TTL_SEC, _auth_cache_ttl
+
+SECRET = "test-secret-with-at-least-32-bytes!!"
+
+
+def make_token(**overrides):
+    claims = {
+        "sub": "user-1",
+        "aud": "authenticated",
+        "exp": int(time.time()) + 60,
+        "user_roles": ["user"],
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+@pytest.fixture(autouse=True)
+def hs256_secret(monkeypatch):
+    monkeypatch.setattr(jwt_keys_module, "JWT_SECRET", SECRET)
+
+
+def test_decodes_valid_hs256_token():
+    claims = asyncio.run(JWTKeySet().decode(make_token()))
+    assert claims["sub"] == "user-1"
+    assert claims["user_roles"] == ["user"]
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [{"exp": int(time.time()) - 10}, {"aud": "someone-else"}],
+)
+def test_rejects_expired_or_foreign_tokens(overrides):
+    with pytest.raises(jwt.PyJWTError):
+        asyncio.run(JWTKeySet().decode(make_token(**overrides)))
+
+
+def test_rejects_bad_signature():
+    token = jwt.encode(
+        {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 60},
+        "another-secret-with-at-least-32-bytes",
+        algorithm="HS256",
+    )
+    with pytest.raises(jwt.InvalidSignatureError):
+        asyncio.run(JWTKeySet().decode(token))
+
+
+def test_auth_cache_entries_never_outlive_the_jwt():
+    assert _auth_cache_ttl("sk-mira-abc") == AUTH_CACHE_TTL_SEC
+    assert _auth_cache_ttl(make_token(exp=int(time.time()) + 3600)) == AUTH_CACHE_TTL_SEC
+    assert 0 < _auth_cache_ttl(make_token(exp=int(time.time()) + 5)) <= 5
+    assert _auth_cache_ttl(make_token(exp=int(time.time()) - 10)) <= 0
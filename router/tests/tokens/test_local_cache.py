@@ -0,0 +1,49 @@
+import asyncio
+
+from src.router.utils.local_cache import SingleFlight, TTLCache
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+    cache.set("d", 4, ttl=-1)
+    assert cache.get("d") is None
+
+
+def test_single_flight_shares_one_call():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "user"
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*[flight.do("token", load) for _ in range(10)])
+        assert results == ["user"] * 10
+        assert len(flight) == 0
+
+    asyncio.run(run())
+    assert calls == 1
+
+
+def test_single_flight_shares_errors():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad token")
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(
+            *[flight.do("token", fail) for _ in range(3)], return_exceptions=True
+        )
+
+    assert all(isinstance(r, ValueError) for r in asyncio.run(run()))